@@ -57,6 +57,23 @@ _asset_to_kraken = {
     },
 }
 
+# increments that evenly divide each contract's listed tick size
+_asset_to_tick_size = {
+    Market.KRAKEN_USD_FUTURE: {
+        Asset.BTC: 0.5,
+        Asset.ETH: 0.01,
+        Asset.WIF: 1e-5,
+        Asset.XRP: 1e-5,
+        Asset.SOL: 1e-3,
+        Asset.DOGE: 1e-7,
+        Asset.TRX: 1e-7,
+        Asset.ADA: 1e-7,
+        Asset.AVAX: 1e-4,
+        Asset.SHIB: 1e-10,
+        Asset.DOT: 1e-4,
+    },
+}
+
 
 def kraken_to_market(kraken_name: str) -> Market:
     if kraken_name in _kraken_to_asset[Market.KRAKEN_SPOT]:
@@ -77,3 +94,9 @@ def kraken_to_asset(kraken_name: str) -> Asset:
 
 def asset_to_kraken(asset: Asset, market: Market) -> str:
     return _asset_to_kraken[market][asset]
+
+
+def asset_to_tick_size(asset: Asset, market: Market) -> float:
+    if market not in _asset_to_tick_size:
+        raise ValueError(f"No tick sizes known for market '{market}'")
+    return _asset_to_tick_size[market][asset]
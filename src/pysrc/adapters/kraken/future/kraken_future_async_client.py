@@ -0,0 +1,402 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pysrc.adapters.kraken.future.containers import (
+    OpenPosition,
+    Order,
+    OrderRequest,
+    OrderStatus,
+    TradeHistory,
+)
+from pysrc.adapters.kraken.future.kraken_future_client import (
+    FUTURES_API_LIVE_BASE_URL,
+    FUTURES_API_TESTNET_BASE_URL,
+)
+from pysrc.adapters.kraken.future.utils import (
+    apply_batch_edit_statuses,
+    apply_batch_send_statuses,
+    apply_edit_status,
+    apply_send_status,
+    batch_cancel_item,
+    batch_cancel_statuses,
+    batch_edit_item,
+    batch_send_item,
+    cancel_status_to_order_status,
+    compute_authent,
+    edit_order_data,
+    kraken_encode_dict,
+    raise_for_error,
+    send_order_data,
+    serialize_history,
+    serialize_open_order,
+    serialize_open_position,
+    serialize_order_status,
+)
+from pysrc.adapters.messages import SnapshotMessage
+from pysrc.util.latency_stats import LatencyStats
+from pysrc.util.types import Market
+
+
+class AsyncKrakenFutureClient:
+    def __init__(
+        self,
+        public_key: str,
+        private_key: str,
+        use_live_api: bool = True,
+        base_url: Optional[str] = None,
+        max_connections: int = 8,
+        timeout_seconds: float = 5.0,
+    ):
+        if max_connections <= 0:
+            raise ValueError(
+                f"Max connections must be positive (got '{max_connections}')"
+            )
+        if timeout_seconds <= 0:
+            raise ValueError(f"Timeout must be positive (got '{timeout_seconds}')")
+
+        self._base_url: str = base_url or (
+            FUTURES_API_LIVE_BASE_URL if use_live_api else FUTURES_API_TESTNET_BASE_URL
+        )
+        self._public_key = public_key
+        self._private_key = private_key
+        self._timeout_seconds = timeout_seconds
+
+        # requests run on a fixed set of worker threads, each holding its own
+        # keep-alive session, so up to max_connections orders are in flight
+        # without a handshake per request and the event loop never blocks
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_connections, thread_name_prefix="kraken-future-client"
+        )
+        self._local = threading.local()
+        self._sessions: list[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+
+        self.latency_stats: dict[str, LatencyStats] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def close(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(
+            None, partial(self._executor.shutdown, wait=True)
+        )
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+
+        return session
+
+    def _send(
+        self,
+        request_type: str,
+        url: str,
+        timeout_seconds: float,
+        headers: Optional[dict[str, str]] = None,
+        params: Optional[dict[str, Any]] = None,
+        data: Optional[str] = None,
+    ) -> Any:
+        match request_type:
+            case "POST" | "GET":
+                pass
+            case _:
+                raise ValueError(f"Unknown request type '{request_type}'")
+
+        return (
+            self._session()
+            .request(
+                request_type,
+                url,
+                headers=headers,
+                params=params,
+                data=data,
+                timeout=timeout_seconds,
+            )
+            .json()
+        )
+
+    async def _request(
+        self,
+        request_type: str,
+        api_route: str,
+        timeout_seconds: Optional[float],
+        headers: Optional[dict[str, str]] = None,
+        params: Optional[dict[str, Any]] = None,
+        data: Optional[str] = None,
+    ) -> Any:
+        timeout_seconds = timeout_seconds or self._timeout_seconds
+        send = partial(
+            self._send,
+            request_type,
+            self._base_url + api_route,
+            timeout_seconds,
+            headers,
+            params,
+            data,
+        )
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.perf_counter()
+        try:
+            res = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(self._executor, send),
+                timeout_seconds,
+            )
+        except (asyncio.TimeoutError, requests.Timeout):
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.latency_stats.setdefault(api_route, LatencyStats()).record(
+                time.perf_counter() - start
+            )
+
+        raise_for_error(res, api_route)
+        return res
+
+    async def _make_private_request(
+        self,
+        request_type: str,
+        api_route: str,
+        params: Optional[dict[str, Any]] = None,
+        data: Optional[dict[str, Any]] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> Any:
+        encoded_data = kraken_encode_dict(data or {})
+        headers = {
+            "APIKey": self._public_key,
+            "Authent": compute_authent(self._private_key, encoded_data, api_route),
+        }
+
+        return await self._request(
+            request_type, api_route, timeout_seconds, headers, params, encoded_data
+        )
+
+    async def _make_public_request(
+        self,
+        request_type: str,
+        api_route: str,
+        params: Optional[dict[str, Any]] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> Any:
+        return await self._request(
+            request_type, api_route, timeout_seconds, params=params
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "routes": {
+                route: stats.to_dict() for route, stats in self.latency_stats.items()
+            },
+        }
+
+    async def get_history(
+        self,
+        symbol: str,
+        last_time: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> list[TradeHistory]:
+        route = "/api/v3/history"
+        params = {"symbol": symbol, "lastTime": last_time}
+
+        response = await self._make_public_request(
+            "GET", route, params=params, timeout_seconds=timeout_seconds
+        )
+        return [serialize_history(symbol, x) for x in response["history"]]
+
+    async def get_orderbook(
+        self, symbol: str, timeout_seconds: Optional[float] = None
+    ) -> SnapshotMessage:
+        route = "/api/v3/orderbook"
+        params = {"symbol": symbol}
+
+        response = await self._make_public_request(
+            "GET", route, params=params, timeout_seconds=timeout_seconds
+        )
+
+        return SnapshotMessage(
+            response["serverTime"],
+            symbol,
+            response["orderBook"]["bids"],
+            response["orderBook"]["asks"],
+            Market.KRAKEN_USD_FUTURE,
+        )
+
+    async def get_open_positions(
+        self, timeout_seconds: Optional[float] = None
+    ) -> list[OpenPosition]:
+        route = "/api/v3/openpositions"
+
+        res = await self._make_private_request(
+            "GET", route, timeout_seconds=timeout_seconds
+        )
+        return [serialize_open_position(p) for p in res["openPositions"]]
+
+    async def get_open_orders(
+        self, timeout_seconds: Optional[float] = None
+    ) -> list[Order]:
+        route = "/api/v3/openorders"
+
+        res = await self._make_private_request(
+            "GET", route, timeout_seconds=timeout_seconds
+        )
+        return [serialize_open_order(o) for o in res["openOrders"]]
+
+    async def get_order_statuses(
+        self, order_ids: list[str], timeout_seconds: Optional[float] = None
+    ) -> list[Order]:
+        route = "/api/v3/orders/status"
+
+        data = {"orderIds": order_ids}
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        return [serialize_order_status(o) for o in res["orders"]]
+
+    async def send_order(
+        self, order_request: OrderRequest, timeout_seconds: Optional[float] = None
+    ) -> Order:
+        route = "/api/v3/sendorder"
+
+        data = send_order_data(order_request)
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        return apply_send_status(order_request.order, res["sendStatus"])
+
+    async def batch_send_order(
+        self,
+        order_requests: list[OrderRequest],
+        process_before: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> list[Order]:
+        route = "/api/v3/batchorder"
+
+        order_tag_to_order = {}
+        send_data = []
+        for i, order_request in enumerate(order_requests):
+            send_data.append(batch_send_item(order_request, str(i)))
+            order_tag_to_order[str(i)] = order_request.order
+
+        data = {"ProcessBefore": process_before, "json": {"batchOrder": send_data}}
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        return apply_batch_send_statuses(order_tag_to_order, res["batchStatus"])
+
+    async def edit_order(
+        self, new_order_request: OrderRequest, timeout_seconds: Optional[float] = None
+    ) -> bool:
+        route = "/api/v3/editorder"
+        params = {"ProcessBefore": new_order_request.process_before}
+        data = edit_order_data(new_order_request)
+
+        res = await self._make_private_request(
+            "POST", route, params=params, data=data, timeout_seconds=timeout_seconds
+        )
+        return apply_edit_status(new_order_request, res["editStatus"])
+
+    async def batch_edit_order(
+        self,
+        new_order_requests: list[OrderRequest],
+        process_before: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> dict[OrderRequest, bool]:
+        route = "/api/v3/batchorder"
+
+        order_id_to_order_request = {r.order.order_id: r for r in new_order_requests}
+        data = {
+            "ProcessBefore": process_before,
+            "json": {"batchOrder": [batch_edit_item(r) for r in new_order_requests]},
+        }
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        return apply_batch_edit_statuses(order_id_to_order_request, res["batchStatus"])
+
+    async def cancel_order(
+        self,
+        order_id: str,
+        process_before: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> OrderStatus:
+        route = "/api/v3/cancelorder"
+        data = {"ProcessBefore": process_before, "order_id": order_id}
+
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        return cancel_status_to_order_status(res["cancelStatus"]["status"])
+
+    async def batch_cancel_order(
+        self,
+        order_ids: list[str],
+        process_before: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> dict[str, OrderStatus]:
+        route = "/api/v3/batchorder"
+
+        data = {
+            "ProcessBefore": process_before,
+            "json": {"batchOrder": [batch_cancel_item(id) for id in order_ids]},
+        }
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        return batch_cancel_statuses(res["batchStatus"])
+
+    async def batch_order(
+        self,
+        items: list[dict[str, Any]],
+        process_before: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> list[dict[str, Any]]:
+        # mixed send/edit/cancel items as built by batch_*_item, statuses are
+        # returned raw for the caller to match back up
+        route = "/api/v3/batchorder"
+
+        data = {"ProcessBefore": process_before, "json": {"batchOrder": items}}
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        statuses: list[dict[str, Any]] = res["batchStatus"]
+        return statuses
+
+    async def cancel_all_orders(
+        self, symbol: str, timeout_seconds: Optional[float] = None
+    ) -> list[str]:
+        route = "/api/v3/cancelallorders"
+        data = {"symbol": symbol}
+
+        res = await self._make_private_request(
+            "POST", route, data=data, timeout_seconds=timeout_seconds
+        )
+        return [order["order_id"] for order in res["cancelStatus"]["cancelledOrders"]]
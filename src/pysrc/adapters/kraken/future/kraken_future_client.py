@@ -1,6 +1,3 @@
-import base64
-import hashlib
-import hmac
 from typing import Any, Optional
 
 import requests
@@ -13,18 +10,24 @@ from pysrc.adapters.kraken.future.containers import (
     TradeHistory,
 )
 from pysrc.adapters.kraken.future.utils import (
+    apply_batch_edit_statuses,
+    apply_batch_send_statuses,
+    apply_edit_status,
+    apply_send_status,
+    batch_cancel_item,
+    batch_cancel_statuses,
+    batch_edit_item,
+    batch_send_item,
+    cancel_status_to_order_status,
+    compute_authent,
+    edit_order_data,
     kraken_encode_dict,
-    order_side_to_str,
-    order_status_to_str,
-    order_type_to_str,
-    price_unit_to_str,
+    raise_for_error,
+    send_order_data,
     serialize_history,
-    str_to_order_side,
-    str_to_order_status,
-    str_to_order_type,
-    str_to_position_side,
-    str_to_trigger_signal,
-    trigger_signal_to_str,
+    serialize_open_order,
+    serialize_open_position,
+    serialize_order_status,
 )
 from pysrc.adapters.messages import SnapshotMessage
 from pysrc.util.types import Market
@@ -49,14 +52,6 @@ class KrakenFutureClient:
         self._private_session = requests.Session()
         self._public_session = requests.Session()
 
-    def _calculate_authent(self, encoded_data: str, api_route: str) -> str:
-        msg = encoded_data + api_route
-        hashed_msg = hashlib.sha256(msg.encode("utf-8")).digest()
-        decoded_key = base64.b64decode(self._private_key)
-
-        authent = hmac.new(decoded_key, hashed_msg, hashlib.sha512)
-        return base64.b64encode(authent.digest()).decode()
-
     def _make_private_request(
         self,
         request_type: str,
@@ -69,7 +64,7 @@ class KrakenFutureClient:
 
         headers = {
             "APIKey": self._public_key,
-            "Authent": self._calculate_authent(encoded_data, api_route),
+            "Authent": compute_authent(self._private_key, encoded_data, api_route),
         }
 
         req_func: Any = None
@@ -83,17 +78,7 @@ class KrakenFutureClient:
 
         res = req_func(url, headers=headers, params=params, data=encoded_data).json()
 
-        if res["result"] == "error":
-            err = None
-            if "errors" in res:
-                err = res["errors"]
-            elif "error" in res:
-                err = res["error"]
-            else:
-                err = "Unknown error"
-
-            raise ValueError(f"Route {api_route} failed with error '{err}'")
-
+        raise_for_error(res, api_route)
         return res
 
     def _make_public_request(
@@ -110,17 +95,7 @@ class KrakenFutureClient:
             case _:
                 raise ValueError(f"Unknown request type '{request_type}'")
 
-        if res["result"] == "error":
-            err = None
-            if "errors" in res:
-                err = res["errors"]
-            elif "error" in res:
-                err = res["error"]
-            else:
-                err = "Unknown error"
-
-            raise ValueError(f"Route {api_route} failed with error '{err}'")
-
+        raise_for_error(res, api_route)
         return res
 
     def get_history(
@@ -149,135 +124,27 @@ class KrakenFutureClient:
         route = "/api/v3/openpositions"
 
         res = self._make_private_request("GET", route)
-        open_positions_json = res["openPositions"]
-
-        open_positions = []
-        for position_json in open_positions_json:
-            position = OpenPosition(
-                position_side=str_to_position_side(position_json["side"]),
-                symbol=position_json["symbol"],
-                price=position_json["price"],
-                fill_time=position_json["fillTime"],
-                size=position_json["size"],
-            )
-
-            open_positions.append(position)
-
-        return open_positions
+        return [serialize_open_position(p) for p in res["openPositions"]]
 
     def get_open_orders(self) -> list[Order]:
         route = "/api/v3/openorders"
 
         res = self._make_private_request("GET", route)
-        open_orders_json = res["openOrders"]
-
-        open_orders = []
-        for order_json in open_orders_json:
-            unfilled_size = order_json["unfilledSize"]
-            filled_size = order_json.get("filledSize")
-
-            size = unfilled_size
-            if filled_size:
-                size += filled_size
-
-            order = Order(
-                symbol=order_json["symbol"],
-                side=str_to_order_side(order_json["side"]),
-                size=size,
-                order_type=str_to_order_type(order_json["orderType"]),
-                status=str_to_order_status(order_json["status"]),
-                limit_price=order_json.get("limitPrice"),
-                stop_price=order_json.get("stopPrice"),
-                order_id=order_json["order_id"],
-                filled_size=filled_size,
-                unfilled_size=unfilled_size,
-                reduce_only=order_json["reduceOnly"],
-                trigger_signal=str_to_trigger_signal(order_json["triggerSignal"])
-                if "triggerSignal" in order_json
-                else None,
-                last_update_time=order_json["lastUpdateTime"],
-            )
-
-            open_orders.append(order)
-
-        return open_orders
+        return [serialize_open_order(o) for o in res["openOrders"]]
 
     def get_order_statuses(self, order_ids: list[str]) -> list[Order]:
         route = "/api/v3/orders/status"
 
         data = {"orderIds": order_ids}
         res = self._make_private_request("POST", route, data=data)
-        open_orders_json = res["orders"]
-
-        open_orders = []
-        for order_obj_json in open_orders_json:
-            order_json = order_obj_json["order"]
-
-            order = Order(
-                symbol=order_json["symbol"],
-                side=str_to_order_side(order_json["side"]),
-                size=order_json.get("quantity"),
-                status=str_to_order_status(order_obj_json["status"]),
-                limit_price=order_json.get("limitPrice"),
-                order_id=order_json["orderId"],
-                filled_size=order_json.get("filledSize"),
-                reduce_only=order_json["reduceOnly"],
-                last_update_time=order_json["lastUpdateTimestamp"],
-            )
-
-            open_orders.append(order)
-
-        return open_orders
+        return [serialize_order_status(o) for o in res["orders"]]
 
     def send_order(self, order_request: OrderRequest) -> Order:
         route = "/api/v3/sendorder"
 
-        order = order_request.order
-        if order.order_type is None:
-            raise ValueError("Order type must be specified")
-
-        data = {
-            "orderType": order_type_to_str(order.order_type),
-            "symbol": order.symbol,
-            "side": order_side_to_str(order.side),
-            "size": order.size,
-            "ProcessBefore": order_request.process_before,
-            "limitPrice": order.limit_price,
-            "stopPrice": order.stop_price,
-            "triggerSignal": trigger_signal_to_str(order.trigger_signal)
-            if order.trigger_signal
-            else None,
-            "reduceOnly": order.reduce_only,
-            "trailingStopMaxDeviation": order_request.trailing_stop_max_deviation,
-            "trailingStopDeviationUnit": price_unit_to_str(
-                order_request.trailing_stop_deviation_unit
-            )
-            if order_request.trailing_stop_deviation_unit
-            else None,
-            "limitPriceOffsetValue": order_request.limit_price_offset_value,
-            "limitPriceOffsetUnit": price_unit_to_str(
-                order_request.limit_price_offset_unit
-            )
-            if order_request.limit_price_offset_unit
-            else None,
-        }
-
+        data = send_order_data(order_request)
         res = self._make_private_request("POST", route, data=data)
-        send_status = res["sendStatus"]
-
-        order_status = send_status["status"]
-        if (
-            order_status != order_status_to_str(OrderStatus.PLACED)
-            and order_status != order_status_to_str(OrderStatus.PLACED)
-            and order_status != order_status_to_str(OrderStatus.PARTIALLY_FILLED)
-        ):
-            order.status = OrderStatus.REJECTED
-        else:
-            order.status = OrderStatus.PLACED
-
-        order.order_id = send_status["order_id"]
-
-        return order
+        return apply_send_status(order_request.order, res["sendStatus"])
 
     def batch_send_order(
         self, order_requests: list[OrderRequest], process_before: Optional[str] = None
@@ -288,79 +155,21 @@ class KrakenFutureClient:
         send_data = []
         order_tag_to_order = {}
         for i, order_request in enumerate(order_requests):
-            order = order_request.order
-
-            if order.order_type is None:
-                raise ValueError(f"Order type for order at index {i} must be specified")
-
-            order_data = {
-                "order_tag": str(i),
-                "order": "send",
-                "orderType": order_type_to_str(order.order_type),
-                "symbol": order.symbol,
-                "side": order_side_to_str(order.side),
-                "size": order.size,
-                "limitPrice": order.limit_price,
-                "stopPrice": order.stop_price,
-                "triggerSignal": trigger_signal_to_str(order.trigger_signal)
-                if order.trigger_signal
-                else None,
-                "reduceOnly": order.reduce_only,
-                "trailingStopMaxDeviation": order_request.trailing_stop_max_deviation,
-                "trailingStopDeviationUnit": price_unit_to_str(
-                    order_request.trailing_stop_deviation_unit
-                )
-                if order_request.trailing_stop_deviation_unit
-                else None,
-            }
-
-            send_data.append(order_data)
-            order_tag_to_order[str(i)] = order
+            send_data.append(batch_send_item(order_request, str(i)))
+            order_tag_to_order[str(i)] = order_request.order
 
         data["json"] = {"batchOrder": send_data}
 
         res = self._make_private_request("POST", route, data=data)
-        batch_statuses = res["batchStatus"]
-
-        for status in batch_statuses:
-            order_tag = status["order_tag"]
-            order = order_tag_to_order[order_tag]
-
-            order_id = status["order_id"]
-            order.order_id = order_id
-
-            if status["status"] != order_status_to_str(OrderStatus.PLACED):
-                order.status = OrderStatus.REJECTED
-            else:
-                order.status = OrderStatus.PLACED
-
-        return list(order_tag_to_order.values())
+        return apply_batch_send_statuses(order_tag_to_order, res["batchStatus"])
 
     def edit_order(self, new_order_request: OrderRequest) -> bool:
         route = "/api/v3/editorder"
         params = {"ProcessBefore": new_order_request.process_before}
-        data = {
-            "orderId": new_order_request.order.order_id,
-            "size": new_order_request.order.size,
-            "limitPrice": new_order_request.order.limit_price,
-            "stopPrice": new_order_request.order.stop_price,
-            "trailingStopMaxDeviation": new_order_request.trailing_stop_max_deviation,
-            "trailingStopDeviationUnit": price_unit_to_str(
-                new_order_request.trailing_stop_deviation_unit
-            )
-            if new_order_request.trailing_stop_deviation_unit
-            else None,
-        }
+        data = edit_order_data(new_order_request)
 
         res = self._make_private_request("POST", route, params=params, data=data)
-        edit_status = res["editStatus"]
-
-        if edit_status["status"] != order_status_to_str(OrderStatus.EDITED):
-            new_order_request.order.status = OrderStatus.REJECTED
-            return False
-
-        new_order_request.order.status = OrderStatus.PLACED
-        return True
+        return apply_edit_status(new_order_request, res["editStatus"])
 
     def batch_edit_order(
         self,
@@ -374,42 +183,13 @@ class KrakenFutureClient:
         edit_data = []
         order_id_to_order_request = {}
         for order_request in new_order_requests:
-            order = order_request.order
-            order_data = {
-                "order": "edit",
-                "order_id": order.order_id,
-                "size": order.size,
-                "limitPrice": order.limit_price,
-                "stopPrice": order.stop_price,
-                "trailingStopMaxDeviation": order_request.trailing_stop_max_deviation,
-                "trailingStopDeviationUnit": price_unit_to_str(
-                    order_request.trailing_stop_deviation_unit
-                )
-                if order_request.trailing_stop_deviation_unit
-                else None,
-            }
-
-            edit_data.append(order_data)
-            order_id_to_order_request[order.order_id] = order_request
+            edit_data.append(batch_edit_item(order_request))
+            order_id_to_order_request[order_request.order.order_id] = order_request
 
         data["json"] = {"batchOrder": edit_data}
 
         res = self._make_private_request("POST", route, data=data)
-        batch_statuses = res["batchStatus"]
-
-        statuses = {}
-        for status in batch_statuses:
-            order_id = status["order_id"]
-            order_request = order_id_to_order_request[order_id]
-
-            if status["status"] != order_status_to_str(OrderStatus.EDITED):
-                order_request.order.status = OrderStatus.REJECTED
-                statuses[order_request] = False
-            else:
-                order_request.order.status = OrderStatus.PLACED
-                statuses[order_request] = True
-
-        return statuses
+        return apply_batch_edit_statuses(order_id_to_order_request, res["batchStatus"])
 
     def cancel_order(
         self, order_id: str, process_before: Optional[str] = None
@@ -418,14 +198,7 @@ class KrakenFutureClient:
         data = {"ProcessBefore": process_before, "order_id": order_id}
 
         res = self._make_private_request("POST", route, data=data)
-        cancel_status = res["cancelStatus"]
-
-        try:
-            status = str_to_order_status(cancel_status["status"])
-            return status
-        except Exception:
-            # only happens if the order can't be found
-            return OrderStatus.REJECTED
+        return cancel_status_to_order_status(res["cancelStatus"]["status"])
 
     def batch_cancel_order(
         self, order_ids: list[str], process_before: Optional[str] = None
@@ -433,41 +206,16 @@ class KrakenFutureClient:
         route = "/api/v3/batchorder"
 
         data: dict[str, Any] = {"ProcessBefore": process_before}
-
-        cancel_data = []
-        for id in order_ids:
-            order_cancel_data = {"order": "cancel", "order_id": id}
-
-            cancel_data.append(order_cancel_data)
-
-        data["json"] = {"batchOrder": cancel_data}
+        data["json"] = {"batchOrder": [batch_cancel_item(id) for id in order_ids]}
 
         res = self._make_private_request("POST", route, data=data)
-        batch_statuses = res["batchStatus"]
-
-        order_statuses = {}
-        for status in batch_statuses:
-            order_id = status["order_id"]
-
-            try:
-                status = str_to_order_status(status["status"])
-                order_statuses[order_id] = status
-            except Exception:
-                # only happens if the order can't be found
-                order_statuses[order_id] = OrderStatus.REJECTED
-
-        return order_statuses
+        return batch_cancel_statuses(res["batchStatus"])
 
     def cancel_all_orders(self, symbol: str) -> list[str]:
         route = "/api/v3/cancelallorders"
         data = {"symbol": symbol}
 
         res = self._make_private_request("POST", route, data=data)
-        cancel_status = res["cancelStatus"]
-        cancelled_orders = cancel_status["cancelledOrders"]
-
-        cancelled_order_ids = []
-        for order in cancelled_orders:
-            cancelled_order_ids.append(order["order_id"])
+        cancelled_orders = res["cancelStatus"]["cancelledOrders"]
 
-        return cancelled_order_ids
+        return [order["order_id"] for order in cancelled_orders]
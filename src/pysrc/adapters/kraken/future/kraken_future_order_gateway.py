@@ -0,0 +1,234 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Any, Optional
+
+from pysrc.adapters.kraken.future.containers import Order, OrderRequest, OrderStatus
+from pysrc.adapters.kraken.future.kraken_future_async_client import (
+    AsyncKrakenFutureClient,
+)
+from pysrc.adapters.kraken.future.utils import (
+    apply_edit_status,
+    apply_send_status,
+    batch_cancel_item,
+    batch_edit_item,
+    batch_send_item,
+    cancel_status_to_order_status,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class OrderIntent(Enum):
+    SEND = 1
+    EDIT = 2
+    CANCEL = 3
+
+
+class _PendingIntent:
+    def __init__(
+        self,
+        order_tag: str,
+        intent: OrderIntent,
+        payload: OrderRequest | str,
+        item: dict[str, Any],
+        future: asyncio.Future,
+    ) -> None:
+        self.order_tag = order_tag
+        self.intent = intent
+        self.payload = payload
+        self.item = item
+        self.future = future
+
+    def order_id(self) -> Optional[str]:
+        if isinstance(self.payload, str):
+            return self.payload
+        return self.payload.order.order_id
+
+
+class KrakenFutureOrderGateway:
+    def __init__(
+        self,
+        client: AsyncKrakenFutureClient,
+        window_seconds: float = 0.001,
+        max_batch_size: int = 20,
+        timeout_seconds: Optional[float] = None,
+    ) -> None:
+        if window_seconds < 0:
+            raise ValueError(f"Window must not be negative (got '{window_seconds}')")
+        if max_batch_size <= 0:
+            raise ValueError(
+                f"Max batch size must be positive (got '{max_batch_size}')"
+            )
+
+        self._client = client
+        self._window_seconds = window_seconds
+        self._max_batch_size = max_batch_size
+        self._timeout_seconds = timeout_seconds
+
+        # ProcessBefore applies to a whole batchorder request, so intents are
+        # only coalesced with others carrying the same deadline
+        self._pending: dict[Optional[str], list[_PendingIntent]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: set[asyncio.Task] = set()
+        self._next_order_tag = 0
+
+        self.batches_sent = 0
+        self.intents_sent = 0
+        self.largest_batch = 0
+
+    async def send_order(self, order_request: OrderRequest) -> Order:
+        order: Order = await self._submit(
+            OrderIntent.SEND, order_request, order_request.process_before
+        )
+        return order
+
+    async def edit_order(self, new_order_request: OrderRequest) -> bool:
+        edited: bool = await self._submit(
+            OrderIntent.EDIT, new_order_request, new_order_request.process_before
+        )
+        return edited
+
+    async def cancel_order(
+        self, order_id: str, process_before: Optional[str] = None
+    ) -> OrderStatus:
+        status: OrderStatus = await self._submit(
+            OrderIntent.CANCEL, order_id, process_before
+        )
+        return status
+
+    async def flush(self) -> None:
+        self._flush()
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+    def _submit(
+        self,
+        intent: OrderIntent,
+        payload: OrderRequest | str,
+        process_before: Optional[str],
+    ) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+
+        order_tag = str(self._next_order_tag)
+        self._next_order_tag += 1
+
+        # items are built up front so a malformed order fails its own caller
+        # instead of the batch it would have joined
+        match intent:
+            case OrderIntent.SEND:
+                assert isinstance(payload, OrderRequest)
+                item = batch_send_item(payload, order_tag)
+            case OrderIntent.EDIT:
+                assert isinstance(payload, OrderRequest)
+                item = batch_edit_item(payload, order_tag)
+            case OrderIntent.CANCEL:
+                assert isinstance(payload, str)
+                item = batch_cancel_item(payload, order_tag)
+            case _:
+                raise ValueError(f"Unknown order intent (got '{intent}')")
+
+        future = loop.create_future()
+        pending = self._pending.setdefault(process_before, [])
+        pending.append(_PendingIntent(order_tag, intent, payload, item, future))
+
+        if len(pending) >= self._max_batch_size:
+            self._send_pending(process_before)
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window_seconds, self._flush)
+
+        return future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        for process_before in list(self._pending):
+            self._send_pending(process_before)
+
+    def _send_pending(self, process_before: Optional[str]) -> None:
+        batch = self._pending.pop(process_before, [])
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send_batch(batch, process_before))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(
+        self, batch: list[_PendingIntent], process_before: Optional[str]
+    ) -> None:
+        self.batches_sent += 1
+        self.intents_sent += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        try:
+            statuses = await self._client.batch_order(
+                [pending.item for pending in batch],
+                process_before=process_before,
+                timeout_seconds=self._timeout_seconds,
+            )
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        # sends come back with their tag, edits and cancels may only carry the
+        # order id, in which case they are matched in submission order
+        by_order_tag: dict[str, dict[str, Any]] = {}
+        by_order_id: dict[str, list[dict[str, Any]]] = {}
+        for batch_status in statuses:
+            if batch_status.get("order_tag") is not None:
+                by_order_tag[batch_status["order_tag"]] = batch_status
+            elif batch_status.get("order_id") is not None:
+                by_order_id.setdefault(batch_status["order_id"], []).append(
+                    batch_status
+                )
+
+        for pending in batch:
+            status: Optional[dict[str, Any]] = by_order_tag.get(pending.order_tag)
+            order_id = pending.order_id()
+            if status is None and pending.intent != OrderIntent.SEND and order_id:
+                matches = by_order_id.get(order_id)
+                status = matches.pop(0) if matches else None
+
+            if pending.future.done():
+                continue
+
+            if status is None:
+                pending.future.set_exception(
+                    ValueError(
+                        f"Batch order returned no status for order tag '{pending.order_tag}'"
+                    )
+                )
+                continue
+
+            try:
+                pending.future.set_result(self._resolve(pending, status))
+            except Exception as e:
+                _logger.exception(f"Failed to parse batch status '{status}'")
+                pending.future.set_exception(e)
+
+    def _resolve(self, pending: _PendingIntent, status: dict[str, Any]) -> Any:
+        match pending.intent:
+            case OrderIntent.SEND:
+                assert isinstance(pending.payload, OrderRequest)
+                return apply_send_status(pending.payload.order, status)
+            case OrderIntent.EDIT:
+                assert isinstance(pending.payload, OrderRequest)
+                return apply_edit_status(pending.payload, status)
+            case OrderIntent.CANCEL:
+                return cancel_status_to_order_status(status["status"])
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches_sent": self.batches_sent,
+            "intents_sent": self.intents_sent,
+            "largest_batch": self.largest_batch,
+            "mean_batch_size": self.intents_sent / self.batches_sent
+            if self.batches_sent
+            else 0.0,
+            "pending": sum(len(pending) for pending in self._pending.values()),
+        }
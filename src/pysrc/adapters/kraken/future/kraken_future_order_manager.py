@@ -0,0 +1,301 @@
+import asyncio
+import logging
+from typing import Any, Optional
+
+from pysrc.adapters.kraken.future.containers import (
+    OpenPosition,
+    Order,
+    OrderRequest,
+    OrderStatus,
+)
+from pysrc.adapters.kraken.future.kraken_future_async_client import (
+    AsyncKrakenFutureClient,
+)
+from pysrc.adapters.kraken.future.kraken_future_order_gateway import (
+    KrakenFutureOrderGateway,
+)
+from pysrc.util.types import OrderSide, PositionSide
+
+_logger = logging.getLogger(__name__)
+
+TERMINAL_ORDER_STATUSES = frozenset(
+    [
+        OrderStatus.FULLY_EXECUTED,
+        OrderStatus.FILLED,
+        OrderStatus.REJECTED,
+        OrderStatus.CANCELLED,
+        OrderStatus.TRIGGER_ACTIVATION_FAILURE,
+    ]
+)
+
+_EPSILON = 1e-12
+
+
+class KrakenFutureOrderManager:
+    def __init__(
+        self,
+        client: AsyncKrakenFutureClient,
+        gateway: Optional[KrakenFutureOrderGateway] = None,
+        reconcile_interval_seconds: float = 30.0,
+    ) -> None:
+        if reconcile_interval_seconds <= 0:
+            raise ValueError(
+                f"Reconcile interval must be positive (got '{reconcile_interval_seconds}')"
+            )
+
+        self._client = client
+        # order entry goes through the gateway when there is one so intents are
+        # batched, reconciliation always talks to the client
+        self._order_entry: AsyncKrakenFutureClient | KrakenFutureOrderGateway = (
+            gateway if gateway is not None else client
+        )
+        self._reconcile_interval_seconds = reconcile_interval_seconds
+
+        self._orders: dict[str, Order] = {}
+        # dicts keep insertion order and make removal O(1), they are used as
+        # ordered sets of order ids per symbol and per (symbol, side)
+        self._orders_by_symbol: dict[str, dict[str, Order]] = {}
+        self._orders_by_symbol_side: dict[tuple[str, OrderSide], dict[str, Order]] = {}
+        self._positions: dict[str, OpenPosition] = {}
+
+        # orders and positions touched while a reconcile is in flight are newer
+        # than its rest snapshot and are kept as they are
+        self._reconciling = False
+        self._touched_orders: set[str] = set()
+        self._touched_positions: set[str] = set()
+
+        self.reconciles = 0
+        self.reconcile_corrections = 0
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        return self._orders.get(order_id)
+
+    def open_orders(
+        self, symbol: Optional[str] = None, side: Optional[OrderSide] = None
+    ) -> list[Order]:
+        if symbol is None:
+            if side is not None:
+                raise ValueError("Side lookups need a symbol")
+            return list(self._orders.values())
+        if side is None:
+            return list(self._orders_by_symbol.get(symbol, {}).values())
+        return list(self._orders_by_symbol_side.get((symbol, side), {}).values())
+
+    def get_position(self, symbol: str) -> Optional[OpenPosition]:
+        return self._positions.get(symbol)
+
+    def positions(self) -> list[OpenPosition]:
+        return list(self._positions.values())
+
+    def net_position(self, symbol: str) -> float:
+        position = self._positions.get(symbol)
+        return 0.0 if position is None else self._signed_size(position)
+
+    async def send_order(self, order_request: OrderRequest) -> Order:
+        order = await self._order_entry.send_order(order_request)
+        if order.order_id is not None and order.status not in TERMINAL_ORDER_STATUSES:
+            if order.filled_size is None:
+                order.filled_size = 0.0
+            if order.unfilled_size is None:
+                order.unfilled_size = order.size
+            self.apply_order(order)
+        return order
+
+    async def edit_order(self, new_order_request: OrderRequest) -> bool:
+        edited = await self._order_entry.edit_order(new_order_request)
+        new_order = new_order_request.order
+        if edited and new_order.order_id is not None:
+            order = self._orders.get(new_order.order_id)
+            if order is None:
+                self.apply_order(new_order)
+            else:
+                order.size = new_order.size
+                order.limit_price = new_order.limit_price
+                order.stop_price = new_order.stop_price
+                if order.size is not None:
+                    order.unfilled_size = order.size - (order.filled_size or 0.0)
+                self._touch_order(new_order.order_id)
+        return edited
+
+    async def cancel_order(self, order_id: str) -> OrderStatus:
+        status = await self._order_entry.cancel_order(order_id)
+        # a rejected cancel means the exchange no longer knows the order
+        if status in TERMINAL_ORDER_STATUSES:
+            self._remove_order(order_id)
+            self._touch_order(order_id)
+        return status
+
+    def apply_order(self, order: Order) -> None:
+        # entry point for acknowledgements and the private open orders feed
+        if order.order_id is None:
+            raise ValueError(f"Order for {order.symbol} has no order id")
+
+        self._touch_order(order.order_id)
+        if order.status in TERMINAL_ORDER_STATUSES:
+            self._remove_order(order.order_id)
+            return
+
+        self._remove_order(order.order_id)
+        self._orders[order.order_id] = order
+        self._orders_by_symbol.setdefault(order.symbol, {})[order.order_id] = order
+        self._orders_by_symbol_side.setdefault((order.symbol, order.side), {})[
+            order.order_id
+        ] = order
+
+    def apply_fill(
+        self,
+        symbol: str,
+        side: OrderSide,
+        price: float,
+        quantity: float,
+        fill_time: str,
+        order_id: Optional[str] = None,
+    ) -> None:
+        # entry point for the private fills feed
+        if order_id is not None and (order := self._orders.get(order_id)) is not None:
+            order.filled_size = (order.filled_size or 0.0) + quantity
+            if order.size is not None:
+                order.unfilled_size = max(order.size - order.filled_size, 0.0)
+                if order.unfilled_size <= _EPSILON:
+                    order.status = OrderStatus.FILLED
+                    self._remove_order(order_id)
+                else:
+                    order.status = OrderStatus.PARTIALLY_FILLED
+            self._touch_order(order_id)
+
+        current = self.net_position(symbol)
+        updated = current + (quantity if side == OrderSide.BID else -quantity)
+        if self._reconciling:
+            self._touched_positions.add(symbol)
+
+        if abs(updated) <= _EPSILON:
+            self._positions.pop(symbol, None)
+            return
+
+        position = self._positions.get(symbol)
+        if position is None or current * updated < 0:
+            entry_price = price
+        elif abs(updated) > abs(current):
+            entry_price = (position.price * abs(current) + price * quantity) / abs(
+                updated
+            )
+        else:
+            entry_price = position.price
+
+        self._positions[symbol] = OpenPosition(
+            position_side=PositionSide.LONG if updated > 0 else PositionSide.SHORT,
+            symbol=symbol,
+            price=entry_price,
+            fill_time=fill_time,
+            size=abs(updated),
+        )
+
+    def apply_position(self, position: OpenPosition) -> None:
+        # entry point for the private open positions feed
+        if self._reconciling:
+            self._touched_positions.add(position.symbol)
+        if position.size <= _EPSILON:
+            self._positions.pop(position.symbol, None)
+        else:
+            self._positions[position.symbol] = position
+
+    async def reconcile(self) -> int:
+        self._reconciling = True
+        self._touched_orders.clear()
+        self._touched_positions.clear()
+        try:
+            open_orders, open_positions = await asyncio.gather(
+                self._client.get_open_orders(), self._client.get_open_positions()
+            )
+        finally:
+            self._reconciling = False
+
+        corrections = 0
+
+        remote_orders = {o.order_id: o for o in open_orders if o.order_id is not None}
+        for order_id in list(self._orders):
+            if order_id not in remote_orders and order_id not in self._touched_orders:
+                self._remove_order(order_id)
+                corrections += 1
+        for order_id, order in remote_orders.items():
+            if order_id in self._touched_orders:
+                continue
+            if not self._same_order(self._orders.get(order_id), order):
+                self.apply_order(order)
+                corrections += 1
+
+        remote_positions = {p.symbol: p for p in open_positions}
+        for symbol in list(self._positions):
+            if symbol not in remote_positions and symbol not in self._touched_positions:
+                del self._positions[symbol]
+                corrections += 1
+        for symbol, position in remote_positions.items():
+            if symbol in self._touched_positions:
+                continue
+            if abs(self.net_position(symbol) - self._signed_size(position)) > _EPSILON:
+                corrections += 1
+            self._positions[symbol] = position
+
+        self._touched_orders.clear()
+        self._touched_positions.clear()
+
+        self.reconciles += 1
+        self.reconcile_corrections += corrections
+        if corrections:
+            _logger.warning(f"Reconcile corrected {corrections} orders and positions")
+        return corrections
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.reconcile()
+            except Exception:
+                _logger.exception("Order state reconcile failed")
+            await asyncio.sleep(self._reconcile_interval_seconds)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "open_orders": len(self._orders),
+            "positions": len(self._positions),
+            "reconciles": self.reconciles,
+            "reconcile_corrections": self.reconcile_corrections,
+        }
+
+    def _touch_order(self, order_id: str) -> None:
+        if self._reconciling:
+            self._touched_orders.add(order_id)
+
+    def _remove_order(self, order_id: str) -> None:
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return
+
+        by_symbol = self._orders_by_symbol[order.symbol]
+        del by_symbol[order_id]
+        if not by_symbol:
+            del self._orders_by_symbol[order.symbol]
+
+        by_symbol_side = self._orders_by_symbol_side[(order.symbol, order.side)]
+        del by_symbol_side[order_id]
+        if not by_symbol_side:
+            del self._orders_by_symbol_side[(order.symbol, order.side)]
+
+    @staticmethod
+    def _signed_size(position: OpenPosition) -> float:
+        return (
+            position.size
+            if position.position_side == PositionSide.LONG
+            else -position.size
+        )
+
+    @staticmethod
+    def _same_order(local: Optional[Order], remote: Order) -> bool:
+        return (
+            local is not None
+            and local.side == remote.side
+            and local.size == remote.size
+            and local.limit_price == remote.limit_price
+            and local.stop_price == remote.stop_price
+            # the rest api leaves filledSize out of untouched orders
+            and (local.filled_size or 0.0) == (remote.filled_size or 0.0)
+        )
@@ -0,0 +1,311 @@
+import asyncio
+import heapq
+import json
+import logging
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Generator, Iterable, Optional
+
+from websockets import ConnectionClosed
+from websockets.asyncio.server import Server, ServerConnection, serve
+
+from pysrc.adapters.kraken.asset_mappings import asset_to_kraken
+from pysrc.adapters.messages import SnapshotMessage, TradeMessage
+from pysrc.data_handlers.kraken.historical.snapshots_data_handler import (
+    SnapshotsDataHandler,
+)
+from pysrc.data_handlers.kraken.historical.trades_data_handler import (
+    TradesDataHandler,
+)
+from pysrc.util.historical_data_utils import historical_data_dir
+from pysrc.util.types import Asset, Market, OrderSide, TimeUnit
+
+_logger = logging.getLogger(__name__)
+
+_ReplayEvent = tuple[int, int, str, TradeMessage | SnapshotMessage]
+
+# the feed is always in milliseconds, archives are scaled by the unit of the
+# directory they were read from
+_MS_PER_TIME_UNIT = {TimeUnit.SECONDS: 1000, TimeUnit.MILLISECONDS: 1}
+
+
+def _book_levels(levels: list[Any]) -> dict[float, float]:
+    return {float(price): float(qty) for price, qty in levels}
+
+
+class _ReplayBook:
+    def __init__(self) -> None:
+        self.bids: dict[float, float] = {}
+        self.asks: dict[float, float] = {}
+
+    def apply(self, snapshot: SnapshotMessage) -> list[tuple[str, float, float]]:
+        # the levels that changed between two snapshots become book deltas,
+        # removed levels are sent with a zero quantity
+        deltas = []
+        for side, book, levels in (
+            ("buy", self.bids, _book_levels(snapshot.bids)),
+            ("sell", self.asks, _book_levels(snapshot.asks)),
+        ):
+            for price in book.keys() - levels.keys():
+                deltas.append((side, price, 0.0))
+            for price, qty in levels.items():
+                if book.get(price) != qty:
+                    deltas.append((side, price, qty))
+            book.clear()
+            book.update(levels)
+        return deltas
+
+
+class KrakenFutureReplayServer:
+    def __init__(
+        self,
+        resource_path: Path,
+        assets: list[Asset],
+        since: date,
+        until: date,
+        speed: Optional[float] = 1.0,
+        market: Market = Market.KRAKEN_USD_FUTURE,
+        host: str = "localhost",
+        port: int = 0,
+    ) -> None:
+        if speed is not None and speed <= 0:
+            raise ValueError(f"Speed must be positive (got '{speed}')")
+        if since >= until:
+            raise ValueError(
+                f"Dates since ({since.strftime("%m_%d_%Y")}) equal to or later than until ({until.strftime("%m_%d_%Y")})"
+            )
+
+        self._resource_path = resource_path
+        self._assets = assets
+        self._since = since
+        self._until = until
+        # None replays as fast as the connection accepts messages
+        self._speed = speed
+        self._market = market
+        self._host = host
+        self._port = port
+
+        self._server: Optional[Server] = None
+        self.replays_finished = 0
+        self.messages_sent = 0
+        self.finished = asyncio.Event()
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise ValueError("Replay server is not started")
+
+        port = list(self._server.sockets)[0].getsockname()[1]
+        return f"ws://{self._host}:{port}"
+
+    async def start(self) -> None:
+        self._server = await serve(self._handle_connection, self._host, self._port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _day_files(
+        self, is_trade_data: bool, archive_feedcode: str
+    ) -> Optional[tuple[TimeUnit, list[Path]]]:
+        # one archive per asset and kind, replaying both units would send every
+        # event twice, the millisecond archive wins as it is the finer one
+        days = [
+            (self._since + timedelta(days=i)).strftime("%m_%d_%Y.bin")
+            for i in range((self._until - self._since).days)
+        ]
+        kind = "trades" if is_trade_data else "snapshots"
+
+        day_files: dict[TimeUnit, list[Path]] = {}
+        for time_unit in (TimeUnit.MILLISECONDS, TimeUnit.SECONDS):
+            asset_dir = (
+                self._resource_path
+                / historical_data_dir(is_trade_data, time_unit)
+                / archive_feedcode
+            )
+            # days missing from the archive are skipped, not the end of it
+            paths = [asset_dir / day for day in days if (asset_dir / day).exists()]
+            if paths:
+                day_files[time_unit] = paths
+
+        if not day_files:
+            _logger.warning(f"No {kind} archive for {archive_feedcode}")
+            return None
+        if len(day_files) > 1:
+            _logger.warning(
+                f"Both {kind} archives exist for {archive_feedcode}, replaying the millisecond one"
+            )
+
+        return next(iter(day_files.items()))
+
+    def _stream(
+        self,
+        handler: TradesDataHandler | SnapshotsDataHandler,
+        day_files: list[Path],
+        time_unit: TimeUnit,
+        stream_id: int,
+        feedcode: str,
+    ) -> Generator[_ReplayEvent, None, None]:
+        scale = _MS_PER_TIME_UNIT[time_unit]
+        for day_file in day_files:
+            for message in handler.stream_read(day_file):
+                yield message.time * scale, stream_id, feedcode, message
+
+    def _events(self) -> Iterable[_ReplayEvent]:
+        streams: list[Generator[_ReplayEvent, None, None]] = []
+        for asset in self._assets:
+            feedcode = asset_to_kraken(asset, Market.KRAKEN_USD_FUTURE)
+            archive_feedcode = asset_to_kraken(asset, self._market)
+
+            handler: TradesDataHandler | SnapshotsDataHandler
+            for is_trade_data, handler in (
+                (True, TradesDataHandler()),
+                (False, SnapshotsDataHandler()),
+            ):
+                archive = self._day_files(is_trade_data, archive_feedcode)
+                if archive is None:
+                    continue
+
+                time_unit, day_files = archive
+                streams.append(
+                    self._stream(handler, day_files, time_unit, len(streams), feedcode)
+                )
+
+        # archives are time ordered per file, merging keeps the replay globally
+        # ordered with ties broken by stream
+        return heapq.merge(*streams, key=lambda event: (event[0], event[1]))
+
+    async def _handle_connection(self, connection: ServerConnection) -> None:
+        subscriptions: dict[str, set[str]] = {"trade": set(), "book": set()}
+        # a product gets a full book_snapshot as its first book message after
+        # (re)subscribing and deltas from then on
+        snapshot_sent: set[str] = set()
+        replay_task: Optional[asyncio.Task] = None
+
+        try:
+            async for raw_message in connection:
+                message = json.loads(raw_message)
+                event = message.get("event")
+                feed = message.get("feed")
+                if (
+                    event not in ("subscribe", "unsubscribe")
+                    or feed not in subscriptions
+                ):
+                    continue
+
+                product_ids = message.get("product_ids", [])
+                if event == "subscribe":
+                    subscriptions[feed].update(product_ids)
+                else:
+                    subscriptions[feed].difference_update(product_ids)
+                if feed == "book":
+                    snapshot_sent.difference_update(product_ids)
+
+                await connection.send(
+                    json.dumps(
+                        {"event": event + "d", "feed": feed, "product_ids": product_ids}
+                    )
+                )
+
+                if replay_task is None:
+                    replay_task = asyncio.create_task(
+                        self._replay(connection, subscriptions, snapshot_sent)
+                    )
+        except ConnectionClosed:
+            _logger.info("Replay client disconnected")
+        finally:
+            if replay_task is not None:
+                replay_task.cancel()
+
+    async def _replay(
+        self,
+        connection: ServerConnection,
+        subscriptions: dict[str, set[str]],
+        snapshot_sent: set[str],
+    ) -> None:
+        books: dict[str, _ReplayBook] = {}
+        book_seq: dict[str, int] = {}
+        trade_seq: dict[str, int] = {}
+
+        first_time: Optional[int] = None
+        start = time.monotonic()
+        for event_time, _, feedcode, message in self._events():
+            if self._speed is not None:
+                if first_time is None:
+                    first_time = event_time
+                delay = (
+                    start + (event_time - first_time) / 1000 / self._speed
+                ) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if isinstance(message, TradeMessage):
+                if feedcode not in subscriptions["trade"]:
+                    continue
+                trade_seq[feedcode] = trade_seq.get(feedcode, 0) + 1
+                await self._send(
+                    connection,
+                    {
+                        "feed": "trade",
+                        "product_id": feedcode,
+                        "side": "buy" if message.side == OrderSide.BID else "sell",
+                        "type": "fill",
+                        "seq": trade_seq[feedcode],
+                        "time": event_time,
+                        "qty": message.quantity,
+                        "price": message.price,
+                    },
+                )
+                continue
+
+            book = books.setdefault(feedcode, _ReplayBook())
+            deltas = book.apply(message)
+            if feedcode not in subscriptions["book"]:
+                continue
+
+            if feedcode not in snapshot_sent:
+                snapshot_sent.add(feedcode)
+                book_seq[feedcode] = book_seq.get(feedcode, 0) + 1
+                await self._send(
+                    connection,
+                    {
+                        "feed": "book_snapshot",
+                        "product_id": feedcode,
+                        "timestamp": event_time,
+                        "seq": book_seq[feedcode],
+                        "bids": [
+                            {"price": price, "qty": qty}
+                            for price, qty in sorted(book.bids.items(), reverse=True)
+                        ],
+                        "asks": [
+                            {"price": price, "qty": qty}
+                            for price, qty in sorted(book.asks.items())
+                        ],
+                    },
+                )
+                continue
+
+            for side, price, qty in deltas:
+                book_seq[feedcode] += 1
+                await self._send(
+                    connection,
+                    {
+                        "feed": "book",
+                        "product_id": feedcode,
+                        "side": side,
+                        "seq": book_seq[feedcode],
+                        "price": price,
+                        "qty": qty,
+                        "timestamp": event_time,
+                    },
+                )
+
+        self.replays_finished += 1
+        self.finished.set()
+
+    async def _send(self, connection: ServerConnection, message: dict) -> None:
+        await connection.send(json.dumps(message))
+        self.messages_sent += 1
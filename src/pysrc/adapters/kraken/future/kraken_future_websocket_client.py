@@ -1,21 +1,45 @@
 import json
 import logging
 import time
-from typing import Any, Optional, override
+from enum import Enum
+from typing import Any, Callable, Iterable, Optional, override
 
+import numpy as np
 from sortedcontainers import SortedDict
 
 from pysrc.adapters.kraken.asset_mappings import (
     asset_to_kraken,
     kraken_to_asset,
 )
+from pysrc.adapters.kraken.future.utils import book_snapshot
 from pysrc.adapters.messages import SnapshotMessage, TradeMessage
 from pysrc.util.exceptions import DIE, prod_assert
+from pysrc.util.feed_metrics import FeedMetrics
+from pysrc.util.ring_buffer import OverflowPolicy, RingBuffer
+from pysrc.util.subscriptions import (
+    Subscription,
+    SubscriptionHandler,
+    SubscriptionRegistry,
+)
 from pysrc.util.types import Asset, Market, OrderSide
 from pysrc.util.websocket import WebSocketClient
 
 _logger = logging.getLogger(__name__)
 
+TRADE_DTYPE = np.dtype(
+    [("time", "u8"), ("price", "f8"), ("quantity", "f8"), ("side", "u1")]
+)
+
+TopOfBook = tuple[Optional[tuple[float, float]], Optional[tuple[float, float]]]
+# handlers take a decoded feed message, keyed by its feed name
+FeedHandler = Callable[[dict[str, Any]], None]
+
+
+class FeedEvent(Enum):
+    TRADE = 1
+    BOOK_UPDATE = 2
+    TOP_OF_BOOK = 3
+
 
 class KrakenFutureWebsocketClient(WebSocketClient):
     BASE_URL: str = "wss://futures.kraken.com/ws/v1"
@@ -25,11 +49,34 @@ class KrakenFutureWebsocketClient(WebSocketClient):
         subscribed_assets: list[Asset],
         retry_delay: int = 5,
         max_retries: Optional[int] = None,
+        json_backend: Optional[str] = None,
+        trade_buffer_capacity: int = 1 << 16,
+        trade_overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        base_url: str = BASE_URL,
+        collect_feed_metrics: bool = True,
     ) -> None:
-        super().__init__(self.BASE_URL, retry_delay, max_retries)
+        super().__init__(base_url, retry_delay, max_retries, json_backend=json_backend)
         self.subscribed_assets: list[Asset] = subscribed_assets
-        self.trade_messages: list[TradeMessage] = []
+        self.trade_buffers: dict[Asset, RingBuffer] = {
+            asset: RingBuffer(TRADE_DTYPE, trade_buffer_capacity, trade_overflow_policy)
+            for asset in self.subscribed_assets
+        }
+        self._block_on_full_trades = trade_overflow_policy == OverflowPolicy.BLOCK
         self.subscription_confirmations: dict[str, bool] = {}
+        self._feedcode_to_asset: dict[str, Asset] = {
+            asset_to_kraken(asset, Market.KRAKEN_USD_FUTURE): asset
+            for asset in self.subscribed_assets
+        }
+        self._feed_handlers: dict[str, FeedHandler] = {
+            "trade_snapshot": self._on_trade_snapshot,
+            "trade": self._on_trade,
+            "book_snapshot": self._on_book_snapshot,
+            "book": self._on_book,
+        }
+        self._subscriptions = SubscriptionRegistry()
+        self._last_top_of_book: dict[Asset, TopOfBook] = {}
+        self.feed_metrics = FeedMetrics()
+        self._collect_feed_metrics = collect_feed_metrics
         self._initialize_book_params()
 
     def _initialize_book_params(self) -> None:
@@ -43,6 +90,23 @@ class KrakenFutureWebsocketClient(WebSocketClient):
             )
             for asset in self.subscribed_assets
         }
+        self._snapshot_depths: dict[Asset, Optional[int]] = {
+            asset: None for asset in self.subscribed_assets
+        }
+        self._dirty_assets: set[Asset] = set(self.subscribed_assets)
+        # time of the last book change per asset in seconds, the exchange
+        # timestamp when the message carries one
+        self._book_times: dict[Asset, float] = {}
+
+        # last applied book seq per asset, after a gap the asset's deltas are
+        # dropped until its resubscribe brings a fresh book_snapshot
+        self._book_seqs: dict[Asset, int] = {}
+        self._resyncing_assets: set[Asset] = set()
+        self._pending_resyncs: set[Asset] = set()
+        self._book_seq_stats: dict[Asset, dict[str, int]] = {
+            asset: {"gaps": 0, "stale": 0, "resyncs": 0}
+            for asset in self.subscribed_assets
+        }
 
         self.bids: dict[Asset, SortedDict[float, float]] = {
             asset: SortedDict[float, float]() for asset in self.subscribed_assets
@@ -53,6 +117,9 @@ class KrakenFutureWebsocketClient(WebSocketClient):
 
     @override
     async def on_connect(self) -> None:
+        # the full subscription sends a book_snapshot for every asset
+        self._book_seqs.clear()
+        self._pending_resyncs.clear()
         await self._subscribe_trades()
         await self._subscribe_book()
 
@@ -105,69 +172,217 @@ class KrakenFutureWebsocketClient(WebSocketClient):
             _logger.info(f"Subscribed to {feed_type} feed for products: {product_ids}")
             return
 
-        match feed_type:
-            case "trade_snapshot":
-                prod_assert(
-                    self.subscription_confirmations["trade"],
-                    "Cannot receieve trade_snapshot message without subscription to trades",
-                )
-                for trade_data in message.get("trades", []):
-                    trade_message = self._parse_trade_message(trade_data)
-                    self.trade_messages.append(trade_message)
-                _logger.debug(
-                    f"Appended {len(message.get('trades', []))} trade messages."
-                )
+        if event == "unsubscribed":
+            _logger.info(
+                f"Unsubscribed from {feed_type} feed for products: {message.get('product_ids', [])}"
+            )
+            return
 
-            case "trade":
-                prod_assert(
-                    self.subscription_confirmations[feed_type],
-                    "Cannot receieve trade message without subscription to trades",
-                )
-                trade_message = self._parse_trade_message(message)
-                self.trade_messages.append(trade_message)
+        handler = (
+            self._feed_handlers.get(feed_type) if isinstance(feed_type, str) else None
+        )
+        if handler is None:
+            _logger.warning(f"Received unknown message feed type: {feed_type}")
+            return
 
-            case "book_snapshot":
-                prod_assert(
-                    self.subscription_confirmations["book"],
-                    "Cannot receieve book_snapshot message without subscription to book",
-                )
-                self._parse_book_snapshot(message)
+        if self._block_on_full_trades and feed_type in ("trade", "trade_snapshot"):
+            await self._on_trades_blocking(feed_type, message)
+        else:
+            handler(message)
 
-            case "book":
-                prod_assert(
-                    self.subscription_confirmations[feed_type],
-                    "Cannot receieve book message without subscription to book",
-                )
-                prod_assert(
-                    "price" in message and "qty" in message,
-                    f"Received message without price/qty {message}",
-                )
-                feedcode = message["product_id"]
-                price = float(message["price"])
-                qty = float(message["qty"])
-                asset = kraken_to_asset(feedcode)
+        if self._pending_resyncs:
+            await self._resync_books()
+
+        if (
+            self._collect_feed_metrics
+            and self.receive_time is not None
+            and self.receive_wall_time is not None
+        ):
+            self._record_feed_metrics(
+                message["feed"], message, self.receive_time, self.receive_wall_time
+            )
 
-                self._update_order_book(asset, price, qty, message.get("side"))
+    def _record_feed_metrics(
+        self,
+        feed_type: str,
+        message: dict[str, Any],
+        receive_time: float,
+        receive_wall_time: float,
+    ) -> None:
+        # snapshots of past trades carry old trade times, so only live trades and
+        # book messages give an exchange to receive latency
+        if feed_type == "trade":
+            exchange_ms = message.get("time")
+        elif feed_type in ("book", "book_snapshot"):
+            exchange_ms = message.get("timestamp")
+        else:
+            exchange_ms = None
+
+        self.feed_metrics.record(
+            feed_type,
+            message.get("product_id", ""),
+            receive_time,
+            receive_wall_time,
+            time.perf_counter(),
+            exchange_ms / 1000 if exchange_ms is not None else None,
+        )
+
+    def feed_metrics_snapshot(self) -> dict[str, Any]:
+        return self.feed_metrics.snapshot()
+
+    async def _on_trades_blocking(
+        self, feed_type: str, message: dict[str, Any]
+    ) -> None:
+        prod_assert(
+            self.subscription_confirmations.get("trade", False),
+            f"Cannot receieve {feed_type} message without subscription to trades",
+        )
+        trades = (
+            message.get("trades", []) if feed_type == "trade_snapshot" else [message]
+        )
+
+        # a trade snapshot can hold more trades than a buffer, so space is waited
+        # for trade by trade and the consumer drains the buffer in between
+        for trade_data in trades:
+            asset = self._resolve_asset(trade_data["product_id"])
+            await self.trade_buffers[asset].wait_for_space()
+            self._push_trade(trade_data)
+
+    def _resolve_asset(self, feedcode: str) -> Asset:
+        asset = self._feedcode_to_asset.get(feedcode)
+        if asset is None:
+            asset = kraken_to_asset(feedcode)
+            self._feedcode_to_asset[feedcode] = asset
+        return asset
+
+    def _on_trade_snapshot(self, message: dict[str, Any]) -> None:
+        prod_assert(
+            self.subscription_confirmations.get("trade", False),
+            "Cannot receieve trade_snapshot message without subscription to trades",
+        )
+        trades = message.get("trades", [])
+        for trade_data in trades:
+            self._push_trade(trade_data)
+        _logger.debug(f"Appended {len(trades)} trade messages.")
+
+    def _on_trade(self, message: dict[str, Any]) -> None:
+        prod_assert(
+            self.subscription_confirmations.get("trade", False),
+            "Cannot receieve trade message without subscription to trades",
+        )
+        self._push_trade(message)
+
+    def _on_book_snapshot(self, message: dict[str, Any]) -> None:
+        prod_assert(
+            self.subscription_confirmations.get("book", False),
+            "Cannot receieve book_snapshot message without subscription to book",
+        )
+        self._parse_book_snapshot(message)
 
-            case _:
-                _logger.warning(f"Received unknown message feed type: {feed_type}")
+    def _on_book(self, message: dict[str, Any]) -> None:
+        prod_assert(
+            self.subscription_confirmations.get("book", False),
+            "Cannot receieve book message without subscription to book",
+        )
+        prod_assert(
+            "price" in message and "qty" in message,
+            lambda: f"Received message without price/qty {message}",
+        )
+        asset = self._resolve_asset(message["product_id"])
+        if not self._check_book_seq(asset, message.get("seq")):
+            return
+
+        self._book_times[asset] = self._book_time(message)
+        self._update_order_book(
+            asset,
+            float(message["price"]),
+            float(message["qty"]),
+            message.get("side"),
+        )
+
+    def _check_book_seq(self, asset: Asset, seq: Optional[int]) -> bool:
+        if asset in self._resyncing_assets:
+            return False
+
+        last_seq = self._book_seqs.get(asset)
+        if seq is None or last_seq is None:
+            if seq is not None:
+                self._book_seqs[asset] = seq
+            return True
+
+        if seq <= last_seq:
+            self._book_seq_stats[asset]["stale"] += 1
+            return False
+
+        if seq != last_seq + 1:
+            self._book_seq_stats[asset]["gaps"] += 1
+            _logger.warning(
+                f"Book sequence gap for {asset} (expected '{last_seq + 1}', got '{seq}'), resyncing"
+            )
+            self._resyncing_assets.add(asset)
+            self._pending_resyncs.add(asset)
+            return False
+
+        self._book_seqs[asset] = seq
+        return True
+
+    async def _resync_books(self) -> None:
+        if self.ws is None:
+            _logger.warning("Cannot resync books without a connection")
+            return
+
+        # only the gapped products are resubscribed, the connection and the
+        # other books are left alone
+        product_ids = [
+            asset_to_kraken(asset, Market.KRAKEN_USD_FUTURE)
+            for asset in self._pending_resyncs
+        ]
+        for asset in self._pending_resyncs:
+            self._book_seq_stats[asset]["resyncs"] += 1
+        self._pending_resyncs.clear()
+
+        for event in ("unsubscribe", "subscribe"):
+            await self.ws.send(
+                json.dumps({"event": event, "feed": "book", "product_ids": product_ids})
+            )
+        _logger.info(f"Resubscribed book feed for products: {product_ids}")
+
+    def book_sequence_stats(self) -> dict[Asset, dict[str, Any]]:
+        return {
+            asset: {
+                **stats,
+                "seq": self._book_seqs.get(asset),
+                "resyncing": asset in self._resyncing_assets,
+            }
+            for asset, stats in self._book_seq_stats.items()
+        }
 
     def _update_order_book(
         self, asset: Asset, price: float, qty: float, side: Optional[str]
     ) -> None:
         if side == "buy":
-            if qty == 0.0 and price in self.bids[asset]:
-                del self.bids[asset][price]
-            else:
-                self.bids[asset][price] = qty
-
+            book = self.bids[asset]
+            order_side = OrderSide.BID
         elif side == "sell":
-            if qty == 0.0 and price in self.asks[asset]:
-                del self.asks[asset][price]
-            else:
-                self.asks[asset][price] = qty
+            book = self.asks[asset]
+            order_side = OrderSide.ASK
         else:
             _logger.warning(f"Unknown side '{side}' in order book update for {asset}")
+            return
+
+        if qty == 0.0:
+            book.pop(price, None)
+        else:
+            book[price] = qty
+        self._dirty_assets.add(asset)
+
+        self._subscriptions.publish(
+            (asset, FeedEvent.BOOK_UPDATE),
+            asset,
+            FeedEvent.BOOK_UPDATE,
+            [(order_side, price, qty)],
+        )
+        self._publish_top_of_book(asset)
 
     def _parse_trade_message(self, trade_data: dict[str, Any]) -> TradeMessage:
         prod_assert(
@@ -175,7 +390,7 @@ class KrakenFutureWebsocketClient(WebSocketClient):
             and "product_id" in trade_data
             and "price" in trade_data
             and "qty" in trade_data,
-            f"Missing TradeMessage param in message: {trade_data}",
+            lambda: f"Missing TradeMessage param in message: {trade_data}",
         )
         return TradeMessage(
             time=trade_data["time"],
@@ -187,13 +402,34 @@ class KrakenFutureWebsocketClient(WebSocketClient):
             market=Market.KRAKEN_USD_FUTURE,
         )
 
+    def _push_trade(self, trade_data: dict[str, Any]) -> None:
+        trade = self._parse_trade_message(trade_data)
+        asset = self._resolve_asset(trade.feedcode)
+        buffer = self.trade_buffers[asset]
+        if not buffer.push((trade.time, trade.price, trade.quantity, trade.side.value)):
+            _logger.warning(f"Dropped {trade.feedcode} trade, trade buffer is full")
+
+        self._subscriptions.publish(
+            (asset, FeedEvent.TRADE), asset, FeedEvent.TRADE, trade
+        )
+
     def _parse_book_snapshot(self, data: dict[str, Any]) -> None:
         prod_assert(
             "product_id" in data,
-            f"Received book message without feedcode in message: {data}",
+            lambda: f"Received book message without feedcode in message: {data}",
         )
-        feedcode = data["product_id"]
-        asset = kraken_to_asset(feedcode)
+        asset = self._resolve_asset(data["product_id"])
+        self._book_times[asset] = self._book_time(data)
+
+        # a snapshot replaces the book, levels missing from it are stale
+        self.bids[asset].clear()
+        self.asks[asset].clear()
+        self._resyncing_assets.discard(asset)
+        if "seq" in data:
+            self._book_seqs[asset] = data["seq"]
+        else:
+            self._book_seqs.pop(asset, None)
+
         for bid in data.get("bids", []):
             price = float(bid["price"])
             qty = float(bid["qty"])
@@ -204,20 +440,127 @@ class KrakenFutureWebsocketClient(WebSocketClient):
             qty = float(ask["qty"])
             self.asks[asset][price] = qty
 
+        self._dirty_assets.add(asset)
+
+        if self._subscriptions.has_subscribers((asset, FeedEvent.BOOK_UPDATE)):
+            levels = [
+                (OrderSide.BID, float(bid["price"]), float(bid["qty"]))
+                for bid in data.get("bids", [])
+            ] + [
+                (OrderSide.ASK, float(ask["price"]), float(ask["qty"]))
+                for ask in data.get("asks", [])
+            ]
+            self._subscriptions.publish(
+                (asset, FeedEvent.BOOK_UPDATE), asset, FeedEvent.BOOK_UPDATE, levels
+            )
+        self._publish_top_of_book(asset)
+
+    def _book_time(self, message: dict[str, Any]) -> float:
+        timestamp = message.get("timestamp")
+        return timestamp / 1000 if timestamp is not None else time.time()
+
+    def _publish_top_of_book(self, asset: Asset) -> None:
+        key = (asset, FeedEvent.TOP_OF_BOOK)
+        if not self._subscriptions.has_subscribers(key):
+            return
+
+        top = self.top_of_book(asset)
+        if top != self._last_top_of_book.get(asset):
+            self._last_top_of_book[asset] = top
+            self._subscriptions.publish(key, asset, FeedEvent.TOP_OF_BOOK, top)
+
+    def subscribe(
+        self,
+        handler: SubscriptionHandler,
+        events: Optional[Iterable[FeedEvent]] = None,
+        assets: Optional[Iterable[Asset]] = None,
+        predicate: Optional[Callable[[Asset, FeedEvent, Any], bool]] = None,
+    ) -> Subscription:
+        # handlers are called inline as handler(asset, event, payload) right after
+        # the message is applied, queues receive the same tuple
+        events = list(FeedEvent) if events is None else list(events)
+        assets = self.subscribed_assets if assets is None else list(assets)
+        for asset in assets:
+            if asset not in self.trade_buffers:
+                raise ValueError(f"Asset is not subscribed (got '{asset}')")
+
+        if FeedEvent.TOP_OF_BOOK in events:
+            for asset in assets:
+                self._last_top_of_book[asset] = self.top_of_book(asset)
+
+        return self._subscriptions.subscribe(
+            [(asset, event) for asset in assets for event in events],
+            handler,
+            predicate,
+        )
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.unsubscribe(subscription)
+
+    def poll_trade_arrays(self) -> dict[Asset, list[np.ndarray]]:
+        return {
+            asset: buffer.poll()
+            for asset, buffer in self.trade_buffers.items()
+            if len(buffer)
+        }
+
     def poll_trades(self) -> list[TradeMessage]:
-        trades = self.trade_messages[:]
-        self.trade_messages.clear()
+        trades = []
+        for asset, arrs in self.poll_trade_arrays().items():
+            feedcode = self.snapshot_messages[asset].feedcode
+            for arr in arrs:
+                for trade_time, price, quantity, side in arr.tolist():
+                    trades.append(
+                        TradeMessage(
+                            trade_time,
+                            feedcode,
+                            1,
+                            price,
+                            quantity,
+                            OrderSide(side),
+                            Market.KRAKEN_USD_FUTURE,
+                        )
+                    )
+
+        trades.sort(key=lambda trade: trade.time)
         return trades
 
-    def poll_snapshots(self) -> dict[Asset, SnapshotMessage]:
+    def trade_buffer_stats(self) -> dict[Asset, dict[str, Any]]:
+        return {asset: buffer.stats() for asset, buffer in self.trade_buffers.items()}
+
+    def book_time(self, asset: Asset) -> float:
+        # exchange time of the last applied book message in seconds
+        return self._book_times.get(asset, time.time())
+
+    def _build_snapshot(self, asset: Asset, depth: Optional[int]) -> SnapshotMessage:
+        return book_snapshot(
+            int(self.book_time(asset)),
+            self.snapshot_messages[asset].feedcode,
+            self.bids[asset],
+            self.asks[asset],
+            depth,
+        )
+
+    def poll_snapshots(
+        self, depth: Optional[int] = None
+    ) -> dict[Asset, SnapshotMessage]:
+        if depth is not None and depth < 0:
+            raise ValueError(f"Depth must be non-negative (got '{depth}')")
+
+        # returned snapshots are never mutated, an asset whose book changed gets a
+        # new SnapshotMessage and unchanged ones are handed out again as is
         for asset in self.subscribed_assets:
-            self.snapshot_messages[asset].time = int(time.time())
-            self.snapshot_messages[asset].bids = [
-                (price, quantity)
-                for price, quantity in reversed(self.bids[asset].items())
-            ]
-            self.snapshot_messages[asset].asks = [
-                (price, quantity) for price, quantity in self.asks[asset].items()
-            ]
+            if asset in self._dirty_assets or self._snapshot_depths[asset] != depth:
+                self.snapshot_messages[asset] = self._build_snapshot(asset, depth)
+                self._snapshot_depths[asset] = depth
+
+        self._dirty_assets.clear()
+        return dict(self.snapshot_messages)
 
-        return self.snapshot_messages
+    def top_of_book(self, asset: Asset) -> TopOfBook:
+        bids = self.bids[asset]
+        asks = self.asks[asset]
+        return (
+            bids.peekitem(-1) if bids else None,
+            asks.peekitem(0) if asks else None,
+        )
@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+from enum import Enum
+from typing import Any, Callable, Iterable, Optional
+
+import numpy as np
+from sortedcontainers import SortedDict
+
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    FeedEvent,
+    KrakenFutureWebsocketClient,
+    TopOfBook,
+)
+from pysrc.adapters.messages import SnapshotMessage, TradeMessage
+from pysrc.util.ring_buffer import OverflowPolicy
+from pysrc.util.subscriptions import Subscription, SubscriptionHandler
+from pysrc.util.types import Asset
+
+
+class ShardingPolicy(Enum):
+    ROUND_ROBIN = 1
+    WEIGHTED = 2
+
+
+def assign_shards(
+    assets: list[Asset],
+    num_shards: int,
+    policy: ShardingPolicy = ShardingPolicy.ROUND_ROBIN,
+    asset_weights: Optional[dict[Asset, float]] = None,
+) -> list[list[Asset]]:
+    if num_shards <= 0:
+        raise ValueError(f"Number of shards must be positive (got '{num_shards}')")
+
+    num_shards = min(num_shards, len(assets))
+    shards: list[list[Asset]] = [[] for _ in range(num_shards)]
+
+    match policy:
+        case ShardingPolicy.ROUND_ROBIN:
+            for i, asset in enumerate(assets):
+                shards[i % num_shards].append(asset)
+        case ShardingPolicy.WEIGHTED:
+            # heaviest assets first, each onto the currently lightest shard
+            weights = asset_weights or {}
+            loads = [(0.0, i) for i in range(num_shards)]
+            for asset in sorted(assets, key=lambda a: -weights.get(a, 1.0)):
+                load, i = heapq.heappop(loads)
+                shards[i].append(asset)
+                heapq.heappush(loads, (load + weights.get(asset, 1.0), i))
+        case _:
+            raise ValueError(f"Unknown sharding policy (got '{policy}')")
+
+    return shards
+
+
+class KrakenFutureWebsocketPool:
+    def __init__(
+        self,
+        subscribed_assets: list[Asset],
+        num_connections: int = 2,
+        sharding_policy: ShardingPolicy = ShardingPolicy.ROUND_ROBIN,
+        asset_weights: Optional[dict[Asset, float]] = None,
+        retry_delay: int = 5,
+        max_retries: Optional[int] = None,
+        json_backend: Optional[str] = None,
+        trade_buffer_capacity: int = 1 << 16,
+        trade_overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        base_url: str = KrakenFutureWebsocketClient.BASE_URL,
+    ) -> None:
+        self.subscribed_assets = subscribed_assets
+
+        # every shard is a full client on its own connection and task, so a busy
+        # book only delays the assets sharing its connection and each shard
+        # reconnects on its own
+        self.shards = [
+            KrakenFutureWebsocketClient(
+                assets,
+                retry_delay=retry_delay,
+                max_retries=max_retries,
+                json_backend=json_backend,
+                trade_buffer_capacity=trade_buffer_capacity,
+                trade_overflow_policy=trade_overflow_policy,
+                base_url=base_url,
+            )
+            for assets in assign_shards(
+                subscribed_assets, num_connections, sharding_policy, asset_weights
+            )
+        ]
+        self._asset_to_shard = {
+            asset: shard for shard in self.shards for asset in shard.subscribed_assets
+        }
+
+        self.bids: dict[Asset, SortedDict[float, float]] = {
+            asset: shard.bids[asset] for asset, shard in self._asset_to_shard.items()
+        }
+        self.asks: dict[Asset, SortedDict[float, float]] = {
+            asset: shard.asks[asset] for asset, shard in self._asset_to_shard.items()
+        }
+
+    def start(self) -> None:
+        for shard in self.shards:
+            shard.start()
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(shard.stop() for shard in self.shards))
+
+    def shard_for(self, asset: Asset) -> KrakenFutureWebsocketClient:
+        shard = self._asset_to_shard.get(asset)
+        if shard is None:
+            raise ValueError(f"Asset is not subscribed (got '{asset}')")
+        return shard
+
+    def poll_trade_arrays(self) -> dict[Asset, list[np.ndarray]]:
+        arrays: dict[Asset, list[np.ndarray]] = {}
+        for shard in self.shards:
+            arrays.update(shard.poll_trade_arrays())
+        return arrays
+
+    def poll_trades(self) -> list[TradeMessage]:
+        trades = [trade for shard in self.shards for trade in shard.poll_trades()]
+        trades.sort(key=lambda trade: trade.time)
+        return trades
+
+    def trade_buffer_stats(self) -> dict[Asset, dict[str, Any]]:
+        stats: dict[Asset, dict[str, Any]] = {}
+        for shard in self.shards:
+            stats.update(shard.trade_buffer_stats())
+        return stats
+
+    def poll_snapshots(
+        self, depth: Optional[int] = None
+    ) -> dict[Asset, SnapshotMessage]:
+        snapshots: dict[Asset, SnapshotMessage] = {}
+        for shard in self.shards:
+            snapshots.update(shard.poll_snapshots(depth))
+        return snapshots
+
+    def book_time(self, asset: Asset) -> float:
+        return self.shard_for(asset).book_time(asset)
+
+    def top_of_book(self, asset: Asset) -> TopOfBook:
+        return self.shard_for(asset).top_of_book(asset)
+
+    def subscribe(
+        self,
+        handler: SubscriptionHandler,
+        events: Optional[Iterable[FeedEvent]] = None,
+        assets: Optional[Iterable[Asset]] = None,
+        predicate: Optional[Callable[[Asset, FeedEvent, Any], bool]] = None,
+    ) -> list[Subscription]:
+        events = list(FeedEvent) if events is None else list(events)
+        assets = self.subscribed_assets if assets is None else list(assets)
+
+        shard_assets: dict[int, list[Asset]] = {}
+        for asset in assets:
+            shard_assets.setdefault(id(self.shard_for(asset)), []).append(asset)
+
+        return [
+            shard.subscribe(handler, events, shard_assets[id(shard)], predicate)
+            for shard in self.shards
+            if id(shard) in shard_assets
+        ]
+
+    def unsubscribe(self, subscriptions: list[Subscription]) -> None:
+        for subscription in subscriptions:
+            for shard in self.shards:
+                shard.unsubscribe(subscription)
+
+    def connection_stats(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "assets": shard.subscribed_assets,
+                "latency": shard.latency_stats.to_dict(),
+                "feeds": shard.feed_metrics_snapshot(),
+            }
+            for shard in self.shards
+        ]
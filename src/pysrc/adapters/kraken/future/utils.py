@@ -1,6 +1,14 @@
-from typing import Any
+import base64
+import hashlib
+import hmac
+from typing import Any, Optional
+
+from sortedcontainers import SortedDict
 
 from pysrc.adapters.kraken.future.containers import (
+    OpenPosition,
+    Order,
+    OrderRequest,
     OrderStatus,
     OrderType,
     PositionSide,
@@ -9,7 +17,8 @@ from pysrc.adapters.kraken.future.containers import (
     TradeHistoryType,
     TriggerSignal,
 )
-from pysrc.util.types import OrderSide
+from pysrc.adapters.messages import SnapshotMessage
+from pysrc.util.types import Market, OrderSide
 
 
 def str_to_position_side(s: str) -> PositionSide:
@@ -132,3 +141,266 @@ def serialize_history(symbol: str, hist: dict) -> TradeHistory:
         transaction_identification_code=hist.get("transaction_identification_code"),
         to_be_cleared=hist.get("to_be_cleared"),
     )
+
+
+def compute_authent(private_key: str, encoded_data: str, api_route: str) -> str:
+    msg = encoded_data + api_route
+    hashed_msg = hashlib.sha256(msg.encode("utf-8")).digest()
+    decoded_key = base64.b64decode(private_key)
+
+    authent = hmac.new(decoded_key, hashed_msg, hashlib.sha512)
+    return base64.b64encode(authent.digest()).decode()
+
+
+def raise_for_error(res: dict, api_route: str) -> None:
+    if res["result"] != "error":
+        return
+
+    err = None
+    if "errors" in res:
+        err = res["errors"]
+    elif "error" in res:
+        err = res["error"]
+    else:
+        err = "Unknown error"
+
+    raise ValueError(f"Route {api_route} failed with error '{err}'")
+
+
+def serialize_open_position(position_json: dict) -> OpenPosition:
+    return OpenPosition(
+        position_side=str_to_position_side(position_json["side"]),
+        symbol=position_json["symbol"],
+        price=position_json["price"],
+        fill_time=position_json["fillTime"],
+        size=position_json["size"],
+    )
+
+
+def serialize_open_order(order_json: dict) -> Order:
+    unfilled_size = order_json["unfilledSize"]
+    filled_size = order_json.get("filledSize")
+
+    size = unfilled_size
+    if filled_size:
+        size += filled_size
+
+    return Order(
+        symbol=order_json["symbol"],
+        side=str_to_order_side(order_json["side"]),
+        size=size,
+        order_type=str_to_order_type(order_json["orderType"]),
+        status=str_to_order_status(order_json["status"]),
+        limit_price=order_json.get("limitPrice"),
+        stop_price=order_json.get("stopPrice"),
+        order_id=order_json["order_id"],
+        filled_size=filled_size,
+        unfilled_size=unfilled_size,
+        reduce_only=order_json["reduceOnly"],
+        trigger_signal=str_to_trigger_signal(order_json["triggerSignal"])
+        if "triggerSignal" in order_json
+        else None,
+        last_update_time=order_json["lastUpdateTime"],
+    )
+
+
+def serialize_order_status(order_obj_json: dict) -> Order:
+    order_json = order_obj_json["order"]
+
+    return Order(
+        symbol=order_json["symbol"],
+        side=str_to_order_side(order_json["side"]),
+        size=order_json.get("quantity"),
+        status=str_to_order_status(order_obj_json["status"]),
+        limit_price=order_json.get("limitPrice"),
+        order_id=order_json["orderId"],
+        filled_size=order_json.get("filledSize"),
+        reduce_only=order_json["reduceOnly"],
+        last_update_time=order_json["lastUpdateTimestamp"],
+    )
+
+
+def send_order_data(order_request: OrderRequest) -> dict[str, Any]:
+    order = order_request.order
+    if order.order_type is None:
+        raise ValueError("Order type must be specified")
+
+    return {
+        "orderType": order_type_to_str(order.order_type),
+        "symbol": order.symbol,
+        "side": order_side_to_str(order.side),
+        "size": order.size,
+        "ProcessBefore": order_request.process_before,
+        "limitPrice": order.limit_price,
+        "stopPrice": order.stop_price,
+        "triggerSignal": trigger_signal_to_str(order.trigger_signal)
+        if order.trigger_signal
+        else None,
+        "reduceOnly": order.reduce_only,
+        "trailingStopMaxDeviation": order_request.trailing_stop_max_deviation,
+        "trailingStopDeviationUnit": price_unit_to_str(
+            order_request.trailing_stop_deviation_unit
+        )
+        if order_request.trailing_stop_deviation_unit
+        else None,
+        "limitPriceOffsetValue": order_request.limit_price_offset_value,
+        "limitPriceOffsetUnit": price_unit_to_str(order_request.limit_price_offset_unit)
+        if order_request.limit_price_offset_unit
+        else None,
+    }
+
+
+def edit_order_data(order_request: OrderRequest) -> dict[str, Any]:
+    return {
+        "orderId": order_request.order.order_id,
+        "size": order_request.order.size,
+        "limitPrice": order_request.order.limit_price,
+        "stopPrice": order_request.order.stop_price,
+        "trailingStopMaxDeviation": order_request.trailing_stop_max_deviation,
+        "trailingStopDeviationUnit": price_unit_to_str(
+            order_request.trailing_stop_deviation_unit
+        )
+        if order_request.trailing_stop_deviation_unit
+        else None,
+    }
+
+
+def batch_send_item(order_request: OrderRequest, order_tag: str) -> dict[str, Any]:
+    order = order_request.order
+    if order.order_type is None:
+        raise ValueError(f"Order type for order tagged '{order_tag}' must be specified")
+
+    return {
+        "order_tag": order_tag,
+        "order": "send",
+        "orderType": order_type_to_str(order.order_type),
+        "symbol": order.symbol,
+        "side": order_side_to_str(order.side),
+        "size": order.size,
+        "limitPrice": order.limit_price,
+        "stopPrice": order.stop_price,
+        "triggerSignal": trigger_signal_to_str(order.trigger_signal)
+        if order.trigger_signal
+        else None,
+        "reduceOnly": order.reduce_only,
+        "trailingStopMaxDeviation": order_request.trailing_stop_max_deviation,
+        "trailingStopDeviationUnit": price_unit_to_str(
+            order_request.trailing_stop_deviation_unit
+        )
+        if order_request.trailing_stop_deviation_unit
+        else None,
+        "limitPriceOffsetValue": order_request.limit_price_offset_value,
+        "limitPriceOffsetUnit": price_unit_to_str(order_request.limit_price_offset_unit)
+        if order_request.limit_price_offset_unit
+        else None,
+    }
+
+
+def batch_edit_item(
+    order_request: OrderRequest, order_tag: Optional[str] = None
+) -> dict[str, Any]:
+    order = order_request.order
+    return {
+        "order_tag": order_tag,
+        "order": "edit",
+        "order_id": order.order_id,
+        "size": order.size,
+        "limitPrice": order.limit_price,
+        "stopPrice": order.stop_price,
+        "trailingStopMaxDeviation": order_request.trailing_stop_max_deviation,
+        "trailingStopDeviationUnit": price_unit_to_str(
+            order_request.trailing_stop_deviation_unit
+        )
+        if order_request.trailing_stop_deviation_unit
+        else None,
+    }
+
+
+def batch_cancel_item(order_id: str, order_tag: Optional[str] = None) -> dict[str, Any]:
+    return {"order_tag": order_tag, "order": "cancel", "order_id": order_id}
+
+
+def apply_send_status(order: Order, send_status: dict) -> Order:
+    if send_status["status"] not in (
+        order_status_to_str(OrderStatus.PLACED),
+        order_status_to_str(OrderStatus.PARTIALLY_FILLED),
+    ):
+        order.status = OrderStatus.REJECTED
+    else:
+        order.status = OrderStatus.PLACED
+
+    order.order_id = send_status.get("order_id")
+    return order
+
+
+def apply_edit_status(order_request: OrderRequest, edit_status: dict) -> bool:
+    if edit_status["status"] != order_status_to_str(OrderStatus.EDITED):
+        order_request.order.status = OrderStatus.REJECTED
+        return False
+
+    order_request.order.status = OrderStatus.PLACED
+    return True
+
+
+def apply_batch_send_statuses(
+    order_tag_to_order: dict[str, Order], batch_statuses: list[dict]
+) -> list[Order]:
+    for status in batch_statuses:
+        order = order_tag_to_order[status["order_tag"]]
+        order.order_id = status["order_id"]
+
+        if status["status"] != order_status_to_str(OrderStatus.PLACED):
+            order.status = OrderStatus.REJECTED
+        else:
+            order.status = OrderStatus.PLACED
+
+    return list(order_tag_to_order.values())
+
+
+def apply_batch_edit_statuses(
+    order_id_to_order_request: dict[Optional[str], OrderRequest],
+    batch_statuses: list[dict],
+) -> dict[OrderRequest, bool]:
+    statuses = {}
+    for status in batch_statuses:
+        order_request = order_id_to_order_request[status["order_id"]]
+        statuses[order_request] = apply_edit_status(order_request, status)
+
+    return statuses
+
+
+def batch_cancel_statuses(batch_statuses: list[dict]) -> dict[str, OrderStatus]:
+    return {
+        status["order_id"]: cancel_status_to_order_status(status["status"])
+        for status in batch_statuses
+    }
+
+
+def cancel_status_to_order_status(status: str) -> OrderStatus:
+    try:
+        return str_to_order_status(status)
+    except Exception:
+        # only happens if the order can't be found
+        return OrderStatus.REJECTED
+
+
+def book_snapshot(
+    time: int,
+    feedcode: str,
+    bids: SortedDict,
+    asks: SortedDict,
+    depth: Optional[int] = None,
+) -> SnapshotMessage:
+    # books are price sorted ascending, bids are handed out best first
+    bid_levels = bids.items()
+    ask_levels = asks.items()
+
+    snapshot = SnapshotMessage(time, feedcode, [], [], Market.KRAKEN_USD_FUTURE)
+    if depth is None:
+        snapshot.bids = list(reversed(bid_levels))
+        snapshot.asks = list(ask_levels)
+    else:
+        snapshot.bids = bid_levels[-depth:][::-1] if depth else []
+        snapshot.asks = ask_levels[:depth]
+
+    return snapshot
@@ -0,0 +1,130 @@
+import json
+import time
+from threading import Lock
+from typing import Any, Callable, Optional
+
+
+class BackfillMetrics:
+    def __init__(
+        self, on_progress: Optional[Callable[["BackfillMetrics"], None]] = None
+    ):
+        self._on_progress = on_progress
+        self._lock = Lock()
+        self._start_time = time.monotonic()
+
+        self.pages = 0
+        self.events = 0
+        self.bytes_downloaded = 0
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.queue_wait_seconds = 0.0
+
+        self.reconstructed_events = 0
+        self.reconstruction_seconds = 0.0
+
+        self.compressed_input_bytes = 0
+        self.compressed_output_bytes = 0
+        self.compression_seconds = 0.0
+
+        self.day_wall_times: dict[str, float] = {}
+        self.phase_wall_times: dict[str, float] = {}
+
+    def __getstate__(self) -> dict[str, Any]:
+        # worker processes get a detached copy; their updates are not merged back
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_on_progress"] = None
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def record_page(self, num_bytes: int) -> None:
+        with self._lock:
+            self.pages += 1
+            self.bytes_downloaded += num_bytes
+
+    def record_events(self, num_events: int) -> None:
+        with self._lock:
+            self.events += num_events
+
+    def record_queue_depth(self, depth: int) -> None:
+        with self._lock:
+            self.queue_depth = depth
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def record_reconstruction(
+        self, num_events: int, seconds: float, wait_seconds: float
+    ) -> None:
+        with self._lock:
+            self.reconstructed_events += num_events
+            self.reconstruction_seconds += max(0.0, seconds - wait_seconds)
+            self.queue_wait_seconds += wait_seconds
+
+    def record_compression(
+        self, input_bytes: int, output_bytes: int, seconds: float
+    ) -> None:
+        with self._lock:
+            self.compressed_input_bytes += input_bytes
+            self.compressed_output_bytes += output_bytes
+            self.compression_seconds += seconds
+
+    def record_day(self, day: str, seconds: float) -> None:
+        with self._lock:
+            self.day_wall_times[day] = seconds
+
+        self._notify()
+
+    def record_phase(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phase_wall_times[phase] = (
+                self.phase_wall_times.get(phase, 0.0) + seconds
+            )
+
+        self._notify()
+
+    def _notify(self) -> None:
+        if self._on_progress is not None:
+            self._on_progress(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self._start_time
+
+            return {
+                "elapsed_seconds": elapsed,
+                "pages": self.pages,
+                "pages_per_sec": _rate(self.pages, elapsed),
+                "events": self.events,
+                "events_per_sec": _rate(self.events, elapsed),
+                "bytes_downloaded": self.bytes_downloaded,
+                "download_mb_per_sec": _rate(self.bytes_downloaded / 1e6, elapsed),
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "queue_wait_seconds": self.queue_wait_seconds,
+                "reconstructed_events": self.reconstructed_events,
+                "reconstruction_seconds": self.reconstruction_seconds,
+                "reconstruction_events_per_sec": _rate(
+                    self.reconstructed_events, self.reconstruction_seconds
+                ),
+                "compressed_input_bytes": self.compressed_input_bytes,
+                "compressed_output_bytes": self.compressed_output_bytes,
+                "compression_seconds": self.compression_seconds,
+                "compression_mb_per_sec": _rate(
+                    self.compressed_input_bytes / 1e6, self.compression_seconds
+                ),
+                "day_wall_times": dict(self.day_wall_times),
+                "phase_wall_times": dict(self.phase_wall_times),
+            }
+
+    def write_report(self, report_path: str) -> None:
+        with open(report_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def _rate(amount: float, seconds: float) -> float:
+    if seconds <= 0:
+        return 0.0
+    return amount / seconds
@@ -1,213 +1,242 @@
 import concurrent.futures
+import io
+import json
+import logging
 import multiprocessing as mp
 import os
 import shutil
+import time
 import zipfile
 from collections import defaultdict
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import IO, Any, BinaryIO, Generator, Iterable, Optional
 
 import numpy as np
-import requests
-from pyzstd import CParameter, compress, decompress
-
+from pyzstd import CParameter, ZstdCompressor, decompress
+
+from pysrc.adapters.kraken.historical.backfill_metrics import BackfillMetrics
+from pysrc.adapters.kraken.historical.trades.trades_source import (
+    HISTORICAL_DRIVE_FOLDER_ID,
+    BaseTradesSource,
+    DriveTradesSource,
+    TradesSourceFile,
+)
 from pysrc.adapters.messages import TradeMessage
 from pysrc.util.types import Market, OrderSide
 
-HISTORICAL_DRIVE_FOLDER_ID = "188O9xQjZTythjyLNes_5zfMEFaMbTT22"
+_logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+_MIN_BISECT_BLOCK_SIZE = 1 << 16
+_MANIFEST_FILE_NAME = "manifest.json"
+_STAGING_DIR_NAME = ".staging"
 
 
 class HistoricalTradesDataClient:
-    def __init__(self, drive_auth_token: Optional[str] = None, max_cores: int = 8):
+    def __init__(
+        self,
+        drive_auth_token: Optional[str] = None,
+        max_cores: int = 8,
+        metrics: Optional[BackfillMetrics] = None,
+        block_size: int = 64 << 20,
+        max_concurrent_downloads: int = 4,
+    ):
         self._drive_auth_token = drive_auth_token
+        self.metrics = metrics if metrics is not None else BackfillMetrics()
 
         self._max_cores = max_cores
         if self._max_cores <= 0:
             raise ValueError(f"Max cores must be positive (got '{self._max_cores}')")
 
-        self._np_dtype = [("time", "u8"), ("price", "f4"), ("volume", "f4")]
-        self._zstd_options = {CParameter.compressionLevel: 10}
+        self._block_size = block_size
+        if self._block_size <= 0:
+            raise ValueError(f"Block size must be positive (got '{self._block_size}')")
 
-    def _list_drive_files(self, folder_id: str) -> list[tuple[str, str]]:
-        url = "https://www.googleapis.com/drive/v3/files/"
-        params = {
-            "q": f"'{folder_id}' in parents",
-            "fields": "files(id, name)",
-        }
+        self._max_concurrent_downloads = max_concurrent_downloads
+        if self._max_concurrent_downloads <= 0:
+            raise ValueError(
+                f"Max concurrent downloads must be positive (got '{self._max_concurrent_downloads}')"
+            )
 
-        headers = {"Authorization": f"Bearer {self._drive_auth_token}"}
+        self._np_dtype = [("time", "u8"), ("price", "f4"), ("volume", "f4")]
+        # times are parsed as floats first, parsing straight into u8 wraps
+        # negative times and truncates fractional ones instead of failing
+        self._np_parse_dtype = [("time", "f8"), ("price", "f4"), ("volume", "f4")]
+        self._np_range_dtype = np.dtype(self._np_dtype + [("pair_id", "u2")])
+        self._zstd_options = {CParameter.compressionLevel: 10}
 
-        res = requests.get(url, headers=headers, params=params)
-        if res.status_code != 200:
-            raise ValueError(f"Failed to list files from drive: {res.text}")
+    def _list_zip_members(
+        self, zip_paths: list[str]
+    ) -> tuple[dict[str, list[tuple[str, str]]], int]:
+        pairs_to_members = defaultdict(list)
+        total_size = 0
+
+        for zip_path in zip_paths:
+            with zipfile.ZipFile(zip_path, "r") as zip_f:
+                for info in zip_f.infolist():
+                    if info.is_dir():
+                        continue
+
+                    pair = os.path.splitext(os.path.basename(info.filename))[0]
+                    pairs_to_members[pair].append((zip_path, info.filename))
+                    total_size += info.file_size
+
+        return pairs_to_members, total_size
+
+    def _read_csv_blocks(self, f: IO[bytes]) -> Generator[bytes, None, None]:
+        remainder = b""
+        while True:
+            data = f.read(self._block_size)
+            if not data:
+                break
+
+            data = remainder + data
+            end = data.rfind(b"\n") + 1
+
+            remainder = data[end:]
+            if end:
+                yield data[:end]
+
+        if remainder.strip():
+            yield remainder
+
+    def _parse_csv_block(self, block: bytes) -> np.ndarray:
+        try:
+            arr = np.loadtxt(
+                io.BytesIO(block),
+                delimiter=",",
+                dtype=self._np_parse_dtype,
+                ndmin=1,
+                comments=None,
+            )
+        except ValueError:
+            pass
+        else:
+            times = arr["time"]
+            if ((times >= 0) & (times == np.floor(times))).all():
+                return arr.astype(self._np_dtype)
+
+        # narrow down to the malformed lines so the rest still goes through loadtxt
+        mid = block.rfind(b"\n", 0, len(block) // 2) + 1
+        if len(block) <= _MIN_BISECT_BLOCK_SIZE or not mid:
+            return self._parse_csv_lines(block)
+
+        return np.concatenate(
+            (self._parse_csv_block(block[:mid]), self._parse_csv_block(block[mid:]))
+        )
 
-        files = []
-        for f in res.json().get("files", []):
-            file_name, file_id = f["name"], f["id"]
-            files.append((file_name, file_id))
+    def _parse_csv_lines(self, block: bytes) -> np.ndarray:
+        rows: list[tuple[int, float, float]] = []
+        num_malformed = 0
 
-        return files
+        for line in block.splitlines():
+            if not line.strip():
+                continue
 
-    def _download_drive_file(self, file_id: str, download_path: str) -> None:
-        url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&acknowledgeAbuse=true"
+            try:
+                time_str, price_str, volume_str = line.split(b",")
+                row = (int(time_str), float(price_str), float(volume_str))
+            except ValueError:
+                num_malformed += 1
+                continue
 
-        headers = {"Authorization": f"Bearer {self._drive_auth_token}"}
+            if row[0] < 0:
+                num_malformed += 1
+                continue
 
-        res = requests.get(url, headers=headers, stream=True)
+            rows.append(row)
 
-        if res.status_code != 200:
-            raise ValueError(f"Failed to download {file_id} with: {res.text}")
+        if num_malformed:
+            _logger.warning(f"Skipped {num_malformed} malformed trade rows")
 
-        with open(download_path, "wb") as f:
-            for chunk in res.iter_content(chunk_size=8192):
-                f.write(chunk)
+        return np.array(rows, dtype=self._np_dtype)
 
-    def _download_data_from_drive(
-        self, download_path: str, drive_folder_id: str
+    def _convert_csv_files(
+        self, csv_files: Iterable[IO[bytes]], output_dir: str
     ) -> list[str]:
-        drive_files = self._list_drive_files(drive_folder_id)
-
-        downloaded_zip_paths = []
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=len(drive_files)
-        ) as executor:
-            futures = []
-            for file_name, file_id in self._list_drive_files(drive_folder_id):
-                download_file_path = os.path.join(download_path, file_name)
-                downloaded_zip_paths.append(download_file_path)
-
-                future = executor.submit(
-                    self._download_drive_file, file_id, download_file_path
-                )
-                futures.append(future)
-
-            for future in futures:
-                future.result()
-
-        dir_paths = []
-        for zip_file_path in downloaded_zip_paths:
-            dir_path = os.path.splitext(zip_file_path)[0]
-            os.makedirs(dir_path)
-
-            with zipfile.ZipFile(zip_file_path, "r") as zip_f:
-                zip_f.extractall(dir_path)
-
-            os.remove(zip_file_path)
-            dir_paths.append(dir_path)
-
-        dir_paths.sort()
-
-        pairs_to_file_paths = defaultdict(list)
-        for path in dir_paths:
-            for file_name in os.listdir(path):
-                pair = os.path.splitext(file_name)[0]
-                file_path = os.path.join(path, file_name)
-                pairs_to_file_paths[pair].append(file_path)
-
-        pair_dir_paths = []
-        for pair, file_paths in pairs_to_file_paths.items():
-            pair_dir_path = os.path.join(download_path, pair)
-            pair_dir_paths.append(pair_dir_path)
-            os.mkdir(pair_dir_path)
-
-            merged_file_path = os.path.join(pair_dir_path, pair + ".csv")
-            for file_path in file_paths:
-                with open(file_path) as f:
-                    with open(merged_file_path, "a") as merged_f:
-                        merged_f.write(f.read())
-
-        for path in dir_paths:
-            shutil.rmtree(path)
-
-        return pair_dir_paths
-
-    def _chunk_csv_by_day(self, csv_path: str) -> list[str]:
-        dir_path = os.path.dirname(csv_path)
-        chunk_file_paths: list[str] = []
-
-        with open(csv_path) as f:
-            line = f.readline()
-
-            if not line:
-                return chunk_file_paths
-
-            inital_time, _, _ = line.split(",")
-            current_date = datetime.fromtimestamp(int(inital_time), tz=timezone.utc)
-            current_eod = int(
-                datetime(
-                    current_date.year, current_date.month, current_date.day, 23, 59, 59
-                ).timestamp()
-            )
-
-            chunk_file_path = os.path.join(
-                dir_path, current_date.strftime("%m_%d_%Y") + ".csv"
-            )
-            chunk_file_paths.append(chunk_file_path)
-
-            chunk_file = open(chunk_file_path, "w")
-            chunk_file.write(line)
+        output_paths: list[str] = []
+
+        cur_day = -1
+        out_file: Optional[BinaryIO] = None
+        compressor: Optional[ZstdCompressor] = None
+
+        try:
+            for csv_file in csv_files:
+                for block in self._read_csv_blocks(csv_file):
+                    arr = self._parse_csv_block(block)
+                    if not len(arr):
+                        continue
+
+                    days = arr["time"] // SECONDS_PER_DAY
+                    split_idxs = np.flatnonzero(np.diff(days)) + 1
+
+                    for day_arr in np.split(arr, split_idxs):
+                        day = int(day_arr["time"][0] // SECONDS_PER_DAY)
+
+                        if out_file is None or compressor is None or day != cur_day:
+                            if out_file is not None and compressor is not None:
+                                out_file.write(compressor.flush())
+                                out_file.close()
+
+                            output_path = os.path.join(
+                                output_dir,
+                                datetime.fromtimestamp(
+                                    day * SECONDS_PER_DAY, tz=timezone.utc
+                                ).strftime("%m_%d_%Y")
+                                + ".bin",
+                            )
+
+                            # a day seen again is appended as another zstd frame
+                            # rather than truncating what was already written
+                            if output_path in output_paths:
+                                out_file = open(output_path, "ab")
+                            else:
+                                out_file = open(output_path, "wb")
+                                output_paths.append(output_path)
+
+                            compressor = ZstdCompressor(
+                                level_or_option=self._zstd_options
+                            )
+                            cur_day = day
+
+                        out_file.write(compressor.compress(day_arr.tobytes()))
+        finally:
+            if out_file is not None and compressor is not None:
+                out_file.write(compressor.flush())
+                out_file.close()
+
+        return output_paths
+
+    def _convert_pair(
+        self, zip_members: list[tuple[str, str]], output_dir: str
+    ) -> list[str]:
+        os.makedirs(output_dir, exist_ok=True)
 
-            for line in f.readlines():
-                line_time, _, _ = line.split(",")
+        def open_csv_files() -> Generator[IO[bytes], None, None]:
+            for zip_path, member_name in zip_members:
+                with zipfile.ZipFile(zip_path, "r") as zip_f:
+                    with zip_f.open(member_name, "r") as f:
+                        yield f
 
-                if int(line_time) <= current_eod:
-                    chunk_file.write(line)
-                else:
-                    current_date = datetime.fromtimestamp(
-                        int(line_time), tz=timezone.utc
-                    )
-                    current_eod = int(
-                        datetime(
-                            current_date.year,
-                            current_date.month,
-                            current_date.day,
-                            23,
-                            59,
-                            59,
-                        ).timestamp()
-                    )
-                    chunk_file.close()
-
-                    chunk_file_path = os.path.join(
-                        dir_path, current_date.strftime("%m_%d_%Y") + ".csv"
-                    )
-                    chunk_file_paths.append(chunk_file_path)
-
-                    chunk_file = open(chunk_file_path, "w")
-                    chunk_file.write(line)
-
-        chunk_file.close()
-        return chunk_file_paths
-
-    def _compress(self, data: bytes, output_path: str) -> None:
-        with open(output_path, "wb") as f:
-            f.write(compress(data, level_or_option=self._zstd_options))
-
-    def _serialize_csv(self, csv_path: str) -> str:
-        arr = np.loadtxt(csv_path, delimiter=",", dtype=self._np_dtype)
-
-        new_file_path = os.path.splitext(csv_path)[0] + ".bin"
-        self._compress(arr.tobytes(), new_file_path)
-        return new_file_path
+        return self._convert_csv_files(open_csv_files(), output_dir)
 
     def _decompress(self, input_path: str) -> bytes:
         with open(input_path, "rb") as f:
             return decompress(f.read())
 
+    def get_trades_array(self, file_path: str) -> np.ndarray:
+        return np.frombuffer(self._decompress(file_path), dtype=self._np_dtype)
+
     def get_trades_from_file(self, file_path: str) -> list[TradeMessage]:
-        arr = np.frombuffer(self._decompress(file_path), dtype=self._np_dtype)
+        arr = self.get_trades_array(file_path)
         pair = os.path.basename(os.path.dirname(file_path))
 
-        trades = []
-        for trade_data in arr:
-            time, price, volume = trade_data
-            trade = TradeMessage(
+        return [
+            TradeMessage(
                 time, pair, 1, price, volume, OrderSide.BID, Market.KRAKEN_SPOT
             )
-
-            trades.append(trade)
-
-        return trades
+            for time, price, volume in arr.tolist()
+        ]
 
     def get_trades(
         self, asset: str, date: datetime, resource_path: str
@@ -221,30 +250,262 @@ class HistoricalTradesDataClient:
 
         return self.get_trades_from_file(file_path)
 
+    def _get_pair_trades_array(
+        self, pair: str, pair_id: int, since: date, until: date, resource_path: str
+    ) -> np.ndarray:
+        day_arrs = []
+        for i in range((until - since).days):
+            file_path = os.path.join(
+                resource_path,
+                pair,
+                (since + timedelta(days=i)).strftime("%m_%d_%Y") + ".bin",
+            )
+            if os.path.exists(file_path):
+                day_arrs.append(self.get_trades_array(file_path))
+
+        arr = np.empty(sum(len(day_arr) for day_arr in day_arrs), self._np_range_dtype)
+        if day_arrs:
+            day_arr = np.concatenate(day_arrs)
+            for name in ("time", "price", "volume"):
+                arr[name] = day_arr[name]
+        arr["pair_id"] = pair_id
+
+        return arr
+
+    def get_trades_range(
+        self, pairs: list[str], since: date, until: date, resource_path: str
+    ) -> np.ndarray:
+        if since >= until:
+            raise ValueError(
+                f"Dates since ({since.strftime("%m_%d_%Y")}) equal to or later than until ({until.strftime("%m_%d_%Y")})"
+            )
+
+        if len(pairs) > np.iinfo(self._np_range_dtype["pair_id"]).max + 1:
+            raise ValueError(f"Too many pairs requested (got '{len(pairs)}')")
+
+        # pyzstd releases the gil while decompressing, so threads are enough here
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_cores
+        ) as executor:
+            pair_arrs = list(
+                executor.map(
+                    lambda pair_id: self._get_pair_trades_array(
+                        pairs[pair_id], pair_id, since, until, resource_path
+                    ),
+                    range(len(pairs)),
+                )
+            )
+
+        arr = (
+            np.concatenate(pair_arrs)
+            if pair_arrs
+            else np.empty(0, self._np_range_dtype)
+        )
+        return arr[np.argsort(arr["time"], kind="stable")]
+
     def download(
-        self, download_path: str, drive_folder_id: str = HISTORICAL_DRIVE_FOLDER_ID
+        self,
+        download_path: str,
+        drive_folder_id: str = HISTORICAL_DRIVE_FOLDER_ID,
+        report_path: Optional[str] = None,
+        source: Optional[BaseTradesSource] = None,
+        incremental: bool = False,
     ) -> None:
-        if not self._drive_auth_token:
-            raise ValueError("Missing API key to access drive")
+        if source is None:
+            if not self._drive_auth_token:
+                raise ValueError("Missing API key to access drive")
+
+            source = DriveTradesSource(self._drive_auth_token, drive_folder_id)
 
         if not os.path.exists(download_path):
             raise ValueError(f"Download path '{download_path}' does not exist")
 
-        pair_dir_paths = self._download_data_from_drive(download_path, drive_folder_id)
+        try:
+            self._download(download_path, source, incremental)
+        finally:
+            if report_path is not None:
+                self.metrics.write_report(report_path)
+
+    def _load_manifest(self, download_path: str) -> dict[str, Any]:
+        manifest_path = os.path.join(download_path, _MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_path):
+            return {"sources": {}, "days": {}}
+
+        with open(manifest_path) as f:
+            manifest: dict[str, Any] = json.load(f)
+            return manifest
+
+    def _write_manifest(self, download_path: str, manifest: dict[str, Any]) -> None:
+        manifest_path = os.path.join(download_path, _MANIFEST_FILE_NAME)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def _fetch_source_files(
+        self,
+        source: BaseTradesSource,
+        source_files: list[TradesSourceFile],
+        download_path: str,
+    ) -> list[str]:
+        zip_paths = [
+            os.path.join(download_path, f"{source_file.file_id}.zip")
+            for source_file in source_files
+        ]
+        if not source_files:
+            return zip_paths
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(source_files), self._max_concurrent_downloads)
+        ) as executor:
+            for num_bytes in executor.map(source.fetch, source_files, zip_paths):
+                self.metrics.record_page(num_bytes)
+
+        return zip_paths
+
+    def _clear_staging_dir(self, staging_dir: str) -> None:
+        os.makedirs(staging_dir, exist_ok=True)
+
+        # partial archive downloads are kept so they can be resumed
+        for file_name in os.listdir(staging_dir):
+            path = os.path.join(staging_dir, file_name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif not file_name.endswith(".part"):
+                os.remove(path)
+
+    def _rewrite_day_file(
+        self,
+        day_path: str,
+        old_segments: list[list[Any]],
+        stale_ids: set[str],
+        new_segments: list[tuple[str, str]],
+        source_names: dict[str, str],
+    ) -> list[list[Any]]:
+        # a day file is the zstd frames of each contributing source back to back,
+        # so unchanged sources are spliced over without fetching them again
+        segments: list[tuple[str, bytes]] = []
+
+        if old_segments and os.path.exists(day_path):
+            with open(day_path, "rb") as f:
+                for source_id, length in old_segments:
+                    data = f.read(length)
+                    if source_id not in stale_ids:
+                        segments.append((source_id, data))
+
+        for source_id, staged_path in new_segments:
+            with open(staged_path, "rb") as f:
+                segments.append((source_id, f.read()))
+
+        if not segments:
+            if os.path.exists(day_path):
+                os.remove(day_path)
+            return []
 
-        pair_csv_files = []
-        for dir_path in pair_dir_paths:
-            pair = os.path.basename(dir_path)
-            pair_csv_files.append(os.path.join(dir_path, pair + ".csv"))
+        segments.sort(key=lambda segment: source_names[segment[0]])
 
-        chunked_csv_files = []
-        with mp.Pool(self._max_cores) as pool:
-            for files in pool.imap(
-                self._chunk_csv_by_day, pair_csv_files, chunksize=16
-            ):
-                chunked_csv_files.extend(files)
+        os.makedirs(os.path.dirname(day_path), exist_ok=True)
+        with open(day_path + ".tmp", "wb") as f:
+            for _, data in segments:
+                f.write(data)
+        os.replace(day_path + ".tmp", day_path)
 
-            pool.map(self._serialize_csv, chunked_csv_files, chunksize=16)
+        return [[source_id, len(data)] for source_id, data in segments]
 
-        for file_path in pair_csv_files + chunked_csv_files:
-            os.remove(file_path)
+    def _download(
+        self, download_path: str, source: BaseTradesSource, incremental: bool
+    ) -> None:
+        manifest = (
+            self._load_manifest(download_path)
+            if incremental
+            else {"sources": {}, "days": {}}
+        )
+        known_sources: dict[str, dict[str, str]] = manifest["sources"]
+        days: dict[str, dict[str, list[list[Any]]]] = manifest["days"]
+
+        source_files = source.list_files()
+        source_names = {f.file_id: f.name for f in source_files}
+
+        changed_files = [
+            f
+            for f in source_files
+            if known_sources.get(f.file_id, {}).get("modified_time") != f.modified_time
+        ]
+        stale_ids = {
+            source_id for source_id in known_sources if source_id not in source_names
+        } | {f.file_id for f in changed_files}
+
+        staging_dir = os.path.join(download_path, _STAGING_DIR_NAME)
+        self._clear_staging_dir(staging_dir)
+
+        phase_start = time.monotonic()
+        zip_paths = self._fetch_source_files(source, changed_files, staging_dir)
+        self.metrics.record_phase("download", time.monotonic() - phase_start)
+
+        csv_bytes = 0
+        convert_args = []
+        convert_source_ids = []
+        for i, (source_file, zip_path) in enumerate(zip(changed_files, zip_paths)):
+            pairs_to_members, total_size = self._list_zip_members([zip_path])
+            csv_bytes += total_size
+
+            for pair, zip_members in pairs_to_members.items():
+                convert_args.append(
+                    (zip_members, os.path.join(staging_dir, str(i), pair))
+                )
+                convert_source_ids.append(source_file.file_id)
+
+        phase_start = time.monotonic()
+        staged_paths: list[list[str]] = []
+        if convert_args:
+            with mp.Pool(self._max_cores) as pool:
+                staged_paths = pool.starmap(self._convert_pair, convert_args)
+        convert_seconds = time.monotonic() - phase_start
+
+        staged_days: dict[tuple[str, str], list[tuple[str, str]]] = defaultdict(list)
+        output_bytes = 0
+        for source_id, paths in zip(convert_source_ids, staged_paths):
+            for path in paths:
+                pair = os.path.basename(os.path.dirname(path))
+                staged_days[(pair, os.path.basename(path))].append((source_id, path))
+                output_bytes += os.path.getsize(path)
+
+        self.metrics.record_compression(
+            input_bytes=csv_bytes,
+            output_bytes=output_bytes,
+            seconds=convert_seconds,
+        )
+        self.metrics.record_phase("convert", convert_seconds)
+
+        affected_days = set(staged_days)
+        for pair, pair_days in days.items():
+            for day_file_name, segments in pair_days.items():
+                if any(source_id in stale_ids for source_id, _ in segments):
+                    affected_days.add((pair, day_file_name))
+
+        phase_start = time.monotonic()
+        try:
+            for pair, day_file_name in sorted(affected_days):
+                pair_days = days.setdefault(pair, {})
+                segments = self._rewrite_day_file(
+                    os.path.join(download_path, pair, day_file_name),
+                    pair_days.get(day_file_name, []),
+                    stale_ids,
+                    staged_days.get((pair, day_file_name), []),
+                    source_names,
+                )
+
+                if segments:
+                    pair_days[day_file_name] = segments
+                else:
+                    pair_days.pop(day_file_name, None)
+
+            # sources are only marked as seen once all of their days are written
+            manifest["sources"] = {
+                f.file_id: {"name": f.name, "modified_time": f.modified_time}
+                for f in source_files
+            }
+        finally:
+            self._write_manifest(download_path, manifest)
+            self.metrics.record_phase("merge", time.monotonic() - phase_start)
+
+        shutil.rmtree(staging_dir)
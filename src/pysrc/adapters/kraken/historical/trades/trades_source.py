@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import os
+import shutil
+import time
+from abc import ABC, abstractmethod
+from typing import Generator, Optional
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+HISTORICAL_DRIVE_FOLDER_ID = "188O9xQjZTythjyLNes_5zfMEFaMbTT22"
+DRIVE_API_URL = "https://www.googleapis.com/drive/v3/files"
+
+_RETRIABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TradesSourceFile:
+    def __init__(
+        self,
+        file_id: str,
+        name: str,
+        modified_time: str,
+        md5_checksum: Optional[str] = None,
+    ):
+        self.file_id = file_id
+        self.name = name
+        self.modified_time = modified_time
+        self.md5_checksum = md5_checksum
+
+    def __repr__(self) -> str:
+        return (
+            f"TradesSourceFile({self.file_id!r}, {self.name!r}, {self.modified_time!r})"
+        )
+
+
+class BaseTradesSource(ABC):
+    @abstractmethod
+    def list_files(self) -> list[TradesSourceFile]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch(self, source_file: TradesSourceFile, download_path: str) -> int:
+        raise NotImplementedError
+
+
+class DriveTradesSource(BaseTradesSource):
+    def __init__(
+        self,
+        auth_token: str,
+        folder_id: str = HISTORICAL_DRIVE_FOLDER_ID,
+        api_url: str = DRIVE_API_URL,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+        chunk_size: int = 1 << 20,
+        timeout_seconds: float = 60.0,
+    ):
+        self._auth_token = auth_token
+        self._folder_id = folder_id
+        self._api_url = api_url.rstrip("/")
+
+        self._max_retries = max_retries
+        if self._max_retries < 0:
+            raise ValueError(
+                f"Max retries must be non-negative (got '{self._max_retries}')"
+            )
+
+        self._backoff_seconds = backoff_seconds
+        self._chunk_size = chunk_size
+        self._timeout_seconds = timeout_seconds
+
+    def _headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self._auth_token}"}
+
+    def list_files(self) -> list[TradesSourceFile]:
+        files = []
+        page_token: Optional[str] = None
+        while True:
+            params = {
+                "q": f"'{self._folder_id}' in parents",
+                "fields": "nextPageToken, files(id, name, modifiedTime, md5Checksum)",
+            }
+            if page_token is not None:
+                params["pageToken"] = page_token
+
+            res = requests.get(
+                self._api_url + "/",
+                headers=self._headers(),
+                params=params,
+                timeout=self._timeout_seconds,
+            )
+            if res.status_code != 200:
+                raise ValueError(f"Failed to list files from drive: {res.text}")
+
+            body = res.json()
+            for f in body.get("files", []):
+                files.append(
+                    TradesSourceFile(
+                        f["id"], f["name"], f["modifiedTime"], f.get("md5Checksum")
+                    )
+                )
+
+            page_token = body.get("nextPageToken")
+            if page_token is None:
+                return files
+
+    def _fetch_remaining(
+        self, source_file: TradesSourceFile, part_path: str
+    ) -> Generator[int, None, None]:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        headers = self._headers()
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        with requests.get(
+            f"{self._api_url}/{source_file.file_id}",
+            headers=headers,
+            params={"alt": "media", "acknowledgeAbuse": "true"},
+            stream=True,
+            timeout=self._timeout_seconds,
+        ) as res:
+            # the partial file already holds the whole body
+            if offset and res.status_code == 416:
+                return
+
+            if res.status_code in _RETRIABLE_STATUS_CODES:
+                raise requests.HTTPError(
+                    f"Failed to download {source_file.file_id} with status {res.status_code}"
+                )
+
+            if res.status_code not in (200, 206):
+                raise ValueError(
+                    f"Failed to download {source_file.file_id} with: {res.text}"
+                )
+
+            # a server that ignores the range sends the whole body again
+            mode = "ab" if res.status_code == 206 else "wb"
+
+            with open(part_path, mode) as f:
+                for chunk in res.iter_content(chunk_size=self._chunk_size):
+                    f.write(chunk)
+                    yield len(chunk)
+
+    def _verify_checksum(self, source_file: TradesSourceFile, part_path: str) -> bool:
+        if source_file.md5_checksum is None:
+            return True
+
+        md5 = hashlib.md5()
+        with open(part_path, "rb") as f:
+            while chunk := f.read(self._chunk_size):
+                md5.update(chunk)
+
+        return md5.hexdigest() == source_file.md5_checksum
+
+    def fetch(self, source_file: TradesSourceFile, download_path: str) -> int:
+        part_path = download_path + ".part"
+
+        num_bytes = 0
+        for attempt in range(self._max_retries + 1):
+            try:
+                for chunk_size in self._fetch_remaining(source_file, part_path):
+                    num_bytes += chunk_size
+            except requests.RequestException as e:
+                if attempt == self._max_retries:
+                    raise
+
+                _logger.warning(
+                    f"Retrying download of {source_file.name} after error: {e}"
+                )
+                time.sleep(self._backoff_seconds * 2**attempt)
+                continue
+
+            if self._verify_checksum(source_file, part_path):
+                os.replace(part_path, download_path)
+                return num_bytes
+
+            os.remove(part_path)
+            if attempt == self._max_retries:
+                break
+
+            _logger.warning(f"Checksum mismatch for {source_file.name}, restarting")
+            time.sleep(self._backoff_seconds * 2**attempt)
+
+        raise ValueError(f"Checksum mismatch for {source_file.name}")
+
+
+class LocalTradesSource(BaseTradesSource):
+    def __init__(self, directory: str):
+        if not os.path.isdir(directory):
+            raise ValueError(f"Source directory '{directory}' does not exist")
+
+        self._directory = directory
+
+    def list_files(self) -> list[TradesSourceFile]:
+        files = []
+        for file_name in sorted(os.listdir(self._directory)):
+            if not file_name.endswith(".zip"):
+                continue
+
+            stat = os.stat(os.path.join(self._directory, file_name))
+            files.append(
+                TradesSourceFile(
+                    file_name, file_name, f"{stat.st_mtime_ns}:{stat.st_size}"
+                )
+            )
+
+        return files
+
+    def fetch(self, source_file: TradesSourceFile, download_path: str) -> int:
+        shutil.copyfile(
+            os.path.join(self._directory, source_file.file_id), download_path
+        )
+        return os.path.getsize(download_path)
@@ -1,12 +1,20 @@
+import time
 from collections import defaultdict, deque
 from enum import Enum
-from math import isclose
+from itertools import islice
+from math import floor, log10
 from threading import Condition
 from typing import Optional
 
+import numpy as np
+from sortedcontainers import SortedDict
+
 from pysrc.adapters.messages import SnapshotMessage
 from pysrc.util.types import Market, OrderSide
 
+DEFAULT_TICK_SIZE = 1e-10
+_ZERO_QUANTITY_TOL = 1e-08
+
 
 class EventType(Enum):
     ORDER = 0
@@ -42,46 +50,153 @@ class OrderEventResponse:
         self,
         deltas: list[UpdateDelta],
         continuation_token: Optional[str],
+        num_events: int = 0,
     ):
         self.deltas = deltas
         self.continuation_token = continuation_token
+        self.num_events = num_events
 
 
 class MBPBook:
-    def __init__(self, feedcode: str, market: Market):
+    def __init__(
+        self,
+        feedcode: str,
+        market: Market,
+        tick_size: float = DEFAULT_TICK_SIZE,
+        output_depth: Optional[int] = None,
+        output_band_bps: Optional[float] = None,
+    ):
+        if tick_size <= 0:
+            raise ValueError(f"tick_size must be positive (got '{tick_size}')")
+        if output_depth is not None and output_depth <= 0:
+            raise ValueError(f"output_depth must be positive (got '{output_depth}')")
+        if output_band_bps is not None and output_band_bps <= 0:
+            raise ValueError(
+                f"output_band_bps must be positive (got '{output_band_bps}')"
+            )
+
         self._feedcode = feedcode
         self._market = market
+        self._tick_size = tick_size
+        self._output_depth = output_depth
+        self._output_band_bps = output_band_bps
+        self._ticks_per_unit = 1 / tick_size
+        self._price_decimals = max(0, -floor(log10(tick_size))) + 1
+
+        # levels are keyed by integer tick index so float noise in prices
+        # can't split one level into several
+        self._book: list[SortedDict[int, float]] = [SortedDict(), SortedDict()]
+
+    def _price_to_tick(self, price: float) -> int:
+        return round(price * self._ticks_per_unit)
 
-        self._book: list[dict[float, float]] = [defaultdict(float), defaultdict(float)]
+    def _tick_to_price(self, tick: int) -> float:
+        return round(tick * self._tick_size, self._price_decimals)
 
     def apply_delta(self, delta: UpdateDelta) -> None:
         book_side = self._book[delta.side.value - 1]
 
         for price, quantity in delta.deltas.items():
-            book_side[price] += quantity
+            tick = self._price_to_tick(price)
+            new_quantity = book_side.get(tick, 0.0) + quantity
 
-            if isclose(book_side[price], 0, rel_tol=1e-05, abs_tol=1e-08):
-                del book_side[price]
+            if -_ZERO_QUANTITY_TOL <= new_quantity <= _ZERO_QUANTITY_TOL:
+                book_side.pop(tick, None)
+            else:
+                book_side[tick] = new_quantity
 
-    def to_snapshot_message(self, time: int) -> SnapshotMessage:
-        bids = list(self._book[OrderSide.BID.value - 1].items())
-        asks = list(self._book[OrderSide.ASK.value - 1].items())
+    def best_bid(self) -> Optional[tuple[float, float]]:
+        bids = self._book[OrderSide.BID.value - 1]
+        if not bids:
+            return None
+
+        tick, quantity = bids.peekitem(-1)
+        return self._tick_to_price(tick), quantity
+
+    def best_ask(self) -> Optional[tuple[float, float]]:
+        asks = self._book[OrderSide.ASK.value - 1]
+        if not asks:
+            return None
+
+        tick, quantity = asks.peekitem(0)
+        return self._tick_to_price(tick), quantity
+
+    def mid_price(self) -> Optional[float]:
+        best_bid = self.best_bid()
+        best_ask = self.best_ask()
+
+        if best_bid is None:
+            return None if best_ask is None else best_ask[0]
+        elif best_ask is None:
+            return best_bid[0]
+
+        return (best_bid[0] + best_ask[0]) / 2
+
+    def get_levels(
+        self,
+        side: OrderSide,
+        depth: Optional[int] = None,
+        band_bps: Optional[float] = None,
+    ) -> list[tuple[float, float]]:
+        book_side = self._book[side.value - 1]
+        if depth is not None and depth < 0:
+            raise ValueError(f"depth must be non-negative (got '{depth}')")
+
+        min_tick: Optional[int] = None
+        max_tick: Optional[int] = None
+        if band_bps is not None:
+            mid = self.mid_price()
+            if mid is None:
+                return []
+
+            if side == OrderSide.BID:
+                min_tick = self._price_to_tick(mid * (1 - band_bps / 10_000))
+            else:
+                max_tick = self._price_to_tick(mid * (1 + band_bps / 10_000))
+
+        # bids are stored ascending, so the best levels sit at the end
+        ticks = list(
+            islice(
+                book_side.irange(
+                    minimum=min_tick,
+                    maximum=max_tick,
+                    reverse=side == OrderSide.BID,
+                ),
+                depth,
+            )
+        )
+        if not ticks:
+            return []
+
+        prices = np.round(
+            np.array(ticks, dtype=np.float64) * self._tick_size, self._price_decimals
+        ).tolist()
 
+        return [(price, book_side[tick]) for price, tick in zip(prices, ticks)]
+
+    def to_snapshot_message(self, time: int) -> SnapshotMessage:
         snapshot = SnapshotMessage(
             time=time, feedcode=self._feedcode, bids=[], asks=[], market=self._market
         )
 
-        snapshot.bids = bids
-        snapshot.asks = asks
+        snapshot.bids = self.get_levels(
+            OrderSide.BID, self._output_depth, self._output_band_bps
+        )
+        snapshot.asks = self.get_levels(
+            OrderSide.ASK, self._output_depth, self._output_band_bps
+        )
 
         return snapshot
 
     def copy(self) -> "MBPBook":
-        new_book = MBPBook(feedcode=self._feedcode, market=self._market)
-
-        for i, side_orders in enumerate(self._book):
-            for price, quantity in side_orders.items():
-                new_book._book[i][price] = quantity
+        new_book = MBPBook(
+            feedcode=self._feedcode,
+            market=self._market,
+            tick_size=self._tick_size,
+            output_depth=self._output_depth,
+            output_band_bps=self._output_band_bps,
+        )
+        new_book._book = [side_orders.copy() for side_orders in self._book]
 
         return new_book
 
@@ -98,17 +213,31 @@ class ChunkedEventQueue:
             EventType.EXECUTION: [False for _ in range(self._num_chunks)],
         }
 
-        self._chunks: list[list[UpdateDelta]] = [[] for _ in range(self._num_chunks)]
+        # each event stream arrives sorted ascending, so chunks are kept as one
+        # deque per stream and merged lazily as deltas are consumed
+        self._chunks: list[dict[EventType, deque[UpdateDelta]]] = [
+            {event_type: deque() for event_type in self._statuses}
+            for _ in range(self._num_chunks)
+        ]
 
         self._cond_var = Condition()
 
-        self._queue: deque[UpdateDelta] = deque()
-
         self._cur_chunk = 0
         self._failed = False
 
+        self._depth = 0
+        self._wait_seconds = 0.0
+
+    def depth(self) -> int:
+        return self._depth
+
+    def wait_seconds(self) -> float:
+        return self._wait_seconds
+
     def empty(self) -> bool:
-        return self._cur_chunk >= self._num_chunks and not self._queue
+        with self._cond_var:
+            self._skip_exhausted_chunks()
+            return self._cur_chunk >= self._num_chunks
 
     def failed(self) -> bool:
         return self._failed
@@ -117,9 +246,8 @@ class ChunkedEventQueue:
         if self._statuses[event_type][chunk_idx]:
             raise ValueError(f"chunk_idx '{chunk_idx}' already completed")
 
-        self._statuses[event_type][chunk_idx] = True
-
         with self._cond_var:
+            self._statuses[event_type][chunk_idx] = True
             self._cond_var.notify()
 
     def mark_failed(self) -> None:
@@ -137,53 +265,66 @@ class ChunkedEventQueue:
         if self._statuses[event_type][chunk_idx]:
             raise ValueError("Attempted to put item into a completed chunk")
 
-        self._chunks[chunk_idx].extend(deltas)
-
         with self._cond_var:
+            self._chunks[chunk_idx][event_type].extend(deltas)
+            self._depth += len(deltas)
             self._cond_var.notify()
 
-    def _load_queue(self) -> bool:
-        if self._queue:
-            return True
-        elif self.empty() or self.failed():
-            return False
-
-        with self._cond_var:
-            self._cond_var.wait_for(
-                lambda: all(
-                    event_statuses[self._cur_chunk]
-                    for event_statuses in self._statuses.values()
-                )
-                or self.failed()
-            )
-
-        if self.failed():
-            return False
-
-        chunk = self._chunks[self._cur_chunk]
-        self._chunks[self._cur_chunk] = []
-        chunk.sort(key=lambda x: x.timestamp)
-        self._queue = deque(chunk)
-
-        self._cur_chunk += 1
+    def _chunk_exhausted(self, chunk_idx: int) -> bool:
+        return all(
+            self._statuses[event_type][chunk_idx] and not stream
+            for event_type, stream in self._chunks[chunk_idx].items()
+        )
 
-        if not self._queue:
-            return self._load_queue()
+    def _skip_exhausted_chunks(self) -> None:
+        while self._cur_chunk < self._num_chunks and self._chunk_exhausted(
+            self._cur_chunk
+        ):
+            self._cur_chunk += 1
 
-        return True
+    def _next_stream(self) -> Optional[deque[UpdateDelta]]:
+        with self._cond_var:
+            while True:
+                self._skip_exhausted_chunks()
+
+                if self._cur_chunk >= self._num_chunks or self.failed():
+                    return None
+
+                next_stream: Optional[deque[UpdateDelta]] = None
+                can_merge = True
+                for event_type, stream in self._chunks[self._cur_chunk].items():
+                    if stream:
+                        if (
+                            next_stream is None
+                            or stream[0].timestamp < next_stream[0].timestamp
+                        ):
+                            next_stream = stream
+                    elif not self._statuses[event_type][self._cur_chunk]:
+                        # an empty stream that is still downloading may yet
+                        # produce an earlier delta than the other stream's head
+                        can_merge = False
+
+                if can_merge and next_stream is not None:
+                    return next_stream
+
+                wait_start = time.monotonic()
+                self._cond_var.wait()
+                self._wait_seconds += time.monotonic() - wait_start
 
     def peek(self) -> Optional[UpdateDelta]:
-        res = self._load_queue()
+        stream = self._next_stream()
 
-        if not res:
+        if stream is None:
             return None
 
-        return self._queue[0]
+        return stream[0]
 
     def get(self) -> Optional[UpdateDelta]:
-        res = self._load_queue()
+        stream = self._next_stream()
 
-        if not res:
+        if stream is None:
             return None
 
-        return self._queue.popleft()
+        with self._cond_var:
+            self._depth -= 1
+            return stream.popleft()
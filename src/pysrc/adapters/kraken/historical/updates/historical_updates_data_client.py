@@ -1,13 +1,15 @@
 import os
 import time
 from datetime import datetime, timedelta
+from math import ceil
 from pathlib import Path
 from threading import Thread
 from typing import Any, Optional
 
 import requests
 
-from pysrc.adapters.kraken.asset_mappings import asset_to_kraken
+from pysrc.adapters.kraken.asset_mappings import asset_to_kraken, asset_to_tick_size
+from pysrc.adapters.kraken.historical.backfill_metrics import BackfillMetrics
 from pysrc.adapters.kraken.historical.updates.containers import (
     ChunkedEventQueue,
     EventType,
@@ -25,28 +27,143 @@ from pysrc.data_handlers.kraken.historical.snapshot_stream_writer import (
     SnapshotStreamWriter,
 )
 from pysrc.util.exceptions import DIE
-from pysrc.util.types import Asset, Market, OrderSide
+from pysrc.util.historical_data_utils import historical_data_dir
+from pysrc.util.types import Asset, Market, OrderSide, TimeUnit
 
 
 class HistoricalUpdatesDataClient:
-    def __init__(self, resource_path: str):
+    def __init__(
+        self,
+        resource_path: str,
+        snapshot_depth: Optional[int] = None,
+        snapshot_band_bps: Optional[float] = None,
+        snapshot_interval_ms: Optional[int] = None,
+        adaptive_chunking: bool = True,
+        metrics: Optional[BackfillMetrics] = None,
+    ):
         self._resource_path = resource_path
         self._session = requests.Session()
+        self.metrics = metrics if metrics is not None else BackfillMetrics()
+
+        self._snapshot_depth = snapshot_depth
+        self._snapshot_band_bps = snapshot_band_bps
+
+        # None keeps the per-second snapshots timestamped in seconds, otherwise
+        # snapshots are timestamped in milliseconds at the given cadence and
+        # written to the millisecond snapshots directory
+        self._snapshot_interval_ms = snapshot_interval_ms
+        if self._snapshot_interval_ms is not None and self._snapshot_interval_ms <= 0:
+            raise ValueError(
+                f"snapshot_interval_ms must be positive (got '{self._snapshot_interval_ms}')"
+            )
+        self._snapshot_time_unit = (
+            TimeUnit.SECONDS
+            if self._snapshot_interval_ms is None
+            else TimeUnit.MILLISECONDS
+        )
 
         self._NUM_CHUNKS = 48
+        self._MIN_CHUNKS = 8
+        self._MAX_CHUNKS = 96
+        self._TARGET_PAGES_PER_CHUNK = 4
+        self._UNIFORM_EVENT_SHARE = 0.1
+
+        # chunk boundaries as offsets from the start of the day, rebalanced
+        # after every downloaded day using the events each chunk returned
+        self._adaptive_chunking = adaptive_chunking
+        self._chunk_offsets = [
+            timedelta(days=1) * i / self._NUM_CHUNKS
+            for i in range(self._NUM_CHUNKS + 1)
+        ]
+        self._chunk_page_counts = self._new_chunk_counts()
+        self._chunk_event_counts = self._new_chunk_counts()
+
         self._queue = ChunkedEventQueue(num_chunks=self._NUM_CHUNKS)
         self._last_saved_mbp_book: Optional[MBPBook] = None
         self._cur_mbp_book: Optional[MBPBook] = None
-        self._last_saved_sec = -1
-        self._cur_sec = -1
+        self._last_saved_time = -1
+        self._cur_time = -1
+        self._num_reconstructed_events = 0
+
+        # millisecond cadences write many snapshots that repeat the previous
+        # one's levels, the per-second archives keep one snapshot per second
+        self._snapshot_handler = SnapshotStreamWriter(
+            skip_unchanged=self._snapshot_interval_ms is not None
+        )
 
-        self._snapshot_handler = SnapshotStreamWriter()
+    def _new_chunk_counts(self) -> dict[EventType, list[int]]:
+        num_chunks = len(self._chunk_offsets) - 1
+        return {event_type: [0] * num_chunks for event_type in EventType}
+
+    def _rebalance_chunk_offsets(self) -> list[timedelta]:
+        total_pages = sum(sum(counts) for counts in self._chunk_page_counts.values())
+        num_chunks = min(
+            self._MAX_CHUNKS,
+            max(self._MIN_CHUNKS, ceil(total_pages / self._TARGET_PAGES_PER_CHUNK)),
+        )
+
+        # chunks are weighted by the events they returned, with a share of the
+        # day's events spread uniformly on top. quiet stretches keep a width
+        # proportional to their span, so a layout refined around a past spike
+        # relaxes back toward uniform once the spike is gone
+        end_of_day = timedelta(days=1)
+        events = [
+            order_events + execution_events
+            for order_events, execution_events in zip(
+                self._chunk_event_counts[EventType.ORDER],
+                self._chunk_event_counts[EventType.EXECUTION],
+            )
+        ]
+        uniform_events = self._UNIFORM_EVENT_SHARE * max(1, sum(events))
+        weights = [
+            num_events + uniform_events * ((end - start) / end_of_day)
+            for num_events, start, end in zip(
+                events, self._chunk_offsets, self._chunk_offsets[1:]
+            )
+        ]
+        total_weight = sum(weights)
+        weight_per_chunk = total_weight / num_chunks
+
+        # place boundaries so every new chunk covers an equal share of the
+        # weight, assuming events are spread uniformly within each old chunk
+        offsets = [timedelta(0)]
+        cumulative_weight = 0.0
+        boundary_idx = 1
+        for i, weight in enumerate(weights):
+            start, end = self._chunk_offsets[i], self._chunk_offsets[i + 1]
+
+            while (
+                boundary_idx < num_chunks
+                and boundary_idx * weight_per_chunk < cumulative_weight + weight
+            ):
+                fraction = (
+                    boundary_idx * weight_per_chunk - cumulative_weight
+                ) / weight
+                offset = timedelta(
+                    seconds=round((start + (end - start) * fraction).total_seconds())
+                )
+                if offsets[-1] < offset < end_of_day:
+                    offsets.append(offset)
+
+                boundary_idx += 1
+
+            cumulative_weight += weight
+
+        offsets.append(end_of_day)
+        return offsets
+
+    def _to_snapshot_time(self, timestamp_ms: int) -> int:
+        if self._snapshot_interval_ms is None:
+            return timestamp_ms // 1000
+
+        return timestamp_ms - timestamp_ms % self._snapshot_interval_ms
 
     def _request(self, route: str, params: dict[str, Any]) -> Any:
         res = self._session.get(route, params=params)
         if res.status_code != 200:
             DIE(f"Failed to get from '{route}', received {res.text}")
 
+        self.metrics.record_page(len(res.content))
         return res.json()
 
     def _delta_from_order_event(self, e: dict) -> Optional[UpdateDelta]:
@@ -65,7 +182,7 @@ class HistoricalUpdatesDataClient:
 
                 delta = UpdateDelta(
                     side=str_to_order_side(order_json["direction"]),
-                    timestamp=e["timestamp"] // 1000,
+                    timestamp=self._to_snapshot_time(e["timestamp"]),
                     price=price,
                     quantity=quantity,
                 )
@@ -80,7 +197,7 @@ class HistoricalUpdatesDataClient:
 
                 delta = UpdateDelta(
                     side=str_to_order_side(new_order_json["direction"]),
-                    timestamp=e["timestamp"] // 1000,
+                    timestamp=self._to_snapshot_time(e["timestamp"]),
                     price=new_price,
                     quantity=new_quantity,
                 )
@@ -114,6 +231,7 @@ class HistoricalUpdatesDataClient:
         }
 
         res = self._request(route, params)
+        self.metrics.record_events(len(res["elements"]))
 
         deltas = [UpdateDelta(OrderSide.BID, -1, 0, 0)]
         for e in res["elements"]:
@@ -128,7 +246,9 @@ class HistoricalUpdatesDataClient:
                     deltas.append(delta)
 
         return OrderEventResponse(
-            continuation_token=res.get("continuationToken"), deltas=deltas[1:]
+            continuation_token=res.get("continuationToken"),
+            deltas=deltas[1:],
+            num_events=len(res["elements"]),
         )
 
     def _delta_from_execution_event(self, e: dict) -> list[UpdateDelta]:
@@ -139,7 +259,7 @@ class HistoricalUpdatesDataClient:
 
         bid_delta = UpdateDelta(
             side=OrderSide.BID,
-            timestamp=event_json["timestamp"] // 1000,
+            timestamp=self._to_snapshot_time(event_json["timestamp"]),
             price=bid_price,
             quantity=bid_quantity,
         )
@@ -170,6 +290,7 @@ class HistoricalUpdatesDataClient:
         }
 
         res = self._request(route, params)
+        self.metrics.record_events(len(res["elements"]))
 
         deltas = [UpdateDelta(OrderSide.BID, -1, 0, 0)]
         for e in res["elements"]:
@@ -183,7 +304,9 @@ class HistoricalUpdatesDataClient:
                     deltas.append(delta)
 
         return OrderEventResponse(
-            continuation_token=res.get("continuationToken"), deltas=deltas[1:]
+            continuation_token=res.get("continuationToken"),
+            deltas=deltas[1:],
+            num_events=len(res["elements"]),
         )
 
     def _queue_events_for_chunk(
@@ -215,6 +338,8 @@ class HistoricalUpdatesDataClient:
                 )
 
                 self._queue.put(order_res.deltas, event_type, chunk_idx)
+                self._chunk_page_counts[event_type][chunk_idx] += 1
+                self._chunk_event_counts[event_type][chunk_idx] += order_res.num_events
 
                 continuation_token = order_res.continuation_token
                 if not continuation_token:
@@ -234,20 +359,21 @@ class HistoricalUpdatesDataClient:
             if next_delta is None:
                 break
 
-            if next_delta.timestamp != self._cur_sec:
-                prev_sec = self._cur_sec
-                self._cur_sec = next_delta.timestamp
-                return self._cur_mbp_book.to_snapshot_message(prev_sec)
+            if next_delta.timestamp != self._cur_time:
+                prev_time = self._cur_time
+                self._cur_time = next_delta.timestamp
+                return self._cur_mbp_book.to_snapshot_message(prev_time)
 
             delta = self._queue.get()
             if delta is None:
                 break
 
-            self._cur_sec = delta.timestamp
+            self._cur_time = delta.timestamp
             self._cur_mbp_book.apply_delta(delta)
+            self._num_reconstructed_events += 1
 
         if is_last_iter and not self._queue.failed():
-            return self._cur_mbp_book.to_snapshot_message(self._cur_sec)
+            return self._cur_mbp_book.to_snapshot_message(self._cur_time)
 
         return None
 
@@ -256,18 +382,25 @@ class HistoricalUpdatesDataClient:
         kraken_asset: str,
         day: datetime,
     ) -> Path:
-        snapshot_path = Path(self._resource_path) / "snapshots" / kraken_asset
+        snapshot_path = (
+            Path(self._resource_path)
+            / historical_data_dir(False, self._snapshot_time_unit)
+            / kraken_asset
+        )
         if not os.path.exists(snapshot_path):
             os.makedirs(snapshot_path)
 
+        self._chunk_page_counts = self._new_chunk_counts()
+        self._chunk_event_counts = self._new_chunk_counts()
+
         threads = []
-        for i in range(self._NUM_CHUNKS):
+        for i in range(len(self._chunk_offsets) - 1):
             order_thread = Thread(
                 target=self._queue_events_for_chunk,
                 args=(
                     kraken_asset,
-                    day + timedelta(minutes=30 * i),
-                    day + timedelta(minutes=30 * (i + 1)),
+                    day + self._chunk_offsets[i],
+                    day + self._chunk_offsets[i + 1],
                     i,
                     EventType.ORDER,
                 ),
@@ -277,8 +410,8 @@ class HistoricalUpdatesDataClient:
                 target=self._queue_events_for_chunk,
                 args=(
                     kraken_asset,
-                    day + timedelta(minutes=30 * i),
-                    day + timedelta(minutes=30 * (i + 1)),
+                    day + self._chunk_offsets[i],
+                    day + self._chunk_offsets[i + 1],
                     i,
                     EventType.EXECUTION,
                 ),
@@ -293,13 +426,30 @@ class HistoricalUpdatesDataClient:
         file_path = snapshot_path / f"{day.strftime('%m_%d_%Y')}.bin"
         self._snapshot_handler.open(file_path)
 
+        self._num_reconstructed_events = 0
+        reconstruction_start = time.monotonic()
+
         snapshot = self._compute_next_snapshot()
         while snapshot:
             self._snapshot_handler.write(snapshot)
+            self.metrics.record_queue_depth(self._queue.depth())
             snapshot = self._compute_next_snapshot()
 
         self._snapshot_handler.flush()
 
+        self.metrics.record_reconstruction(
+            num_events=self._num_reconstructed_events,
+            seconds=time.monotonic()
+            - reconstruction_start
+            - self._snapshot_handler.compression_seconds,
+            wait_seconds=self._queue.wait_seconds(),
+        )
+        self.metrics.record_compression(
+            input_bytes=self._snapshot_handler.bytes_in,
+            output_bytes=self._snapshot_handler.bytes_out,
+            seconds=self._snapshot_handler.compression_seconds,
+        )
+
         for thread in threads:
             thread.join()
 
@@ -311,8 +461,27 @@ class HistoricalUpdatesDataClient:
         since: datetime,
         until: Optional[datetime] = None,
         max_retry_count: Optional[int] = 3,
+        report_path: Optional[str] = None,
     ) -> None:
         self._start_time = time.time()
+
+        try:
+            self._download_updates(asset, since, until, max_retry_count)
+        finally:
+            self.metrics.record_phase(
+                "download_updates", time.time() - self._start_time
+            )
+
+            if report_path is not None:
+                self.metrics.write_report(report_path)
+
+    def _download_updates(
+        self,
+        asset: Asset,
+        since: datetime,
+        until: Optional[datetime],
+        max_retry_count: Optional[int],
+    ) -> None:
         if max_retry_count is None:
             max_retry_count = 3
 
@@ -320,16 +489,25 @@ class HistoricalUpdatesDataClient:
             until = datetime.today()
 
         kraken_asset = asset_to_kraken(asset, Market.KRAKEN_USD_FUTURE)
+        tick_size = asset_to_tick_size(asset, Market.KRAKEN_USD_FUTURE)
 
         self._last_saved_mbp_book = MBPBook(
-            feedcode=kraken_asset, market=Market.KRAKEN_USD_FUTURE
+            feedcode=kraken_asset,
+            market=Market.KRAKEN_USD_FUTURE,
+            tick_size=tick_size,
+            output_depth=self._snapshot_depth,
+            output_band_bps=self._snapshot_band_bps,
         )
-        self._last_saved_sec = int(since.timestamp())
+        self._last_saved_time = self._to_snapshot_time(int(since.timestamp() * 1000))
 
         self._cur_mbp_book = MBPBook(
-            feedcode=kraken_asset, market=Market.KRAKEN_USD_FUTURE
+            feedcode=kraken_asset,
+            market=Market.KRAKEN_USD_FUTURE,
+            tick_size=tick_size,
+            output_depth=self._snapshot_depth,
+            output_band_bps=self._snapshot_band_bps,
         )
-        self._cur_sec = int(since.timestamp())
+        self._cur_time = self._to_snapshot_time(int(since.timestamp() * 1000))
 
         for i in range((until - since).days):
             succeeded = True
@@ -338,19 +516,27 @@ class HistoricalUpdatesDataClient:
             for _ in range(max_retry_count):
                 succeeded = True
 
-                self._queue = ChunkedEventQueue(num_chunks=self._NUM_CHUNKS)
+                self._queue = ChunkedEventQueue(num_chunks=len(self._chunk_offsets) - 1)
+
+                day_start = time.monotonic()
                 update_file_path = self._compute_updates_for_day(kraken_asset, cur)
+                self.metrics.record_day(
+                    cur.strftime("%m_%d_%Y"), time.monotonic() - day_start
+                )
 
                 if self._queue.failed():
                     succeeded = False
 
                     self._cur_mbp_book = self._last_saved_mbp_book.copy()
-                    self._cur_sec = self._last_saved_sec
+                    self._cur_time = self._last_saved_time
 
                     os.remove(update_file_path)
                 else:
                     self._last_saved_mbp_book = self._cur_mbp_book.copy()
-                    self._last_saved_sec = self._cur_sec
+                    self._last_saved_time = self._cur_time
+
+                    if self._adaptive_chunking:
+                        self._chunk_offsets = self._rebalance_chunk_offsets()
 
                     break
 
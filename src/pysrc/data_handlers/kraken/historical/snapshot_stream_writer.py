@@ -1,6 +1,7 @@
+import time
 from io import BufferedWriter
 from pathlib import Path
-from typing import Generator, Optional
+from typing import Any, Generator, Optional
 
 from pyzstd import CParameter, ZstdCompressor
 
@@ -10,29 +11,73 @@ from pysrc.util.historical_data_utils import check_historical_data_filepath
 
 
 class SnapshotStreamWriter:
-    def __init__(self) -> None:
+    def __init__(self, skip_unchanged: bool = False) -> None:
         self._zstd_options = {CParameter.compressionLevel: 10}
         self._file: Optional[BufferedWriter] = None
         self._compressor: Optional[ZstdCompressor] = None
 
-    def open(self, input_path: Path) -> None:
+        # at high snapshot rates most snapshots repeat the levels of the one
+        # before, as the change fell outside the written depth or band. the
+        # earlier snapshot still describes the book, so repeats are dropped
+        # before they cost a serialization and a compression
+        self._skip_unchanged = skip_unchanged
+        self._last_levels: Optional[tuple[list[Any], list[Any]]] = None
+
+        self.written = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compression_seconds = 0.0
+
+    def open(self, input_path: Path, append: bool = False) -> None:
         if not check_historical_data_filepath(input_path, False):
             raise ValueError(f"Invalid input snapshots file path: {input_path}")
 
-        self._file = open(input_path, "wb")
+        # appending starts a new zstd frame after the existing ones, readers
+        # decompress concatenated frames as a single stream
+        self._file = open(input_path, "ab" if append else "wb")
         self._compressor = ZstdCompressor(level_or_option=self._zstd_options)
+        self._last_levels = None
+
+        self.written = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compression_seconds = 0.0
 
     def write(self, data: SnapshotMessage) -> None:
         if self._file is None or self._compressor is None:
             DIE("Wrote without opening file")
 
-        self._file.write(self._compressor.compress(data.to_bytes()))
+        if self._skip_unchanged:
+            levels = (data.bids, data.asks)
+            if levels == self._last_levels:
+                self.skipped += 1
+                return
+            self._last_levels = levels
+
+        # the compressor keeps its own window and only emits whole blocks, so
+        # handing it one snapshot at a time compresses as well as batching
+        raw = data.to_bytes()
+        start = time.monotonic()
+        compressed = self._compressor.compress(raw)
+        self.compression_seconds += time.monotonic() - start
+
+        self.written += 1
+        self.bytes_in += len(raw)
+        self.bytes_out += len(compressed)
+        self._file.write(compressed)
 
     def flush(self) -> None:
         if self._file is None or self._compressor is None:
             DIE("Flush without opening file")
 
-        self._file.write(self._compressor.flush())
+        start = time.monotonic()
+        compressed = self._compressor.flush()
+        self.compression_seconds += time.monotonic() - start
+
+        self.bytes_out += len(compressed)
+        self._file.write(compressed)
 
         self._file.close()
         self._file = None
@@ -0,0 +1,81 @@
+import time
+from io import BufferedWriter
+from pathlib import Path
+from typing import Generator, Optional
+
+import numpy as np
+from pyzstd import CParameter, ZstdCompressor
+
+from pysrc.adapters.messages import TradeMessage
+from pysrc.util.exceptions import DIE
+from pysrc.util.historical_data_utils import check_historical_data_filepath
+
+# packed layout of TradeMessage.to_bytes, 17 bytes per trade
+TRADE_RECORD_DTYPE = np.dtype(
+    [("time", "<u8"), ("price", "<f4"), ("quantity", "<f4"), ("side", "u1")]
+)
+
+
+class TradeStreamWriter:
+    def __init__(self) -> None:
+        self._zstd_options = {CParameter.compressionLevel: 10}
+        self._file: Optional[BufferedWriter] = None
+        self._compressor: Optional[ZstdCompressor] = None
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compression_seconds = 0.0
+
+    def open(self, input_path: Path, append: bool = False) -> None:
+        if not check_historical_data_filepath(input_path, True):
+            raise ValueError(f"Invalid input trades file path: {input_path}")
+
+        # appending starts a new zstd frame after the existing ones, readers
+        # decompress concatenated frames as a single stream
+        self._file = open(input_path, "ab" if append else "wb")
+        self._compressor = ZstdCompressor(level_or_option=self._zstd_options)
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compression_seconds = 0.0
+
+    def write(self, data: TradeMessage) -> None:
+        self._compress(data.to_bytes())
+
+    def write_array(self, arr: np.ndarray) -> None:
+        # any array with time, price, quantity and side fields, the fields are
+        # narrowed to the on-disk record layout in a single pass
+        records = np.empty(len(arr), dtype=TRADE_RECORD_DTYPE)
+        for name in TRADE_RECORD_DTYPE.names or ():
+            records[name] = arr[name]
+        self._compress(records.tobytes())
+
+    def _compress(self, data: bytes) -> None:
+        if self._file is None or self._compressor is None:
+            DIE("Wrote without opening file")
+
+        start = time.monotonic()
+        compressed = self._compressor.compress(data)
+        self.compression_seconds += time.monotonic() - start
+
+        self.bytes_in += len(data)
+        self.bytes_out += len(compressed)
+        self._file.write(compressed)
+
+    def flush(self) -> None:
+        if self._file is None or self._compressor is None:
+            DIE("Flush without opening file")
+
+        start = time.monotonic()
+        compressed = self._compressor.flush()
+        self.compression_seconds += time.monotonic() - start
+
+        self.bytes_out += len(compressed)
+        self._file.write(compressed)
+
+        self._file.close()
+        self._file = None
+        self._compressor = None
+
+    def stream_read(self, _: Path) -> Generator[TradeMessage, None, None]:
+        DIE("Class not meant for reading")
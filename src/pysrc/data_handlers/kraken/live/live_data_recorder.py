@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import queue
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Thread
+from typing import Any, Optional
+
+import numpy as np
+
+from pysrc.adapters.kraken.asset_mappings import asset_to_kraken
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    FeedEvent,
+    KrakenFutureWebsocketClient,
+)
+from pysrc.adapters.kraken.future.kraken_future_websocket_pool import (
+    KrakenFutureWebsocketPool,
+)
+from pysrc.adapters.kraken.future.utils import book_snapshot
+from pysrc.adapters.messages import SnapshotMessage, TradeMessage
+from pysrc.data_handlers.kraken.historical.snapshot_stream_writer import (
+    SnapshotStreamWriter,
+)
+from pysrc.data_handlers.kraken.historical.trade_stream_writer import (
+    TRADE_RECORD_DTYPE,
+    TradeStreamWriter,
+)
+from pysrc.util.historical_data_utils import historical_data_dir
+from pysrc.util.subscriptions import Subscription
+from pysrc.util.types import Asset, Market, TimeUnit
+
+_logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# live trades and snapshots are both recorded with millisecond timestamps into
+# the millisecond archive directories
+MS_PER_DAY = SECONDS_PER_DAY * 1000
+
+_RecordBatch = tuple[
+    dict[Asset, list[TradeMessage]], list[tuple[Asset, SnapshotMessage]]
+]
+
+
+class LiveDataRecorder:
+    def __init__(
+        self,
+        client: KrakenFutureWebsocketClient | KrakenFutureWebsocketPool,
+        resource_path: Path,
+        snapshot_depth: Optional[int] = None,
+        poll_interval_seconds: float = 1.0,
+    ) -> None:
+        if poll_interval_seconds <= 0:
+            raise ValueError(
+                f"Poll interval must be positive (got '{poll_interval_seconds}')"
+            )
+        if snapshot_depth is not None and snapshot_depth < 0:
+            raise ValueError(f"Depth must be non-negative (got '{snapshot_depth}')")
+
+        self._client = client
+        self._resource_path = resource_path
+        self._snapshot_depth = snapshot_depth
+        self._poll_interval_seconds = poll_interval_seconds
+
+        # the recorder taps the feed through its own subscription, so the trade
+        # buffers and snapshot cache a strategy polls are left untouched
+        self._subscriptions: list[Subscription] = []
+        self._pending_trades: dict[Asset, list[TradeMessage]] = {}
+        self._dirty_books: set[Asset] = set()
+
+        # the event loop only copies out of the client, compression and file io
+        # happen on the writer thread
+        self._queue: queue.Queue[Optional[_RecordBatch]] = queue.Queue()
+        self._thread: Optional[Thread] = None
+        self._error: Optional[BaseException] = None
+
+        self._trade_writers: dict[Asset, tuple[int, TradeStreamWriter]] = {}
+        self._snapshot_writers: dict[Asset, tuple[int, SnapshotStreamWriter]] = {}
+
+        self.recorded_trades = 0
+        self.recorded_snapshots = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise ValueError("Recorder already started")
+
+        subscription = self._client.subscribe(
+            self._on_feed_event, [FeedEvent.TRADE, FeedEvent.BOOK_UPDATE]
+        )
+        self._subscriptions = (
+            subscription if isinstance(subscription, list) else [subscription]
+        )
+
+        self._thread = Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    async def run(self) -> None:
+        if self._thread is None:
+            self.start()
+
+        while True:
+            self.record()
+            await asyncio.sleep(self._poll_interval_seconds)
+
+    def _on_feed_event(self, asset: Asset, event: FeedEvent, payload: Any) -> None:
+        if event == FeedEvent.TRADE:
+            self._pending_trades.setdefault(asset, []).append(payload)
+        else:
+            self._dirty_books.add(asset)
+
+    def record(self) -> None:
+        if self._thread is None:
+            raise ValueError("Recorder must be started before recording")
+        if self._error is not None:
+            raise self._error
+
+        trades, self._pending_trades = self._pending_trades, {}
+
+        # only books that changed since the last record are copied, empty ones
+        # are skipped
+        snapshots = []
+        for asset in self._dirty_books:
+            snapshot = self._build_snapshot(asset)
+            if snapshot.bids or snapshot.asks:
+                snapshots.append((asset, snapshot))
+        self._dirty_books.clear()
+
+        if trades or snapshots:
+            self._queue.put((trades, snapshots))
+
+    def _build_snapshot(self, asset: Asset) -> SnapshotMessage:
+        return book_snapshot(
+            int(self._client.book_time(asset) * 1000),
+            asset_to_kraken(asset, Market.KRAKEN_USD_FUTURE),
+            self._client.bids[asset],
+            self._client.asks[asset],
+            self._snapshot_depth,
+        )
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+
+        if self._error is None:
+            self.record()
+
+        if isinstance(self._client, KrakenFutureWebsocketPool):
+            self._client.unsubscribe(self._subscriptions)
+        else:
+            for subscription in self._subscriptions:
+                self._client.unsubscribe(subscription)
+        self._subscriptions = []
+
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+        if self._error is not None:
+            raise self._error
+
+    def _write_loop(self) -> None:
+        try:
+            while (batch := self._queue.get()) is not None:
+                trades, snapshots = batch
+                for asset, asset_trades in trades.items():
+                    self._write_trades(asset, asset_trades)
+                for asset, snapshot in snapshots:
+                    self._write_snapshot(asset, snapshot)
+        except Exception as e:
+            _logger.exception("Live data recorder failed, stopped recording")
+            self._error = e
+        finally:
+            for _, trade_writer in self._trade_writers.values():
+                trade_writer.flush()
+            for _, snapshot_writer in self._snapshot_writers.values():
+                snapshot_writer.flush()
+            self._trade_writers.clear()
+            self._snapshot_writers.clear()
+
+    def _day_path(self, is_trade_data: bool, asset: Asset, day: int) -> Path:
+        feedcode = asset_to_kraken(asset, Market.KRAKEN_USD_FUTURE)
+        day_path = (
+            self._resource_path
+            / historical_data_dir(is_trade_data, TimeUnit.MILLISECONDS)
+            / feedcode
+        )
+        day_path.mkdir(parents=True, exist_ok=True)
+
+        file_name = datetime.fromtimestamp(
+            day * SECONDS_PER_DAY, tz=timezone.utc
+        ).strftime("%m_%d_%Y.bin")
+        return day_path / file_name
+
+    def _write_trades(self, asset: Asset, trades: list[TradeMessage]) -> None:
+        arr = np.array(
+            [(t.time, t.price, t.quantity, t.side.value) for t in trades],
+            dtype=TRADE_RECORD_DTYPE,
+        )
+
+        days = arr["time"] // MS_PER_DAY
+        boundaries = np.flatnonzero(np.diff(days)) + 1
+        for day_arr in np.split(arr, boundaries):
+            day = int(day_arr["time"][0] // MS_PER_DAY)
+
+            cur = self._trade_writers.get(asset)
+            if cur is None or cur[0] != day:
+                if cur is not None:
+                    cur[1].flush()
+                trade_writer = TradeStreamWriter()
+                file_path = self._day_path(True, asset, day)
+                trade_writer.open(file_path, append=file_path.exists())
+                cur = (day, trade_writer)
+                self._trade_writers[asset] = cur
+
+            cur[1].write_array(day_arr)
+            self.recorded_trades += len(day_arr)
+
+    def _write_snapshot(self, asset: Asset, snapshot: SnapshotMessage) -> None:
+        day = snapshot.time // MS_PER_DAY
+
+        cur = self._snapshot_writers.get(asset)
+        if cur is None or cur[0] != day:
+            if cur is not None:
+                cur[1].flush()
+            snapshot_writer = SnapshotStreamWriter()
+            file_path = self._day_path(False, asset, day)
+            snapshot_writer.open(file_path, append=file_path.exists())
+            cur = (day, snapshot_writer)
+            self._snapshot_writers[asset] = cur
+
+        cur[1].write(snapshot)
+        self.recorded_snapshots += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "recorded_trades": self.recorded_trades,
+            "recorded_snapshots": self.recorded_snapshots,
+            "pending_batches": self._queue.qsize(),
+        }
@@ -9,7 +9,8 @@ from pysrc.data_handlers.kraken.historical.snapshots_data_handler import (
 )
 from pysrc.data_loaders.base_data_loader import BaseDataLoader
 from pysrc.util.exceptions import DIE
-from pysrc.util.types import Asset, Market
+from pysrc.util.historical_data_utils import historical_data_dir
+from pysrc.util.types import Asset, Market, TimeUnit
 
 
 class RawSnapshotsDataLoader(BaseDataLoader):
@@ -20,10 +21,14 @@ class RawSnapshotsDataLoader(BaseDataLoader):
         market: Market,
         since: date,
         until: date,
+        time_unit: TimeUnit = TimeUnit.SECONDS,
     ) -> None:
         self._feedcode = asset_to_kraken(asset, market)
         self._resource_path = resource_path
-        self._asset_resource_path = resource_path / "snapshots" / self._feedcode
+        self._time_unit = time_unit
+        self._asset_resource_path = (
+            resource_path / historical_data_dir(False, time_unit) / self._feedcode
+        )
         if not self._asset_resource_path.exists():
             DIE(
                 f"Directory for asset snapshots data '{self._asset_resource_path}' doesn't exist"
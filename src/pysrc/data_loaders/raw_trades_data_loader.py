@@ -7,7 +7,8 @@ from pysrc.adapters.messages import TradeMessage
 from pysrc.data_handlers.kraken.historical.trades_data_handler import TradesDataHandler
 from pysrc.data_loaders.base_data_loader import BaseDataLoader
 from pysrc.util.exceptions import DIE
-from pysrc.util.types import Asset, Market
+from pysrc.util.historical_data_utils import historical_data_dir
+from pysrc.util.types import Asset, Market, TimeUnit
 
 
 class RawTradesDataLoader(BaseDataLoader):
@@ -18,10 +19,14 @@ class RawTradesDataLoader(BaseDataLoader):
         market: Market,
         since: date,
         until: date,
+        time_unit: TimeUnit = TimeUnit.SECONDS,
     ) -> None:
         self._feedcode = asset_to_kraken(asset, market)
         self._resource_path = resource_path
-        self._asset_resource_path = resource_path / "trades" / self._feedcode
+        self._time_unit = time_unit
+        self._asset_resource_path = (
+            resource_path / historical_data_dir(True, time_unit) / self._feedcode
+        )
         if not self._asset_resource_path.exists():
             DIE(
                 f"Directory for asset trades data '{self._asset_resource_path}' doesn't exist"
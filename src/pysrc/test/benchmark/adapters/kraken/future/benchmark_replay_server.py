@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from pysrc.adapters.kraken.future.kraken_future_replay_server import (
+    KrakenFutureReplayServer,
+)
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    KrakenFutureWebsocketClient,
+)
+from pysrc.adapters.messages import SnapshotMessage, TradeMessage
+from pysrc.data_handlers.kraken.historical.snapshots_data_handler import (
+    SnapshotsDataHandler,
+)
+from pysrc.data_handlers.kraken.historical.trades_data_handler import (
+    TradesDataHandler,
+)
+from pysrc.util.types import Asset, Market, OrderSide
+
+_DAY_START = 1727740800
+
+
+def write_archives(resource_path: Path, num_seconds: int, depth: int) -> None:
+    rng = random.Random(42)
+    for kind in ("trades_ms", "snapshots"):
+        (resource_path / kind / "PF_XBTUSD").mkdir(parents=True)
+
+    trades = [
+        TradeMessage(
+            (_DAY_START + i // 10) * 1000 + i % 10,
+            "PF_XBTUSD",
+            1,
+            60000.0 + rng.randint(-20, 20) * 0.5,
+            rng.random(),
+            OrderSide.BID if rng.random() < 0.5 else OrderSide.ASK,
+            Market.KRAKEN_USD_FUTURE,
+        )
+        for i in range(num_seconds * 10)
+    ]
+    TradesDataHandler().write(
+        resource_path / "trades_ms" / "PF_XBTUSD" / "10_01_2024.bin", trades
+    )
+
+    snapshots = []
+    for i in range(num_seconds):
+        mid = 60000.0 + rng.randint(-10, 10) * 0.5
+        snapshots.append(
+            SnapshotMessage(
+                _DAY_START + i,
+                "PF_XBTUSD",
+                [[mid - 0.5 * (j + 1), rng.random()] for j in range(depth)],
+                [[mid + 0.5 * (j + 1), rng.random()] for j in range(depth)],
+                Market.KRAKEN_USD_FUTURE,
+            )
+        )
+    SnapshotsDataHandler().write(
+        resource_path / "snapshots" / "PF_XBTUSD" / "10_01_2024.bin", snapshots
+    )
+
+
+async def replay(resource_path: Path) -> None:
+    server = KrakenFutureReplayServer(
+        resource_path, [Asset.BTC], date(2024, 10, 1), date(2024, 10, 2), speed=None
+    )
+    await server.start()
+    client = KrakenFutureWebsocketClient([Asset.BTC], base_url=server.url)
+
+    start = time.perf_counter()
+    client.start()
+    await server.finished.wait()
+    elapsed = time.perf_counter() - start
+
+    # let the client drain what is still in flight before reading its metrics
+    await asyncio.sleep(0.5)
+    await client.stop()
+    await server.stop()
+
+    print(f"replayed {server.messages_sent} messages in {elapsed:.2f}s")
+    print(f"{'throughput':<24} {server.messages_sent / elapsed / 1e3:10.1f}k msgs/s")
+    for feed, metrics in client.feed_metrics_snapshot()["feeds"].items():
+        for latency in metrics["products"].values():
+            handler = latency["receive_to_handler"]
+            print(
+                f"{feed + ' handler':<24} p50 {handler['p50_seconds'] * 1e6:8.1f}us"
+                f" p99 {handler['p99_seconds'] * 1e6:8.1f}us"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_archives(Path(tmp_dir), args.seconds, args.depth)
+        asyncio.run(replay(Path(tmp_dir)))
+
+
+if __name__ == "__main__":
+    main()
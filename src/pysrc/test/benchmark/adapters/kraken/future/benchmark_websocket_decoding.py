@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import os
+import time
+
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    KrakenFutureWebsocketClient,
+)
+from pysrc.util.fast_json import available_json_backends, get_json_loads
+from pysrc.util.types import Asset
+
+_DEFAULT_FRAMES_PATH = os.path.join(
+    os.path.dirname(__file__), "resources", "kraken_future_frames.jsonl"
+)
+
+
+def load_frames(path: str) -> list[bytes]:
+    with open(path, "rb") as f:
+        return [line.rstrip(b"\n") for line in f if line.strip()]
+
+
+def report(name: str, num_messages: int, elapsed: float) -> None:
+    print(f"{name:<24} {num_messages / elapsed / 1e3:10.1f}k msgs/s")
+
+
+async def replay(
+    frames: list[bytes], json_backend: str, repeats: int, batch_size: int
+) -> None:
+    json_loads = get_json_loads(json_backend)
+    num_messages = len(frames) * repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            json_loads(frame)
+    report(f"{json_backend} decode", num_messages, time.perf_counter() - start)
+
+    client = KrakenFutureWebsocketClient(
+        [Asset.BTC, Asset.ETH], json_backend=json_backend
+    )
+    batch: list[tuple[float, float, str | bytes]] = [
+        (time.perf_counter(), time.time(), frame) for frame in frames
+    ]
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for i in range(0, len(batch), batch_size):
+            await client._handle_batch(batch[i : i + batch_size])
+    report(f"{json_backend} decode+dispatch", num_messages, time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", default=_DEFAULT_FRAMES_PATH)
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    print(f"replaying {len(frames)} frames x {args.repeats} on one core")
+
+    for json_backend in available_json_backends():
+        asyncio.run(replay(frames, json_backend, args.repeats, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import io
+import os
+import tempfile
+import time
+from typing import Callable
+
+import numpy as np
+
+from pysrc.adapters.kraken.historical.trades.historical_trades_data_client import (
+    HistoricalTradesDataClient,
+)
+
+
+def generate_trades_csv(path: str, num_rows: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    times = 1719792015 + np.cumsum(rng.integers(0, 3, num_rows))
+    prices = rng.uniform(0.1, 70000, num_rows)
+    volumes = rng.exponential(5, num_rows)
+
+    np.savetxt(
+        path,
+        np.column_stack((times, prices, volumes)),
+        fmt=["%d", "%.6g", "%.8g"],
+        delimiter=",",
+    )
+
+
+def time_call(name: str, num_rows: int, fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f}s {num_rows / elapsed / 1e6:8.2f}M rows/s")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    client = HistoricalTradesDataClient()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "XBTUSD.csv")
+        generate_trades_csv(csv_path, args.rows)
+        with open(csv_path, "rb") as f:
+            data = f.read()
+
+        print(f"{args.rows} rows, {len(data) / (1 << 20):.1f} MiB")
+
+        baseline = time_call(
+            "np.loadtxt",
+            args.rows,
+            lambda: np.loadtxt(
+                io.BytesIO(data), delimiter=",", dtype=client._np_dtype, ndmin=1
+            ),
+        )
+        fast = time_call(
+            "_parse_csv_block", args.rows, lambda: client._parse_csv_block(data)
+        )
+        time_call(
+            "_parse_csv_block (fallback)",
+            args.rows,
+            lambda: client._parse_csv_block(data + b"malformed\n"),
+        )
+
+        with open(csv_path, "rb") as f:
+            time_call(
+                "_convert_csv_files",
+                args.rows,
+                lambda: client._convert_csv_files([f], tmp_dir),
+            )
+
+        print(f"speedup over np.loadtxt: {baseline / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
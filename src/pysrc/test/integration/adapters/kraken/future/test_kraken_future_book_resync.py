@@ -0,0 +1,99 @@
+import asyncio
+import shutil
+from datetime import date
+from typing import Any
+
+import pytest
+
+from pysrc.adapters.kraken.future.kraken_future_replay_server import (
+    KrakenFutureReplayServer,
+)
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    KrakenFutureWebsocketClient,
+)
+from pysrc.adapters.messages import SnapshotMessage
+from pysrc.data_handlers.kraken.historical.snapshots_data_handler import (
+    SnapshotsDataHandler,
+)
+from pysrc.test.helpers import get_resources_path
+from pysrc.util.types import Asset, Market
+
+resource_path = get_resources_path(__file__) / "resync"
+
+_DAY_START = 1727740800
+
+
+class _LossyClient(KrakenFutureWebsocketClient):
+    def __init__(self, base_url: str, drop_seq: int) -> None:
+        super().__init__([Asset.BTC, Asset.ETH], base_url=base_url)
+        self._drop_seq = drop_seq
+
+    async def on_message(self, message: dict[str, Any]) -> None:
+        # loses one btc book delta as if it never arrived
+        if (
+            message.get("feed") == "book"
+            and message.get("product_id") == "PF_XBTUSD"
+            and message.get("seq") == self._drop_seq
+        ):
+            self._drop_seq = -1
+            return
+        await super().on_message(message)
+
+
+def _write_archives() -> list[SnapshotMessage]:
+    snapshots = []
+    for feedcode in ("PF_XBTUSD", "PF_ETHUSD"):
+        (resource_path / "snapshots" / feedcode).mkdir(parents=True, exist_ok=True)
+        feed_snapshots = [
+            SnapshotMessage(
+                _DAY_START + i,
+                feedcode,
+                [[100.0 - j - 0.5 * (i % 2), 1.0 + i] for j in range(3)],
+                [[101.0 + j, 1.0] for j in range(3)],
+                Market.KRAKEN_USD_FUTURE,
+            )
+            for i in range(6)
+        ]
+        SnapshotsDataHandler().write(
+            resource_path / "snapshots" / feedcode / "10_01_2024.bin", feed_snapshots
+        )
+        snapshots.append(feed_snapshots[-1])
+    return snapshots
+
+
+@pytest.mark.asyncio
+async def test_resync_after_gap() -> None:
+    last_snapshots = _write_archives()
+    server = KrakenFutureReplayServer(
+        resource_path,
+        [Asset.BTC, Asset.ETH],
+        date(2024, 10, 1),
+        date(2024, 10, 2),
+        speed=20.0,
+    )
+    await server.start()
+    client = _LossyClient(server.url, drop_seq=3)
+    client.start()
+
+    try:
+        await asyncio.wait_for(server.finished.wait(), timeout=10)
+        await asyncio.sleep(0.1)
+    finally:
+        await client.stop()
+        await server.stop()
+        shutil.rmtree(resource_path)
+
+    stats = client.book_sequence_stats()
+    assert stats[Asset.BTC]["gaps"] == 1
+    assert stats[Asset.BTC]["resyncs"] == 1
+    assert not stats[Asset.BTC]["resyncing"]
+    assert stats[Asset.ETH]["gaps"] == 0
+
+    # both books end up equal to the archive despite the lost btc delta
+    for asset, snapshot in zip((Asset.BTC, Asset.ETH), last_snapshots):
+        assert [list(level) for level in client.bids[asset].items()[::-1]] == [
+            list(level) for level in snapshot.bids
+        ]
+        assert [list(level) for level in client.asks[asset].items()] == [
+            list(level) for level in snapshot.asks
+        ]
@@ -0,0 +1,184 @@
+import asyncio
+import shutil
+import time
+from datetime import date
+
+import pytest
+
+from pysrc.adapters.kraken.future.kraken_future_replay_server import (
+    KrakenFutureReplayServer,
+)
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    KrakenFutureWebsocketClient,
+)
+from pysrc.adapters.messages import SnapshotMessage, TradeMessage
+from pysrc.data_handlers.kraken.historical.snapshots_data_handler import (
+    SnapshotsDataHandler,
+)
+from pysrc.data_handlers.kraken.historical.trades_data_handler import (
+    TradesDataHandler,
+)
+from pysrc.test.helpers import get_resources_path
+from pysrc.util.types import Asset, Market, OrderSide
+
+resource_path = get_resources_path(__file__) / "replay"
+
+_DAY_START = 1727740800
+
+
+def _write_archives() -> None:
+    # live recorded trades in milliseconds next to second stamped snapshots
+    for kind in ("trades_ms", "snapshots"):
+        (resource_path / kind / "PF_XBTUSD").mkdir(parents=True, exist_ok=True)
+
+    TradesDataHandler().write(
+        resource_path / "trades_ms" / "PF_XBTUSD" / "10_01_2024.bin",
+        [
+            TradeMessage(
+                (_DAY_START + i) * 1000 + 250,
+                "PF_XBTUSD",
+                1,
+                100.0 + i,
+                1.0,
+                OrderSide.BID if i % 2 else OrderSide.ASK,
+                Market.KRAKEN_USD_FUTURE,
+            )
+            for i in range(4)
+        ],
+    )
+    SnapshotsDataHandler().write(
+        resource_path / "snapshots" / "PF_XBTUSD" / "10_01_2024.bin",
+        [
+            SnapshotMessage(
+                _DAY_START,
+                "PF_XBTUSD",
+                [[99.0, 1.0], [98.0, 2.0]],
+                [[101.0, 1.0]],
+                Market.KRAKEN_USD_FUTURE,
+            ),
+            SnapshotMessage(
+                _DAY_START + 2,
+                "PF_XBTUSD",
+                [[99.5, 3.0], [99.0, 1.0]],
+                [[101.0, 0.5], [102.0, 1.0]],
+                Market.KRAKEN_USD_FUTURE,
+            ),
+        ],
+    )
+
+
+def _write_trades(kind: str, day: str, times: list[int]) -> None:
+    (resource_path / kind / "PF_XBTUSD").mkdir(parents=True, exist_ok=True)
+    TradesDataHandler().write(
+        resource_path / kind / "PF_XBTUSD" / day,
+        [
+            TradeMessage(
+                trade_time,
+                "PF_XBTUSD",
+                1,
+                100.0,
+                1.0,
+                OrderSide.BID,
+                Market.KRAKEN_USD_FUTURE,
+            )
+            for trade_time in times
+        ],
+    )
+
+
+async def _replay(
+    speed: float | None, until: date = date(2024, 10, 2)
+) -> tuple[KrakenFutureWebsocketClient, float]:
+    server = KrakenFutureReplayServer(
+        resource_path, [Asset.BTC], date(2024, 10, 1), until, speed=speed
+    )
+    await server.start()
+    client = KrakenFutureWebsocketClient([Asset.BTC], base_url=server.url)
+
+    start = time.monotonic()
+    client.start()
+    try:
+        await asyncio.wait_for(server.finished.wait(), timeout=10)
+        elapsed = time.monotonic() - start
+        await asyncio.sleep(0.1)
+    finally:
+        await client.stop()
+        await server.stop()
+
+    assert server.replays_finished == 1
+    return client, elapsed
+
+
+@pytest.mark.asyncio
+async def test_replay_as_fast_as_possible() -> None:
+    _write_archives()
+    try:
+        client, _ = await _replay(None)
+    finally:
+        shutil.rmtree(resource_path)
+
+    trades = client.poll_trades()
+    assert [trade.price for trade in trades] == [100.0, 101.0, 102.0, 103.0]
+    assert [trade.time for trade in trades] == [
+        (_DAY_START + i) * 1000 + 250 for i in range(4)
+    ]
+    assert trades[1].side == OrderSide.BID
+
+    # the second snapshot reaches the client as book deltas
+    assert list(client.bids[Asset.BTC].items()) == [(99.0, 1.0), (99.5, 3.0)]
+    assert list(client.asks[Asset.BTC].items()) == [(101.0, 0.5), (102.0, 1.0)]
+
+
+@pytest.mark.asyncio
+async def test_replay_missing_days() -> None:
+    # nothing on the first and third day, the asset still replays its other days
+    second_day = _DAY_START + 86_400
+    _write_trades("trades", "10_02_2024.bin", [second_day, second_day + 1])
+    _write_trades("trades", "10_04_2024.bin", [second_day + 2 * 86_400])
+    try:
+        client, _ = await _replay(None, until=date(2024, 10, 5))
+    finally:
+        shutil.rmtree(resource_path)
+
+    assert [trade.time for trade in client.poll_trades()] == [
+        second_day * 1000,
+        (second_day + 1) * 1000,
+        (second_day + 2 * 86_400) * 1000,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_replay_one_archive_per_asset() -> None:
+    # the same trades recorded in both units are only replayed once
+    _write_trades("trades", "10_01_2024.bin", [_DAY_START, _DAY_START + 1])
+    _write_trades(
+        "trades_ms",
+        "10_01_2024.bin",
+        [_DAY_START * 1000 + 250, (_DAY_START + 1) * 1000 + 250],
+    )
+    try:
+        client, _ = await _replay(None)
+    finally:
+        shutil.rmtree(resource_path)
+
+    assert [trade.time for trade in client.poll_trades()] == [
+        _DAY_START * 1000 + 250,
+        (_DAY_START + 1) * 1000 + 250,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_replay_at_speed() -> None:
+    _write_archives()
+    try:
+        # three seconds of archive at 10x speed
+        _, elapsed = await _replay(10.0)
+    finally:
+        shutil.rmtree(resource_path)
+
+    assert elapsed >= 0.3
+
+    with pytest.raises(ValueError):
+        KrakenFutureReplayServer(
+            resource_path, [Asset.BTC], date(2024, 10, 1), date(2024, 10, 2), speed=0
+        )
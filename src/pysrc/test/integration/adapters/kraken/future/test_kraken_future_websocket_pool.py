@@ -0,0 +1,95 @@
+import asyncio
+import json
+from typing import Any
+
+import pytest
+from websockets.asyncio.server import ServerConnection, serve
+
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import FeedEvent
+from pysrc.adapters.kraken.future.kraken_future_websocket_pool import (
+    KrakenFutureWebsocketPool,
+)
+from pysrc.util.types import Asset
+
+
+class _KrakenStandIn:
+    def __init__(self) -> None:
+        self.subscriptions: list[tuple[str, list[str]]] = []
+        self.connections = 0
+        self.dropped_first_connection = False
+
+    async def handler(self, connection: ServerConnection) -> None:
+        self.connections += 1
+        async for message in connection:
+            data = json.loads(message)
+            feed, product_ids = data["feed"], data["product_ids"]
+            self.subscriptions.append((feed, product_ids))
+            await connection.send(
+                json.dumps(
+                    {"event": "subscribed", "feed": feed, "product_ids": product_ids}
+                )
+            )
+
+            if feed != "book":
+                continue
+
+            # the first connection that subscribes to btc is dropped once, only
+            # its shard has to reconnect
+            if "PF_XBTUSD" in product_ids and not self.dropped_first_connection:
+                self.dropped_first_connection = True
+                await connection.close()
+                return
+
+            for product_id in product_ids:
+                await connection.send(
+                    json.dumps(
+                        {
+                            "feed": "book_snapshot",
+                            "product_id": product_id,
+                            "bids": [{"price": 100.0, "qty": 1.0}],
+                            "asks": [{"price": 101.0, "qty": 1.0}],
+                        }
+                    )
+                )
+
+
+@pytest.mark.asyncio
+async def test_pool_against_stand_in() -> None:
+    stand_in = _KrakenStandIn()
+    server = await serve(stand_in.handler, "localhost", 0)
+    port = list(server.sockets)[0].getsockname()[1]
+
+    pool = KrakenFutureWebsocketPool(
+        [Asset.BTC, Asset.ETH, Asset.SOL],
+        num_connections=2,
+        retry_delay=0,
+        base_url=f"ws://localhost:{port}",
+    )
+    updates: list[Any] = []
+    pool.subscribe(
+        lambda asset, event, top: updates.append(asset), events=[FeedEvent.TOP_OF_BOOK]
+    )
+    pool.start()
+
+    try:
+        for _ in range(100):
+            if len(updates) == 3:
+                break
+            await asyncio.sleep(0.05)
+
+        assert sorted(updates, key=lambda asset: asset.value) == [
+            Asset.BTC,
+            Asset.ETH,
+            Asset.SOL,
+        ]
+        assert ("book", ["PF_XBTUSD", "PF_SOLUSD"]) in stand_in.subscriptions
+        assert ("book", ["PF_ETHUSD"]) in stand_in.subscriptions
+
+        # the eth shard kept its connection while the btc shard reconnected
+        assert stand_in.connections == 3
+        for asset in (Asset.BTC, Asset.ETH, Asset.SOL):
+            assert pool.top_of_book(asset) == ((100.0, 1.0), (101.0, 1.0))
+    finally:
+        await pool.stop()
+        server.close()
+        await server.wait_closed()
@@ -72,3 +72,45 @@ async def test_mock_websocket_client(mock_server: AsyncGenerator[Server, None])
 
         server_instance.close()
         await server_instance.wait_closed()
+
+
+class BatchingWebSocketClient(MockWebSocketClient):
+    def __init__(self, base_url: str):
+        super().__init__(base_url)
+        self.batch_sizes: list[int] = []
+
+    async def on_messages(self, messages: list[dict]) -> None:
+        self.batch_sizes.append(len(messages))
+        await super().on_messages(messages)
+
+
+@pytest.mark.asyncio
+async def test_websocket_client_burst() -> None:
+    num_messages = 2000
+
+    async def handler(connection: ServerConnection) -> None:
+        async for _ in connection:
+            for i in range(num_messages):
+                await connection.send(json.dumps({"feed": "test_feed", "seq": i}))
+
+    server = await serve(handler, "localhost", 0)
+    port = list(server.sockets)[0].getsockname()[1]
+
+    client = BatchingWebSocketClient(f"ws://localhost:{port}")
+    client.start()
+
+    try:
+        for _ in range(50):
+            if len(client.messages) == num_messages:
+                break
+            await asyncio.sleep(0.1)
+
+        assert [msg["seq"] for msg in client.messages] == list(range(num_messages))
+        assert max(client.batch_sizes) > 1
+        assert client.latency_stats.count == num_messages
+        assert client.latency_stats.max_seconds < 5
+    finally:
+        await client.stop()
+
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncGenerator, Generator
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import pytest_asyncio
+
+from pysrc.adapters.kraken.future.containers import (
+    Order,
+    OrderRequest,
+    OrderStatus,
+    OrderType,
+)
+from pysrc.adapters.kraken.future.kraken_future_async_client import (
+    AsyncKrakenFutureClient,
+)
+from pysrc.util.types import OrderSide
+
+
+class _FuturesStandIn(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _FuturesStandInHandler)
+        self.delay_seconds = 0.0
+        self.requests: list[tuple[str, dict[str, list[str]]]] = []
+        self.connections: set[int] = set()
+        self.lock = threading.Lock()
+
+
+class _FuturesStandInHandler(BaseHTTPRequestHandler):
+    server: _FuturesStandIn
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _respond(self, body: dict) -> None:
+        encoded = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def do_GET(self) -> None:
+        self._respond({"result": "success", "openOrders": []})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        data = parse_qs(self.rfile.read(length).decode())
+        path = urlparse(self.path).path
+        with self.server.lock:
+            self.server.requests.append((path, data))
+            self.server.connections.add(self.client_address[1])
+
+        time.sleep(self.server.delay_seconds)
+
+        if "APIKey" not in self.headers or "Authent" not in self.headers:
+            self._respond({"result": "error", "error": "authenticationError"})
+        elif path.endswith("/sendorder"):
+            self._respond(
+                {
+                    "result": "success",
+                    "sendStatus": {
+                        "order_id": f"id-{data['limitPrice'][0]}",
+                        "status": "placed",
+                    },
+                }
+            )
+        elif path.endswith("/cancelorder"):
+            self._respond({"result": "error", "error": "apiLimitExceeded"})
+        else:
+            self._respond({"result": "error", "error": "unknown route"})
+
+
+@pytest.fixture
+def stand_in() -> Generator[_FuturesStandIn, None, None]:
+    server = _FuturesStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest_asyncio.fixture
+async def client(
+    stand_in: _FuturesStandIn,
+) -> AsyncGenerator[AsyncKrakenFutureClient, None]:
+    client = AsyncKrakenFutureClient(
+        "public",
+        "cHJpdmF0ZQ==",
+        base_url=f"http://127.0.0.1:{stand_in.server_address[1]}",
+        max_connections=4,
+    )
+    yield client
+    await client.close()
+
+
+def _order_request(limit_price: float) -> OrderRequest:
+    return OrderRequest(
+        Order(
+            "PF_XBTUSD",
+            OrderSide.BID,
+            size=1,
+            order_type=OrderType.LMT,
+            limit_price=limit_price,
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_orders(
+    stand_in: _FuturesStandIn, client: AsyncKrakenFutureClient
+) -> None:
+    stand_in.delay_seconds = 0.2
+
+    start = time.perf_counter()
+    orders = await asyncio.gather(
+        *(client.send_order(_order_request(100 + i)) for i in range(4))
+    )
+    elapsed = time.perf_counter() - start
+
+    # four round trips overlap instead of running back to back
+    assert elapsed < 0.6
+    assert client.max_in_flight == 4
+    assert [o.order_id for o in orders] == [f"id-{100 + i}" for i in range(4)]
+    assert all(o.status == OrderStatus.PLACED for o in orders)
+
+    # later requests reuse the pooled connections
+    stand_in.delay_seconds = 0.0
+    for i in range(8):
+        await client.send_order(_order_request(200 + i))
+    assert len(stand_in.connections) <= 4
+
+    metrics = client.metrics()
+    assert metrics["in_flight"] == 0
+    assert metrics["routes"]["/api/v3/sendorder"]["count"] == 12
+
+
+@pytest.mark.asyncio
+async def test_timeout(
+    stand_in: _FuturesStandIn, client: AsyncKrakenFutureClient
+) -> None:
+    stand_in.delay_seconds = 0.5
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.send_order(_order_request(100), timeout_seconds=0.1)
+    assert client.timeouts == 1
+    assert client.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_error_response(client: AsyncKrakenFutureClient) -> None:
+    with pytest.raises(ValueError, match="apiLimitExceeded"):
+        await client.cancel_order("id-100")
+    assert client.errors == 0
+
+    assert await client.get_open_orders() == []
@@ -0,0 +1,168 @@
+import asyncio
+from typing import Any, Optional
+
+import pytest
+
+from pysrc.adapters.kraken.future.containers import (
+    Order,
+    OrderRequest,
+    OrderStatus,
+    OrderType,
+    PriceUnit,
+)
+from pysrc.adapters.kraken.future.kraken_future_async_client import (
+    AsyncKrakenFutureClient,
+)
+from pysrc.adapters.kraken.future.kraken_future_order_gateway import (
+    KrakenFutureOrderGateway,
+)
+from pysrc.util.types import OrderSide
+
+
+class _BatchClient(AsyncKrakenFutureClient):
+    def __init__(self) -> None:
+        super().__init__("public", "cHJpdmF0ZQ==", max_connections=1)
+        self.batches: list[list[dict[str, Any]]] = []
+        self.process_befores: list[Optional[str]] = []
+        self.error: Optional[Exception] = None
+
+    async def batch_order(
+        self,
+        items: list[dict[str, Any]],
+        process_before: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> list[dict[str, Any]]:
+        self.batches.append(items)
+        self.process_befores.append(process_before)
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+
+        # answered out of order, edits and cancels only by order id
+        statuses = []
+        for item in reversed(items):
+            match item["order"]:
+                case "send":
+                    statuses.append(
+                        {
+                            "order_tag": item["order_tag"],
+                            "order_id": f"id-{item['limitPrice']}",
+                            "status": "placed",
+                        }
+                    )
+                case "edit":
+                    statuses.append({"order_id": item["order_id"], "status": "edited"})
+                case "cancel":
+                    statuses.append(
+                        {"order_id": item["order_id"], "status": "cancelled"}
+                    )
+        return statuses
+
+
+def _order_request(limit_price: float, order_id: Optional[str] = None) -> OrderRequest:
+    return OrderRequest(
+        Order(
+            "PF_XBTUSD",
+            OrderSide.BID,
+            size=1,
+            order_type=OrderType.LMT,
+            limit_price=limit_price,
+            order_id=order_id,
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_coalesces_mixed_intents() -> None:
+    client = _BatchClient()
+    gateway = KrakenFutureOrderGateway(client, window_seconds=0.01)
+
+    sent, edited, cancelled = await asyncio.gather(
+        gateway.send_order(_order_request(100)),
+        gateway.edit_order(_order_request(101, "id-a")),
+        gateway.cancel_order("id-b"),
+    )
+
+    assert len(client.batches) == 1
+    assert [item["order"] for item in client.batches[0]] == ["send", "edit", "cancel"]
+    assert len({item["order_tag"] for item in client.batches[0]}) == 3
+
+    assert sent.order_id == "id-100"
+    assert sent.status == OrderStatus.PLACED
+    assert edited
+    assert cancelled == OrderStatus.CANCELLED
+    assert gateway.stats()["intents_sent"] == 3
+
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_max_batch_size() -> None:
+    client = _BatchClient()
+    gateway = KrakenFutureOrderGateway(client, window_seconds=10.0, max_batch_size=4)
+
+    orders = await asyncio.gather(
+        *(gateway.send_order(_order_request(100 + i)) for i in range(8))
+    )
+
+    # full batches go out without waiting for the window
+    assert [len(batch) for batch in client.batches] == [4, 4]
+    assert [o.order_id for o in orders] == [f"id-{100 + i}" for i in range(8)]
+
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_keeps_order_request_fields() -> None:
+    client = _BatchClient()
+    gateway = KrakenFutureOrderGateway(client, window_seconds=0.01)
+
+    deadline = "2024-10-01T00:00:01.000Z"
+    offset_send = _order_request(100)
+    offset_send.process_before = deadline
+    offset_send.limit_price_offset_value = 0.5
+    offset_send.limit_price_offset_unit = PriceUnit.PERCENT
+    deadline_edit = _order_request(101, "id-a")
+    deadline_edit.process_before = deadline
+
+    await asyncio.gather(
+        gateway.send_order(offset_send),
+        gateway.edit_order(deadline_edit),
+        gateway.send_order(_order_request(102)),
+        gateway.cancel_order("id-b", process_before=deadline),
+    )
+
+    # ProcessBefore is per request, so only intents sharing it are coalesced
+    batches = dict(zip(client.process_befores, client.batches))
+    assert len(client.batches) == 2
+    assert [item["order"] for item in batches[deadline]] == ["send", "edit", "cancel"]
+    assert [item["limitPrice"] for item in batches[None]] == [102]
+
+    send_item = batches[deadline][0]
+    assert send_item["limitPriceOffsetValue"] == 0.5
+    assert send_item["limitPriceOffsetUnit"] == "percent"
+    assert batches[None][0]["limitPriceOffsetValue"] is None
+
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_failure() -> None:
+    client = _BatchClient()
+    client.error = ValueError("Route /api/v3/batchorder failed with error 'x'")
+    gateway = KrakenFutureOrderGateway(client, window_seconds=0.0)
+
+    results = await asyncio.gather(
+        gateway.send_order(_order_request(100)),
+        gateway.cancel_order("id-b"),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+
+    # a malformed order fails on its own without joining a batch
+    with pytest.raises(ValueError):
+        await gateway.send_order(OrderRequest(Order("PF_XBTUSD", OrderSide.BID)))
+    await gateway.flush()
+    assert len(client.batches) == 1
+
+    await client.close()
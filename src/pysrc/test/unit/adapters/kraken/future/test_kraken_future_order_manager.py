@@ -0,0 +1,188 @@
+import asyncio
+from typing import Optional
+
+import pytest
+
+from pysrc.adapters.kraken.future.containers import (
+    OpenPosition,
+    Order,
+    OrderRequest,
+    OrderStatus,
+    OrderType,
+)
+from pysrc.adapters.kraken.future.kraken_future_async_client import (
+    AsyncKrakenFutureClient,
+)
+from pysrc.adapters.kraken.future.kraken_future_order_manager import (
+    KrakenFutureOrderManager,
+)
+from pysrc.util.types import OrderSide, PositionSide
+
+
+class _ExchangeClient(AsyncKrakenFutureClient):
+    def __init__(self) -> None:
+        super().__init__("public", "cHJpdmF0ZQ==", max_connections=1)
+        self.remote_orders: list[Order] = []
+        self.remote_positions: list[OpenPosition] = []
+        self.next_id = 0
+        self.rest_delay = asyncio.Event()
+        self.rest_delay.set()
+
+    async def send_order(
+        self, order_request: OrderRequest, timeout_seconds: Optional[float] = None
+    ) -> Order:
+        order_request.order.order_id = f"id-{self.next_id}"
+        order_request.order.status = OrderStatus.PLACED
+        self.next_id += 1
+        return order_request.order
+
+    async def edit_order(
+        self, new_order_request: OrderRequest, timeout_seconds: Optional[float] = None
+    ) -> bool:
+        return True
+
+    async def cancel_order(
+        self,
+        order_id: str,
+        process_before: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> OrderStatus:
+        return OrderStatus.CANCELLED
+
+    async def get_open_orders(
+        self, timeout_seconds: Optional[float] = None
+    ) -> list[Order]:
+        await self.rest_delay.wait()
+        return self.remote_orders
+
+    async def get_open_positions(
+        self, timeout_seconds: Optional[float] = None
+    ) -> list[OpenPosition]:
+        return self.remote_positions
+
+
+def _order_request(
+    symbol: str, side: OrderSide, limit_price: float, size: float = 2
+) -> OrderRequest:
+    return OrderRequest(
+        Order(
+            symbol, side, size=size, order_type=OrderType.LMT, limit_price=limit_price
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_tracks_acknowledgements() -> None:
+    client = _ExchangeClient()
+    manager = KrakenFutureOrderManager(client)
+
+    bid = await manager.send_order(_order_request("PF_XBTUSD", OrderSide.BID, 100))
+    ask = await manager.send_order(_order_request("PF_XBTUSD", OrderSide.ASK, 101))
+    await manager.send_order(_order_request("PF_ETHUSD", OrderSide.BID, 10))
+
+    assert manager.get_order("id-0") is bid
+    assert manager.open_orders("PF_XBTUSD") == [bid, ask]
+    assert manager.open_orders("PF_XBTUSD", OrderSide.ASK) == [ask]
+    assert len(manager.open_orders()) == 3
+
+    edit = _order_request("PF_XBTUSD", OrderSide.ASK, 102, size=3)
+    edit.order.order_id = "id-1"
+    assert await manager.edit_order(edit)
+    assert ask.limit_price == 102
+    assert ask.unfilled_size == 3
+
+    assert await manager.cancel_order("id-0") == OrderStatus.CANCELLED
+    assert manager.get_order("id-0") is None
+    assert manager.open_orders("PF_XBTUSD", OrderSide.BID) == []
+
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_fills_update_positions() -> None:
+    client = _ExchangeClient()
+    manager = KrakenFutureOrderManager(client)
+
+    bid = await manager.send_order(_order_request("PF_XBTUSD", OrderSide.BID, 100))
+    manager.apply_fill("PF_XBTUSD", OrderSide.BID, 100, 1, "t0", bid.order_id)
+    assert bid.status == OrderStatus.PARTIALLY_FILLED
+    assert bid.unfilled_size == 1
+
+    manager.apply_fill("PF_XBTUSD", OrderSide.BID, 102, 1, "t1", bid.order_id)
+    assert manager.get_order("id-0") is None
+    assert manager.net_position("PF_XBTUSD") == 2
+    position = manager.get_position("PF_XBTUSD")
+    assert position is not None
+    assert position.price == 101
+
+    # flipping through flat takes the fill price
+    manager.apply_fill("PF_XBTUSD", OrderSide.ASK, 99, 3, "t2")
+    position = manager.get_position("PF_XBTUSD")
+    assert position is not None
+    assert position.position_side == PositionSide.SHORT
+    assert position.price == 99
+    assert manager.net_position("PF_XBTUSD") == -1
+
+    manager.apply_fill("PF_XBTUSD", OrderSide.BID, 98, 1, "t3")
+    assert manager.get_position("PF_XBTUSD") is None
+
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_reconcile() -> None:
+    client = _ExchangeClient()
+    manager = KrakenFutureOrderManager(client)
+
+    await manager.send_order(_order_request("PF_XBTUSD", OrderSide.BID, 100))
+    ask = await manager.send_order(_order_request("PF_XBTUSD", OrderSide.ASK, 101))
+
+    # id-0 was filled without a fill reaching us, id-9 was placed elsewhere
+    remote = Order(
+        "PF_ETHUSD",
+        OrderSide.ASK,
+        size=1,
+        order_type=OrderType.LMT,
+        status=OrderStatus.UNTOUCHED,
+        limit_price=10,
+        order_id="id-9",
+        filled_size=0,
+    )
+    client.remote_orders = [ask, remote]
+    client.remote_positions = [
+        OpenPosition(PositionSide.LONG, "PF_XBTUSD", 100, "t0", 2)
+    ]
+
+    # an order acknowledged while the rest snapshot is in flight survives it
+    client.rest_delay.clear()
+    reconcile = asyncio.create_task(manager.reconcile())
+    await asyncio.sleep(0)
+    bid = await manager.send_order(_order_request("PF_XBTUSD", OrderSide.BID, 99))
+    client.rest_delay.set()
+
+    assert await reconcile == 3
+    assert manager.get_order("id-0") is None
+    assert manager.get_order("id-2") is not None
+    assert manager.open_orders("PF_ETHUSD", OrderSide.ASK) == [remote]
+    assert manager.net_position("PF_XBTUSD") == 2
+
+    # nothing left to correct
+    client.remote_orders.append(bid)
+    assert await manager.reconcile() == 0
+    assert manager.stats()["reconcile_corrections"] == 3
+
+    # a missing fill size on either side is an unfilled order, not a difference
+    unfilled = Order(
+        "PF_ETHUSD",
+        OrderSide.ASK,
+        size=1,
+        order_type=OrderType.LMT,
+        status=OrderStatus.UNTOUCHED,
+        limit_price=10,
+        order_id="id-9",
+    )
+    client.remote_orders = [ask, unfilled, bid]
+    assert await manager.reconcile() == 0
+    assert remote.filled_size == 0 and unfilled.filled_size is None
+
+    await client.close()
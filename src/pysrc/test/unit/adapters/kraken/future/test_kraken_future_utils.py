@@ -1,8 +1,11 @@
 from typing import Any
 
 import pytest
+from sortedcontainers import SortedDict
 
 from pysrc.adapters.kraken.future.containers import (
+    Order,
+    OrderRequest,
     OrderStatus,
     OrderType,
     PositionSide,
@@ -12,6 +15,10 @@ from pysrc.adapters.kraken.future.containers import (
     TriggerSignal,
 )
 from pysrc.adapters.kraken.future.utils import (
+    apply_batch_edit_statuses,
+    apply_batch_send_statuses,
+    batch_cancel_statuses,
+    book_snapshot,
     kraken_encode_dict,
     order_side_to_str,
     order_status_to_str,
@@ -124,3 +131,51 @@ def test_history_type_conversion() -> None:
     assert string_to_history_type("block") == TradeHistoryType.BLOCK
     with pytest.raises(KeyError):
         string_to_history_type("john") is None
+
+
+def test_batch_statuses() -> None:
+    placed = Order("PF_XBTUSD", OrderSide.BID, size=1, order_type=OrderType.LMT)
+    rejected = Order("PF_XBTUSD", OrderSide.ASK, size=1, order_type=OrderType.LMT)
+    orders = apply_batch_send_statuses(
+        {"0": placed, "1": rejected},
+        [
+            {
+                "order_tag": "1",
+                "order_id": "id-1",
+                "status": "insufficientAvailableFunds",
+            },
+            {"order_tag": "0", "order_id": "id-0", "status": "placed"},
+        ],
+    )
+    assert orders == [placed, rejected]
+    assert (placed.order_id, placed.status) == ("id-0", OrderStatus.PLACED)
+    assert (rejected.order_id, rejected.status) == ("id-1", OrderStatus.REJECTED)
+
+    edit = OrderRequest(placed)
+    assert apply_batch_edit_statuses(
+        {"id-0": edit}, [{"order_id": "id-0", "status": "edited"}]
+    ) == {edit: True}
+
+    assert batch_cancel_statuses(
+        [
+            {"order_id": "id-0", "status": "cancelled"},
+            {"order_id": "id-1", "status": "notFound"},
+        ]
+    ) == {"id-0": OrderStatus.CANCELLED, "id-1": OrderStatus.REJECTED}
+
+
+def test_book_snapshot() -> None:
+    bids = SortedDict({98.0: 3.0, 99.0: 2.0, 100.0: 1.0})
+    asks = SortedDict({101.0: 1.0, 102.0: 2.0})
+
+    snapshot = book_snapshot(1000, "PF_XBTUSD", bids, asks)
+    assert (snapshot.time, snapshot.feedcode) == (1000, "PF_XBTUSD")
+    assert snapshot.bids == [(100.0, 1.0), (99.0, 2.0), (98.0, 3.0)]
+    assert snapshot.asks == [(101.0, 1.0), (102.0, 2.0)]
+
+    snapshot = book_snapshot(1000, "PF_XBTUSD", bids, asks, depth=1)
+    assert snapshot.bids == [(100.0, 1.0)]
+    assert snapshot.asks == [(101.0, 1.0)]
+
+    snapshot = book_snapshot(1000, "PF_XBTUSD", bids, asks, depth=0)
+    assert snapshot.bids == [] and snapshot.asks == []
@@ -1,3 +1,6 @@
+import asyncio
+import json
+import time
 from typing import Any
 from unittest.mock import AsyncMock, patch
 
@@ -5,9 +8,11 @@ import pytest
 
 from pysrc.adapters.kraken.asset_mappings import kraken_to_asset
 from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    FeedEvent,
     KrakenFutureWebsocketClient,
 )
 from pysrc.adapters.messages import SnapshotMessage, TradeMessage
+from pysrc.util.ring_buffer import OverflowPolicy
 from pysrc.util.types import Asset, Market, OrderSide
 
 
@@ -66,3 +71,375 @@ def test_parse_book_snapshot(client: KrakenFutureWebsocketClient) -> None:
     assert snapshot_message.bids == expected_message.bids
     assert snapshot_message.asks == expected_message.asks
     assert snapshot_message.feedcode == expected_message.feedcode
+
+
+@pytest.mark.asyncio
+async def test_on_message_dispatch(client: KrakenFutureWebsocketClient) -> None:
+    with pytest.raises(AssertionError):
+        await client.on_message(
+            {"feed": "book", "product_id": "PF_XBTUSD", "price": 1, "qty": 1}
+        )
+
+    await client.on_message({"event": "subscribed", "feed": "book"})
+    await client.on_message({"event": "subscribed", "feed": "trade"})
+
+    await client.on_messages(
+        [
+            {
+                "feed": "book_snapshot",
+                "product_id": "PF_ETHUSD",
+                "bids": [{"price": 2000.5, "qty": 3}],
+                "asks": [{"price": 2001, "qty": 4}],
+            },
+            {
+                "feed": "book",
+                "product_id": "PF_ETHUSD",
+                "side": "buy",
+                "price": 2000,
+                "qty": 1.5,
+            },
+            {
+                "feed": "book",
+                "product_id": "PF_ETHUSD",
+                "side": "sell",
+                "price": 2001,
+                "qty": 0,
+            },
+            {
+                "feed": "trade",
+                "product_id": "PF_ETHUSD",
+                "time": 1612269657781,
+                "side": "buy",
+                "price": 2000.5,
+                "qty": 0.1,
+            },
+            {"feed": "heartbeat"},
+        ]
+    )
+
+    assert list(client.bids[Asset.ETH].items()) == [(2000.0, 1.5), (2000.5, 3.0)]
+    assert list(client.asks[Asset.ETH].items()) == []
+    assert [trade.price for trade in client.poll_trades()] == [2000.5]
+
+    with pytest.raises(AssertionError, match="without price/qty"):
+        await client.on_message({"feed": "book", "product_id": "PF_ETHUSD"})
+
+
+def test_poll_snapshots_incremental(client: KrakenFutureWebsocketClient) -> None:
+    assert client.top_of_book(Asset.BTC) == (None, None)
+
+    client._parse_book_snapshot(
+        {
+            "product_id": "PF_XBTUSD",
+            "bids": [{"price": 100 - i, "qty": 1 + i} for i in range(10)],
+            "asks": [{"price": 101 + i, "qty": 1 + i} for i in range(10)],
+        }
+    )
+    assert client.top_of_book(Asset.BTC) == ((100.0, 1.0), (101.0, 1.0))
+
+    snapshots = client.poll_snapshots(depth=3)
+    btc_snapshot = snapshots[Asset.BTC]
+    assert btc_snapshot.bids == [(100.0, 1.0), (99.0, 2.0), (98.0, 3.0)]
+    assert btc_snapshot.asks == [(101.0, 1.0), (102.0, 2.0), (103.0, 3.0)]
+
+    # nothing changed, so the same snapshot objects are handed back
+    assert client.poll_snapshots(depth=3)[Asset.BTC] is btc_snapshot
+    assert len(client.poll_snapshots()[Asset.BTC].bids) == 10
+    assert client.poll_snapshots(depth=0)[Asset.BTC].bids == []
+
+    client.poll_snapshots(depth=3)
+    client._update_order_book(Asset.BTC, 100.5, 7, "buy")
+    client._update_order_book(Asset.BTC, 101, 0, "sell")
+    client._update_order_book(Asset.BTC, 95.5, 0, "sell")
+    assert 95.5 not in client.asks[Asset.BTC]
+
+    snapshots = client.poll_snapshots(depth=3)
+    assert snapshots[Asset.BTC] is not btc_snapshot
+    assert snapshots[Asset.BTC].bids == [(100.5, 7.0), (100.0, 1.0), (99.0, 2.0)]
+    assert snapshots[Asset.BTC].asks == [(102.0, 2.0), (103.0, 3.0), (104.0, 4.0)]
+    assert client.top_of_book(Asset.BTC) == ((100.5, 7.0), (102.0, 2.0))
+
+    # snapshots handed out earlier are left untouched
+    assert btc_snapshot.bids == [(100.0, 1.0), (99.0, 2.0), (98.0, 3.0)]
+
+    with pytest.raises(ValueError):
+        client.poll_snapshots(depth=-1)
+
+
+@pytest.mark.asyncio
+async def test_trade_buffers() -> None:
+    client = KrakenFutureWebsocketClient(
+        subscribed_assets=[Asset.BTC, Asset.ETH], trade_buffer_capacity=2
+    )
+    await client.on_message({"event": "subscribed", "feed": "trade"})
+
+    def trade(product_id: str, trade_time: int) -> dict[str, Any]:
+        return {
+            "product_id": product_id,
+            "time": trade_time,
+            "side": "sell",
+            "price": 100.5,
+            "qty": 2,
+        }
+
+    await client.on_message(
+        {
+            "feed": "trade_snapshot",
+            "trades": [trade("PF_XBTUSD", t) for t in (1, 2, 3)],
+        }
+    )
+    await client.on_message({"feed": "trade", **trade("PF_ETHUSD", 4)})
+
+    stats = client.trade_buffer_stats()
+    assert stats[Asset.BTC]["dropped"] == 1
+    assert stats[Asset.BTC]["high_water_mark"] == 2
+    assert stats[Asset.ETH]["dropped"] == 0
+
+    arrays = client.poll_trade_arrays()
+    assert [arr["time"].tolist() for arr in arrays[Asset.BTC]] == [[2], [3]]
+    assert arrays[Asset.ETH][0]["side"].tolist() == [OrderSide.ASK.value]
+    assert client.poll_trade_arrays() == {}
+
+    await client.on_message({"feed": "trade", **trade("PF_XBTUSD", 5)})
+    await client.on_message({"feed": "trade", **trade("PF_ETHUSD", 1)})
+    trades = client.poll_trades()
+    assert [(trade.feedcode, trade.time) for trade in trades] == [
+        ("PF_ETHUSD", 1),
+        ("PF_XBTUSD", 5),
+    ]
+    assert trades[0].side == OrderSide.ASK and trades[0].quantity == 2.0
+
+
+@pytest.mark.asyncio
+async def test_blocking_trade_buffers() -> None:
+    client = KrakenFutureWebsocketClient(
+        subscribed_assets=[Asset.BTC],
+        trade_buffer_capacity=2,
+        trade_overflow_policy=OverflowPolicy.BLOCK,
+    )
+    await client.on_message({"event": "subscribed", "feed": "trade"})
+
+    # a snapshot larger than the buffer is pushed as the consumer drains it
+    snapshot = {
+        "feed": "trade_snapshot",
+        "trades": [
+            {
+                "product_id": "PF_XBTUSD",
+                "time": t,
+                "side": "buy",
+                "price": 100.0,
+                "qty": 1,
+            }
+            for t in range(5)
+        ],
+    }
+    receive = asyncio.create_task(client.on_message(snapshot))
+
+    times: list[int] = []
+    while len(times) < 5:
+        await asyncio.sleep(0)
+        for arrs in client.poll_trade_arrays().values():
+            times.extend(t for arr in arrs for t in arr["time"].tolist())
+    await asyncio.wait_for(receive, timeout=1)
+
+    assert times == list(range(5))
+    stats = client.trade_buffer_stats()[Asset.BTC]
+    assert stats["dropped"] == 0
+    assert stats["high_water_mark"] == 2
+
+
+@pytest.mark.asyncio
+async def test_subscribe(client: KrakenFutureWebsocketClient) -> None:
+    await client.on_message({"event": "subscribed", "feed": "trade"})
+    await client.on_message({"event": "subscribed", "feed": "book"})
+
+    events: list[tuple[Asset, FeedEvent, Any]] = []
+    client.subscribe(
+        lambda asset, event, payload: events.append((asset, event, payload)),
+        events=[FeedEvent.TOP_OF_BOOK],
+    )
+    trade_queue: asyncio.Queue = asyncio.Queue()
+    client.subscribe(
+        trade_queue,
+        events=[FeedEvent.TRADE],
+        assets=[Asset.ETH],
+        predicate=lambda asset, event, trade: trade.quantity >= 1.0,
+    )
+
+    await client.on_message(
+        {
+            "feed": "book_snapshot",
+            "product_id": "PF_XBTUSD",
+            "bids": [{"price": 100.0, "qty": 1.0}],
+            "asks": [{"price": 101.0, "qty": 1.0}],
+        }
+    )
+    # a level behind the top of book does not change it
+    await client.on_message(
+        {
+            "feed": "book",
+            "product_id": "PF_XBTUSD",
+            "side": "buy",
+            "price": 99.0,
+            "qty": 1.0,
+        }
+    )
+    await client.on_message(
+        {
+            "feed": "book",
+            "product_id": "PF_XBTUSD",
+            "side": "sell",
+            "price": 101.0,
+            "qty": 0.0,
+        }
+    )
+    assert events == [
+        (Asset.BTC, FeedEvent.TOP_OF_BOOK, ((100.0, 1.0), (101.0, 1.0))),
+        (Asset.BTC, FeedEvent.TOP_OF_BOOK, ((100.0, 1.0), None)),
+    ]
+
+    for qty in (0.5, 2.0):
+        await client.on_message(
+            {
+                "feed": "trade",
+                "product_id": "PF_ETHUSD",
+                "time": 1,
+                "side": "buy",
+                "price": 10.0,
+                "qty": qty,
+            }
+        )
+    asset, event, trade = trade_queue.get_nowait()
+    assert (asset, event, trade.quantity) == (Asset.ETH, FeedEvent.TRADE, 2.0)
+    assert trade_queue.empty()
+
+    book_updates: list[Any] = []
+    subscription = client.subscribe(
+        lambda *args: book_updates.append(args[2]), events=[FeedEvent.BOOK_UPDATE]
+    )
+    await client.on_message(
+        {
+            "feed": "book",
+            "product_id": "PF_ETHUSD",
+            "side": "sell",
+            "price": 11.0,
+            "qty": 3.0,
+        }
+    )
+    client.unsubscribe(subscription)
+    await client.on_message(
+        {
+            "feed": "book",
+            "product_id": "PF_ETHUSD",
+            "side": "sell",
+            "price": 11.0,
+            "qty": 4.0,
+        }
+    )
+    assert book_updates == [[(OrderSide.ASK, 11.0, 3.0)]]
+
+    with pytest.raises(ValueError):
+        client.subscribe(lambda *args: None, assets=[Asset.SOL])
+
+
+@pytest.mark.asyncio
+async def test_feed_metrics(client: KrakenFutureWebsocketClient) -> None:
+    frames = [
+        {"event": "subscribed", "feed": "book"},
+        {
+            "feed": "book_snapshot",
+            "product_id": "PF_XBTUSD",
+            "timestamp": 1727740800000,
+            "bids": [{"price": 100.0, "qty": 1.0}],
+            "asks": [{"price": 101.0, "qty": 1.0}],
+        },
+        {
+            "feed": "book",
+            "product_id": "PF_XBTUSD",
+            "side": "buy",
+            "price": 100.5,
+            "qty": 1.0,
+            "timestamp": 1727740801250,
+        },
+    ]
+    receive_wall_time = 1727740801.3
+    await client._handle_batch(
+        [(time.perf_counter(), receive_wall_time, json.dumps(f)) for f in frames]
+    )
+
+    feeds = client.feed_metrics_snapshot()["feeds"]
+    assert set(feeds) == {"book_snapshot", "book"}
+    book = feeds["book"]["products"]["PF_XBTUSD"]
+    assert book["exchange_to_receive"]["max_seconds"] == pytest.approx(0.05)
+    assert book["receive_to_handler"]["count"] == 1
+    assert client.receive_time is None
+
+    # snapshots carry the exchange time of the last book change
+    assert client.poll_snapshots()[Asset.BTC].time == 1727740801
+
+
+@pytest.mark.asyncio
+async def test_book_sequence_resync(client: KrakenFutureWebsocketClient) -> None:
+    await client.on_message({"event": "subscribed", "feed": "book"})
+    ws = AsyncMock()
+    client.ws = ws
+
+    def book(product_id: str, seq: int, price: float, qty: float) -> dict[str, Any]:
+        return {
+            "feed": "book",
+            "product_id": product_id,
+            "side": "buy",
+            "seq": seq,
+            "price": price,
+            "qty": qty,
+        }
+
+    for product_id in ("PF_XBTUSD", "PF_ETHUSD"):
+        await client.on_message(
+            {
+                "feed": "book_snapshot",
+                "product_id": product_id,
+                "seq": 10,
+                "bids": [{"price": 100.0, "qty": 1.0}],
+                "asks": [],
+            }
+        )
+
+    await client.on_message(book("PF_XBTUSD", 11, 99.0, 1.0))
+    # duplicates are dropped, a gap stops the btc deltas and resubscribes btc only
+    await client.on_message(book("PF_XBTUSD", 11, 99.0, 5.0))
+    await client.on_message(book("PF_XBTUSD", 13, 98.0, 1.0))
+    await client.on_message(book("PF_XBTUSD", 14, 97.0, 1.0))
+    await client.on_message(book("PF_ETHUSD", 11, 99.0, 2.0))
+
+    assert [json.loads(call.args[0]) for call in ws.send.call_args_list] == [
+        {"event": "unsubscribe", "feed": "book", "product_ids": ["PF_XBTUSD"]},
+        {"event": "subscribe", "feed": "book", "product_ids": ["PF_XBTUSD"]},
+    ]
+    assert list(client.bids[Asset.BTC].items()) == [(99.0, 1.0), (100.0, 1.0)]
+    assert list(client.bids[Asset.ETH].items()) == [(99.0, 2.0), (100.0, 1.0)]
+
+    stats = client.book_sequence_stats()
+    assert stats[Asset.BTC] == {
+        "gaps": 1,
+        "stale": 1,
+        "resyncs": 1,
+        "seq": 11,
+        "resyncing": True,
+    }
+    assert stats[Asset.ETH]["gaps"] == 0
+
+    # the fresh snapshot replaces the book, stale levels do not survive it
+    await client.on_message({"event": "unsubscribed", "feed": "book"})
+    await client.on_message(
+        {
+            "feed": "book_snapshot",
+            "product_id": "PF_XBTUSD",
+            "seq": 20,
+            "bids": [{"price": 98.0, "qty": 3.0}],
+            "asks": [{"price": 101.0, "qty": 1.0}],
+        }
+    )
+    await client.on_message(book("PF_XBTUSD", 21, 97.5, 1.0))
+    assert list(client.bids[Asset.BTC].items()) == [(97.5, 1.0), (98.0, 3.0)]
+    assert not client.book_sequence_stats()[Asset.BTC]["resyncing"]
@@ -0,0 +1,45 @@
+import pytest
+
+from pysrc.adapters.kraken.future.kraken_future_websocket_pool import (
+    KrakenFutureWebsocketPool,
+    ShardingPolicy,
+    assign_shards,
+)
+from pysrc.util.types import Asset
+
+
+def test_assign_shards() -> None:
+    assets = [Asset.BTC, Asset.ETH, Asset.SOL, Asset.XRP, Asset.DOGE]
+
+    assert assign_shards(assets, 2) == [
+        [Asset.BTC, Asset.SOL, Asset.DOGE],
+        [Asset.ETH, Asset.XRP],
+    ]
+    assert assign_shards(assets[:2], 4) == [[Asset.BTC], [Asset.ETH]]
+
+    # the busy btc book gets a connection to itself
+    weights = {Asset.BTC: 10.0, Asset.ETH: 4.0}
+    assert assign_shards(assets, 2, ShardingPolicy.WEIGHTED, weights) == [
+        [Asset.BTC],
+        [Asset.ETH, Asset.SOL, Asset.XRP, Asset.DOGE],
+    ]
+
+    with pytest.raises(ValueError):
+        assign_shards(assets, 0)
+
+
+def test_pool_routes_assets() -> None:
+    pool = KrakenFutureWebsocketPool(
+        [Asset.BTC, Asset.ETH, Asset.SOL], num_connections=2
+    )
+
+    assert [shard.subscribed_assets for shard in pool.shards] == [
+        [Asset.BTC, Asset.SOL],
+        [Asset.ETH],
+    ]
+    assert pool.shard_for(Asset.ETH) is pool.shards[1]
+    assert pool.bids[Asset.SOL] is pool.shards[0].bids[Asset.SOL]
+    assert set(pool.poll_snapshots()) == {Asset.BTC, Asset.ETH, Asset.SOL}
+
+    with pytest.raises(ValueError):
+        pool.top_of_book(Asset.XRP)
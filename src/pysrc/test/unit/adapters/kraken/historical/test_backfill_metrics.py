@@ -0,0 +1,68 @@
+import json
+import os
+import pickle
+
+from pysrc.adapters.kraken.historical.backfill_metrics import BackfillMetrics
+from pysrc.test.helpers import get_resources_path
+
+resource_path = get_resources_path(__file__)
+
+
+def test_backfill_metrics() -> None:
+    progress_calls: list[BackfillMetrics] = []
+    metrics = BackfillMetrics(on_progress=progress_calls.append)
+
+    metrics.record_page(1000)
+    metrics.record_page(3000)
+    metrics.record_events(500)
+    metrics.record_queue_depth(20)
+    metrics.record_queue_depth(5)
+    metrics.record_reconstruction(num_events=400, seconds=3, wait_seconds=1)
+    metrics.record_compression(input_bytes=4_000_000, output_bytes=1000, seconds=2)
+
+    assert not progress_calls
+
+    metrics.record_day("11_05_2024", 12.5)
+    metrics.record_phase("download", 1)
+    metrics.record_phase("download", 2)
+
+    assert progress_calls == [metrics, metrics, metrics]
+
+    report = metrics.to_dict()
+    assert report["pages"] == 2
+    assert report["bytes_downloaded"] == 4000
+    assert report["events"] == 500
+    assert report["events_per_sec"] > 0
+    assert report["queue_depth"] == 5
+    assert report["max_queue_depth"] == 20
+    assert report["queue_wait_seconds"] == 1
+    assert report["reconstruction_seconds"] == 2
+    assert report["reconstruction_events_per_sec"] == 200
+    assert report["compression_mb_per_sec"] == 2
+    assert report["day_wall_times"] == {"11_05_2024": 12.5}
+    assert report["phase_wall_times"] == {"download": 3}
+
+
+def test_backfill_metrics_report() -> None:
+    metrics = BackfillMetrics(on_progress=lambda _: None)
+    metrics.record_page(10)
+
+    os.makedirs(resource_path, exist_ok=True)
+    report_path = str(resource_path / "report.json")
+    metrics.write_report(report_path)
+
+    with open(report_path) as f:
+        report = json.load(f)
+
+    assert report["pages"] == 1
+    assert report["bytes_downloaded"] == 10
+    assert report["reconstruction_events_per_sec"] == 0
+
+    os.remove(report_path)
+    os.rmdir(resource_path)
+
+    restored_metrics = pickle.loads(pickle.dumps(metrics))
+    assert restored_metrics.pages == 1
+
+    restored_metrics.record_day("11_05_2024", 1)
+    assert restored_metrics.day_wall_times == {"11_05_2024": 1}
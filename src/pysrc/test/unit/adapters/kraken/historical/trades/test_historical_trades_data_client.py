@@ -1,102 +1,200 @@
+import io
+import json
 import os
-from datetime import datetime
+import shutil
+import zipfile
+from datetime import date, datetime
 
 import numpy as np
+import pytest
 
 from pysrc.adapters.kraken.historical.trades.historical_trades_data_client import (
     HistoricalTradesDataClient,
 )
+from pysrc.adapters.kraken.historical.trades.trades_source import (
+    LocalTradesSource,
+    TradesSourceFile,
+)
 from pysrc.test.helpers import get_resources_path
 from pysrc.util.types import Market
 
 resource_path = str(get_resources_path(__file__))
 
 
-def test_chunking() -> None:
+def test_convert_pair() -> None:
     test_file_path = os.path.join(resource_path, "BONKUSD", "test.csv")
-    client = HistoricalTradesDataClient()
-    chunked_files = client._chunk_csv_by_day(test_file_path)
-
-    expected_chunked_files = [
-        os.path.join(resource_path, "BONKUSD", "07_01_2024.csv"),
-        os.path.join(resource_path, "BONKUSD", "07_04_2024.csv"),
-        os.path.join(resource_path, "BONKUSD", "07_08_2024.csv"),
-    ]
-
-    assert set(chunked_files) == set(chunked_files)
+    output_dir = os.path.join(resource_path, "BONKUSD_converted")
 
-    with open(expected_chunked_files[0]) as f:
+    with open(test_file_path) as f:
         lines = [line.strip() for line in f.readlines()]
-        assert len(lines) == 1
-        assert lines[0] == "1719792015,2.387,7.49855066"
 
-    with open(expected_chunked_files[1]) as f:
-        lines = [line.strip() for line in f.readlines()]
-        assert len(lines) == 1
-        assert lines[0] == "1720082973,2.319,6.49440501"
+    # split the day of 07_08_2024 across two quarterly archives
+    first_zip_path = os.path.join(resource_path, "Kraken_Trading_History_Q1.zip")
+    second_zip_path = os.path.join(resource_path, "Kraken_Trading_History_Q2.zip")
+    with zipfile.ZipFile(first_zip_path, "w") as zip_f:
+        zip_f.writestr("BONKUSD.csv", "\n".join(lines[:3]) + "\n")
+        zip_f.writestr("XADAZUSD.csv", "1719792015,1,1\n")
+    with zipfile.ZipFile(second_zip_path, "w") as zip_f:
+        zip_f.writestr("nested/BONKUSD.csv", "\n".join(lines[3:]))
 
-    with open(expected_chunked_files[2]) as f:
-        lines = [line.strip() for line in f.readlines()]
-        assert len(lines) == 4
-        assert lines[0] == "1720421999,1.818,44"
-        assert lines[1] == "1720423482,1.633,7"
-        assert lines[2] == "1720423511,1.621,167.5241759"
-        assert lines[3] == "1720423511,1.618,1.5"
-
-    for file_path in expected_chunked_files:
-        os.remove(file_path)
-
-
-def test_serialization() -> None:
-    test_file_path = os.path.join(resource_path, "BONKUSD", "test.csv")
     client = HistoricalTradesDataClient()
+    pairs_to_members, total_size = client._list_zip_members(
+        [first_zip_path, second_zip_path]
+    )
 
-    serialized_file_path = client._serialize_csv(test_file_path)
-    trades = client.get_trades_from_file(serialized_file_path)
+    assert pairs_to_members == {
+        "BONKUSD": [
+            (first_zip_path, "BONKUSD.csv"),
+            (second_zip_path, "nested/BONKUSD.csv"),
+        ],
+        "XADAZUSD": [(first_zip_path, "XADAZUSD.csv")],
+    }
+    assert total_size == os.path.getsize(test_file_path) + len("1719792015,1,1\n")
 
-    assert len(trades) == 6
+    # a tiny block size forces blocks to be cut mid-line
+    client = HistoricalTradesDataClient(block_size=7)
+    converted_files = client._convert_pair(pairs_to_members["BONKUSD"], output_dir)
 
-    assert trades[0].market == Market.KRAKEN_SPOT
-    assert trades[0].feedcode == "BONKUSD"
+    assert converted_files == [
+        os.path.join(output_dir, "07_01_2024.bin"),
+        os.path.join(output_dir, "07_04_2024.bin"),
+        os.path.join(output_dir, "07_08_2024.bin"),
+    ]
+    assert not [
+        file_name for file_name in os.listdir(output_dir) if file_name.endswith(".csv")
+    ]
 
+    trades = client.get_trades_from_file(converted_files[0])
+    assert len(trades) == 1
     assert np.isclose(
         [trades[0].time, trades[0].price, trades[0].quantity],
         [1719792015, 2.387, 7.49855066],
     ).all()
 
-    assert np.isclose(
-        [trades[1].time, trades[1].price, trades[1].quantity],
-        [1720082973, 2.319, 6.49440501],
-    ).all()
+    trades = client.get_trades_from_file(converted_files[1])
+    assert len(trades) == 1
+    assert trades[0].time == 1720082973
 
+    trades = client.get_trades_from_file(converted_files[2])
+    assert [trade.time for trade in trades] == [
+        1720421999,
+        1720423482,
+        1720423511,
+        1720423511,
+    ]
     assert np.isclose(
-        [trades[2].time, trades[2].price, trades[2].quantity], [1720421999, 1.818, 44]
+        [trades[2].time, trades[2].price, trades[2].quantity],
+        [1720423511, 1.621, 167.5241759],
     ).all()
 
-    assert np.isclose(
-        [trades[3].time, trades[3].price, trades[3].quantity], [1720423482, 1.633, 7]
-    ).all()
+    shutil.rmtree(output_dir)
+    os.remove(first_zip_path)
+    os.remove(second_zip_path)
+
+
+def test_read_csv_blocks() -> None:
+    client = HistoricalTradesDataClient(block_size=5)
 
+    blocks = list(client._read_csv_blocks(io.BytesIO(b"1,2,3\n4,5,6\n7,8,9")))
+    assert b"".join(blocks) == b"1,2,3\n4,5,6\n7,8,9"
+    assert all(block.endswith(b"\n") for block in blocks[:-1])
+
+    assert list(client._read_csv_blocks(io.BytesIO(b""))) == []
+
+    with pytest.raises(ValueError):
+        HistoricalTradesDataClient(block_size=0)
+
+
+def test_parse_csv_block() -> None:
+    client = HistoricalTradesDataClient()
+    block = b"1719792015,2.387,7.49855066\n1720082973,2.319,6.49440501\n"
+
+    arr = client._parse_csv_block(block)
+    assert np.array_equal(arr, client._parse_csv_lines(block))
+    assert arr["time"].tolist() == [1719792015, 1720082973]
+    assert np.isclose(arr["price"], [2.387, 2.319]).all()
+
+    # malformed rows fall back to the per-line parser, which drops them
+    arr = client._parse_csv_block(
+        b"1719792015,2.387,7.49855066\n"
+        b"1719792016,2.3\n"
+        b"-1,2.3,1\n"
+        b"time,price,volume\n"
+        b"\n"
+        b"1720082973,2.319,6.49440501"
+    )
+    assert arr["time"].tolist() == [1719792015, 1720082973]
+    assert np.isclose(arr["volume"], [7.49855066, 6.49440501]).all()
+
+    assert len(client._parse_csv_block(b"x,y,z\n")) == 0
+
+    # negative and fractional times are well formed numbers, but not trade times
+    for bad_row in (b"-1,2.3,1\n", b"1719792016.5,2.3,1\n"):
+        arr = client._parse_csv_block(
+            b"1719792015,2.387,7.49855066\n"
+            + bad_row
+            + b"1720082973,2.319,6.49440501\n"
+        )
+        assert arr["time"].tolist() == [1719792015, 1720082973]
+
+
+def test_serialization() -> None:
+    test_file_path = os.path.join(resource_path, "BONKUSD", "test.csv")
+    zip_path = os.path.join(resource_path, "Kraken_Trading_History.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_f:
+        zip_f.write(test_file_path, "BONKUSD.csv")
+
+    client = HistoricalTradesDataClient()
+    with open(test_file_path, "rb") as f:
+        arr = client._parse_csv_block(f.read())
+
+    assert arr["time"].tolist() == [
+        1719792015,
+        1720082973,
+        1720421999,
+        1720423482,
+        1720423511,
+        1720423511,
+    ]
+    assert np.isclose(arr["price"], [2.387, 2.319, 1.818, 1.633, 1.621, 1.618]).all()
     assert np.isclose(
-        [trades[4].time, trades[4].price, trades[4].quantity],
-        [1720423511, 1.621, 167.5241759],
+        arr["volume"], [7.49855066, 6.49440501, 44, 7, 167.5241759, 1.5]
     ).all()
 
+    # the day files written by the conversion hold the same rows
+    output_dir = os.path.join(resource_path, "serialized", "BONKUSD")
+    converted_files = client._convert_pair([(zip_path, "BONKUSD.csv")], output_dir)
+    trades = [
+        trade
+        for file_path in converted_files
+        for trade in client.get_trades_from_file(file_path)
+    ]
+
+    assert len(trades) == 6
+    assert all(trade.market == Market.KRAKEN_SPOT for trade in trades)
+    assert all(trade.feedcode == "BONKUSD" for trade in trades)
     assert np.isclose(
-        [trades[5].time, trades[5].price, trades[5].quantity], [1720423511, 1.618, 1.5]
+        [[trade.time, trade.price, trade.quantity] for trade in trades],
+        np.stack([arr["time"], arr["price"], arr["volume"]], axis=1),
     ).all()
 
-    os.remove(serialized_file_path)
+    shutil.rmtree(os.path.dirname(output_dir))
+    os.remove(zip_path)
 
 
 def test_get_trades() -> None:
     test_file_path = os.path.join(resource_path, "BONKUSD", "test.csv")
+    zip_path = os.path.join(resource_path, "Kraken_Trading_History.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_f:
+        zip_f.write(test_file_path, "BONKUSD.csv")
+
+    output_dir = os.path.join(resource_path, "converted", "BONKUSD")
     client = HistoricalTradesDataClient()
-    chunked_files = client._chunk_csv_by_day(test_file_path)
+    client._convert_pair([(zip_path, "BONKUSD.csv")], output_dir)
 
-    chunked_file = os.path.join(resource_path, "BONKUSD", "07_01_2024.csv")
-    serialized_file_path = client._serialize_csv(chunked_file)
-    trades = client.get_trades("BONKUSD", datetime(2024, 7, 1), resource_path)
+    trades = client.get_trades(
+        "BONKUSD", datetime(2024, 7, 1), os.path.dirname(output_dir)
+    )
 
     assert len(trades) == 1
 
@@ -108,9 +206,161 @@ def test_get_trades() -> None:
         [1719792015, 2.387, 7.49855066],
     ).all()
 
-    trades = client.get_trades("BONKUSD", datetime(2025, 7, 1), resource_path)
+    trades = client.get_trades(
+        "BONKUSD", datetime(2025, 7, 1), os.path.dirname(output_dir)
+    )
     assert len(trades) == 0
 
-    os.remove(serialized_file_path)
-    for file_path in chunked_files:
-        os.remove(file_path)
+    shutil.rmtree(os.path.dirname(output_dir))
+    os.remove(zip_path)
+
+
+def test_get_trades_range() -> None:
+    test_file_path = os.path.join(resource_path, "BONKUSD", "test.csv")
+    zip_path = os.path.join(resource_path, "Kraken_Trading_History.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_f:
+        zip_f.write(test_file_path, "BONKUSD.csv")
+        zip_f.writestr("XADAZUSD.csv", "1720082970,0.4,10\n1720421999,0.5,20\n")
+
+    output_dir = os.path.join(resource_path, "converted")
+    client = HistoricalTradesDataClient(max_cores=2)
+    for pair in ("BONKUSD", "XADAZUSD"):
+        client._convert_pair(
+            [(zip_path, f"{pair}.csv")], os.path.join(output_dir, pair)
+        )
+
+    arr = client.get_trades_array(os.path.join(output_dir, "BONKUSD", "07_08_2024.bin"))
+    assert arr["time"].tolist() == [1720421999, 1720423482, 1720423511, 1720423511]
+    assert np.isclose(arr["volume"], [44, 7, 167.5241759, 1.5]).all()
+
+    arr = client.get_trades_range(
+        ["XADAZUSD", "BONKUSD", "XBTUSD"],
+        date(2024, 7, 4),
+        date(2024, 7, 9),
+        output_dir,
+    )
+    assert arr["time"].tolist() == [
+        1720082970,
+        1720082973,
+        1720421999,
+        1720421999,
+        1720423482,
+        1720423511,
+        1720423511,
+    ]
+    assert arr["pair_id"].tolist() == [0, 1, 0, 1, 1, 1, 1]
+    assert np.isclose(arr["price"][:2], [0.4, 2.319]).all()
+
+    assert (
+        len(client.get_trades_range([], date(2024, 7, 1), date(2024, 7, 9), output_dir))
+        == 0
+    )
+
+    with pytest.raises(ValueError):
+        client.get_trades_range(
+            ["BONKUSD"], date(2024, 7, 9), date(2024, 7, 1), output_dir
+        )
+
+    shutil.rmtree(output_dir)
+    os.remove(zip_path)
+
+
+class _CountingTradesSource(LocalTradesSource):
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.fetched: list[str] = []
+
+    def fetch(self, source_file: TradesSourceFile, download_path: str) -> int:
+        self.fetched.append(source_file.name)
+        return super().fetch(source_file, download_path)
+
+
+def test_incremental_download() -> None:
+    test_file_path = os.path.join(resource_path, "BONKUSD", "test.csv")
+    source_dir = os.path.join(resource_path, "source")
+    download_dir = os.path.join(resource_path, "downloaded")
+    os.makedirs(source_dir)
+    os.makedirs(download_dir)
+
+    with open(test_file_path) as f:
+        lines = [line.strip() for line in f.readlines()]
+
+    first_zip_path = os.path.join(source_dir, "Kraken_Trading_History_Q1.zip")
+    second_zip_path = os.path.join(source_dir, "Kraken_Trading_History_Q2.zip")
+    with zipfile.ZipFile(first_zip_path, "w") as zip_f:
+        zip_f.writestr("BONKUSD.csv", "\n".join(lines[:3]) + "\n")
+        zip_f.writestr("XADAZUSD.csv", "1719792015,1,1\n")
+    with zipfile.ZipFile(second_zip_path, "w") as zip_f:
+        zip_f.writestr("BONKUSD.csv", "\n".join(lines[3:]))
+
+    def trade_times(pair: str, day_file_name: str) -> list[int]:
+        path = os.path.join(download_dir, pair, day_file_name)
+        return [int(trade.time) for trade in client.get_trades_from_file(path)]
+
+    client = HistoricalTradesDataClient(max_cores=1)
+    source = _CountingTradesSource(source_dir)
+    client.download(download_dir, source=source, incremental=True)
+
+    assert sorted(source.fetched) == [
+        "Kraken_Trading_History_Q1.zip",
+        "Kraken_Trading_History_Q2.zip",
+    ]
+    assert sorted(os.listdir(os.path.join(download_dir, "BONKUSD"))) == [
+        "07_01_2024.bin",
+        "07_04_2024.bin",
+        "07_08_2024.bin",
+    ]
+    assert trade_times("BONKUSD", "07_08_2024.bin") == [
+        1720421999,
+        1720423482,
+        1720423511,
+        1720423511,
+    ]
+    assert trade_times("XADAZUSD", "07_01_2024.bin") == [1719792015]
+    assert not os.path.exists(os.path.join(download_dir, ".staging"))
+
+    with open(os.path.join(download_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert sorted(manifest["sources"]) == sorted(source.fetched)
+    assert [
+        source_id for source_id, _ in manifest["days"]["BONKUSD"]["07_08_2024.bin"]
+    ] == ["Kraken_Trading_History_Q1.zip", "Kraken_Trading_History_Q2.zip"]
+
+    # nothing changed upstream, so nothing is fetched
+    source = _CountingTradesSource(source_dir)
+    client.download(download_dir, source=source, incremental=True)
+    assert source.fetched == []
+
+    # only the changed archive is fetched and only the days it touches rewritten
+    first_day_mtime = os.path.getmtime(
+        os.path.join(download_dir, "BONKUSD", "07_01_2024.bin")
+    )
+    with zipfile.ZipFile(second_zip_path, "w") as zip_f:
+        zip_f.writestr("BONKUSD.csv", "\n".join(lines[3:5] + ["1720500000,1.5,2"]))
+
+    source = _CountingTradesSource(source_dir)
+    client.download(download_dir, source=source, incremental=True)
+
+    assert source.fetched == ["Kraken_Trading_History_Q2.zip"]
+    assert trade_times("BONKUSD", "07_08_2024.bin") == [
+        1720421999,
+        1720423482,
+        1720423511,
+    ]
+    assert trade_times("BONKUSD", "07_09_2024.bin") == [1720500000]
+    assert (
+        os.path.getmtime(os.path.join(download_dir, "BONKUSD", "07_01_2024.bin"))
+        == first_day_mtime
+    )
+
+    # days only a removed archive contributed to are dropped
+    os.remove(second_zip_path)
+    source = _CountingTradesSource(source_dir)
+    client.download(download_dir, source=source, incremental=True)
+
+    assert source.fetched == []
+    assert trade_times("BONKUSD", "07_08_2024.bin") == [1720421999]
+    assert not os.path.exists(os.path.join(download_dir, "BONKUSD", "07_09_2024.bin"))
+
+    shutil.rmtree(source_dir)
+    shutil.rmtree(download_dir)
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Generator
+from urllib.parse import urlparse
+
+import pytest
+import requests
+
+from pysrc.adapters.kraken.historical.trades.trades_source import (
+    DriveTradesSource,
+    LocalTradesSource,
+)
+from pysrc.test.helpers import get_resources_path
+
+resource_path = str(get_resources_path(__file__))
+
+_ARCHIVE = bytes(range(256)) * 64
+
+
+class _DriveStandIn(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _DriveStandInHandler)
+        self.md5_checksum = hashlib.md5(_ARCHIVE).hexdigest()
+        self.failures: list[str] = []
+        self.ranges: list[str | None] = []
+
+
+class _DriveStandInHandler(BaseHTTPRequestHandler):
+    server: _DriveStandIn
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        path = urlparse(self.path).path
+        if path == "/":
+            body = json.dumps(
+                {
+                    "files": [
+                        {
+                            "id": "q1",
+                            "name": "Kraken_Trading_History_Q1.zip",
+                            "modifiedTime": "2024-07-01T00:00:00.000Z",
+                            "md5Checksum": self.server.md5_checksum,
+                        }
+                    ]
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        range_header = self.headers.get("Range")
+        self.server.ranges.append(range_header)
+
+        failure = self.server.failures.pop(0) if self.server.failures else None
+        if failure == "unavailable":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        offset = int(range_header[6:-1]) if range_header else 0
+        body = _ARCHIVE[offset:]
+
+        self.send_response(206 if offset else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if failure == "drop":
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def drive_stand_in() -> Generator[_DriveStandIn, None, None]:
+    server = _DriveStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_drive_fetch_resumes(drive_stand_in: _DriveStandIn) -> None:
+    source = DriveTradesSource(
+        "token",
+        api_url=f"http://127.0.0.1:{drive_stand_in.server_port}",
+        backoff_seconds=0,
+        chunk_size=1024,
+    )
+
+    source_files = source.list_files()
+    assert [f.name for f in source_files] == ["Kraken_Trading_History_Q1.zip"]
+
+    download_path = os.path.join(resource_path, "q1.zip")
+    drive_stand_in.failures = ["drop", "unavailable"]
+    num_bytes = source.fetch(source_files[0], download_path)
+
+    with open(download_path, "rb") as f:
+        assert f.read() == _ARCHIVE
+    assert not os.path.exists(download_path + ".part")
+    assert num_bytes == len(_ARCHIVE)
+
+    # the retries after the dropped connection only ask for the missing tail
+    assert drive_stand_in.ranges[0] is None
+    assert drive_stand_in.ranges[1] == drive_stand_in.ranges[2]
+    assert drive_stand_in.ranges[1] == f"bytes={len(_ARCHIVE) // 2}-"
+
+    os.remove(download_path)
+
+
+def test_drive_fetch_failures(drive_stand_in: _DriveStandIn) -> None:
+    source = DriveTradesSource(
+        "token",
+        api_url=f"http://127.0.0.1:{drive_stand_in.server_port}",
+        max_retries=1,
+        backoff_seconds=0,
+    )
+    source_file = source.list_files()[0]
+    download_path = os.path.join(resource_path, "q1.zip")
+
+    drive_stand_in.failures = ["unavailable", "unavailable"]
+    with pytest.raises(requests.HTTPError):
+        source.fetch(source_file, download_path)
+
+    source_file.md5_checksum = "0" * 32
+    with pytest.raises(ValueError):
+        source.fetch(source_file, download_path)
+
+    assert not os.path.exists(download_path)
+    assert not os.path.exists(download_path + ".part")
+
+    with pytest.raises(ValueError):
+        DriveTradesSource("token", max_retries=-1)
+
+
+def test_local_source() -> None:
+    source_dir = os.path.join(resource_path, "source")
+    os.makedirs(source_dir)
+    with open(os.path.join(source_dir, "Kraken_Trading_History_Q1.zip"), "wb") as f:
+        f.write(_ARCHIVE)
+    with open(os.path.join(source_dir, "README.txt"), "wb") as f:
+        f.write(b"not an archive")
+
+    source = LocalTradesSource(source_dir)
+    source_files = source.list_files()
+    assert [f.name for f in source_files] == ["Kraken_Trading_History_Q1.zip"]
+
+    download_path = os.path.join(resource_path, "q1.zip")
+    assert source.fetch(source_files[0], download_path) == len(_ARCHIVE)
+
+    with pytest.raises(ValueError):
+        LocalTradesSource(os.path.join(resource_path, "missing"))
+
+    os.remove(download_path)
+    shutil.rmtree(source_dir)
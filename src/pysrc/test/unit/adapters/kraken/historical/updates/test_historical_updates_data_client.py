@@ -1,10 +1,12 @@
+import copy
+import json
 import os
 import random
 import shutil
 import threading
 import time
 import typing
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -20,14 +22,15 @@ from pysrc.adapters.kraken.historical.updates.historical_updates_data_client imp
     HistoricalUpdatesDataClient,
 )
 from pysrc.adapters.messages import SnapshotMessage
+from pysrc.data_loaders.raw_snapshots_data_loader import RawSnapshotsDataLoader
 from pysrc.test.helpers import get_resources_path
-from pysrc.util.types import Asset, Market, OrderSide
+from pysrc.util.types import Asset, Market, OrderSide, TimeUnit
 
 resource_path = str(get_resources_path(__file__))
 
 
 def test_mbp_book() -> None:
-    book = MBPBook("BONKUSD", Market.KRAKEN_USD_FUTURE)
+    book = MBPBook("BONKUSD", Market.KRAKEN_USD_FUTURE, tick_size=1)
 
     book.apply_delta(UpdateDelta(OrderSide.BID, 0, 12, 10))
     assert book._book[OrderSide.BID.value - 1][12] == 10
@@ -62,6 +65,106 @@ def test_mbp_book() -> None:
     book_copy._book[0][-1] = -1
 
     assert book_copy._book != book._book
+    assert book_copy._tick_size == book._tick_size
+
+
+def test_mbp_book_levels() -> None:
+    book = MBPBook("PF_ETHUSD", Market.KRAKEN_USD_FUTURE, tick_size=0.01)
+
+    assert book.best_bid() is None
+    assert book.best_ask() is None
+    assert book.get_levels(OrderSide.BID) == []
+
+    for price in [3000.01, 2999.99, 3000.03, 3000.02]:
+        book.apply_delta(UpdateDelta(OrderSide.BID, 0, price, 1))
+
+    for price in [3000.07, 3000.05, 3000.06]:
+        book.apply_delta(UpdateDelta(OrderSide.ASK, 0, price, 2))
+
+    # float noise in the price still lands on the same tick
+    book.apply_delta(UpdateDelta(OrderSide.BID, 0, 3000.01 + 1e-9, 4))
+    book.apply_delta(UpdateDelta(OrderSide.ASK, 0, 0.1 + 0.2 + 3000 - 0.3, 0))
+
+    assert book.best_bid() == (3000.03, 1)
+    assert book.best_ask() == (3000.05, 2)
+
+    assert book.get_levels(OrderSide.BID) == [
+        (3000.03, 1),
+        (3000.02, 1),
+        (3000.01, 5),
+        (2999.99, 1),
+    ]
+    assert book.get_levels(OrderSide.ASK, depth=2) == [(3000.05, 2), (3000.06, 2)]
+    assert book.get_levels(OrderSide.BID, depth=10) == book.get_levels(OrderSide.BID)
+    assert book.get_levels(OrderSide.ASK, depth=0) == []
+
+    with pytest.raises(ValueError):
+        book.get_levels(OrderSide.ASK, depth=-1)
+
+    snapshot = book.to_snapshot_message(5)
+    assert snapshot.bids == book.get_levels(OrderSide.BID)
+    assert snapshot.asks == book.get_levels(OrderSide.ASK)
+
+    book_copy = book.copy()
+    book_copy.apply_delta(UpdateDelta(OrderSide.BID, 0, 3000.03, -1))
+
+    assert book_copy.best_bid() == (3000.02, 1)
+    assert book.best_bid() == (3000.03, 1)
+
+    with pytest.raises(ValueError):
+        MBPBook("PF_ETHUSD", Market.KRAKEN_USD_FUTURE, tick_size=0)
+
+
+def test_mbp_book_output_policy() -> None:
+    book = MBPBook(
+        "PF_XBTUSD",
+        Market.KRAKEN_USD_FUTURE,
+        tick_size=0.5,
+        output_depth=2,
+        output_band_bps=5,
+    )
+
+    for price in [9980, 9994.5, 9995, 9999.5]:
+        book.apply_delta(UpdateDelta(OrderSide.BID, 0, price, 1))
+
+    for price in [10000.5, 10008, 10020]:
+        book.apply_delta(UpdateDelta(OrderSide.ASK, 0, price, 1))
+
+    assert book.mid_price() == 10000
+
+    snapshot = book.to_snapshot_message(0)
+    assert snapshot.bids == [(9999.5, 1), (9995, 1)]
+    assert snapshot.asks == [(10000.5, 1)]
+
+    assert book.get_levels(OrderSide.BID, band_bps=10) == [
+        (9999.5, 1),
+        (9995, 1),
+        (9994.5, 1),
+    ]
+    assert book.get_levels(OrderSide.ASK, band_bps=10) == [
+        (10000.5, 1),
+        (10008, 1),
+    ]
+    assert len(book.get_levels(OrderSide.BID)) == 4
+    assert len(book.get_levels(OrderSide.ASK)) == 3
+
+    book_copy = book.copy()
+    assert book_copy.to_snapshot_message(0).bids == snapshot.bids
+
+    book_copy.apply_delta(UpdateDelta(OrderSide.ASK, 0, 10000.5, -1))
+    book_copy.apply_delta(UpdateDelta(OrderSide.ASK, 0, 10008, -1))
+    book_copy.apply_delta(UpdateDelta(OrderSide.ASK, 0, 10020, -1))
+
+    assert book_copy.mid_price() == 9999.5
+    assert book_copy.to_snapshot_message(0).asks == []
+
+    assert MBPBook("PF_XBTUSD", Market.KRAKEN_USD_FUTURE).mid_price() is None
+
+    with pytest.raises(ValueError):
+        MBPBook("PF_XBTUSD", Market.KRAKEN_USD_FUTURE, output_depth=0)
+
+    with pytest.raises(ValueError):
+        MBPBook("PF_XBTUSD", Market.KRAKEN_USD_FUTURE, output_band_bps=-1)
 
 
 def random_fill_queue(queue: ChunkedEventQueue) -> None:
@@ -130,6 +233,53 @@ def test_chunked_event_queue() -> None:
     assert queue.peek() is None
 
 
+def test_chunked_event_queue_merge() -> None:
+    queue = ChunkedEventQueue(num_chunks=2)
+
+    queue.put(
+        [UpdateDelta(OrderSide.BID, t, t, t) for t in [1, 4, 6]], EventType.ORDER, 0
+    )
+    queue.put(
+        [UpdateDelta(OrderSide.ASK, t, t, t) for t in [2, 4]], EventType.EXECUTION, 0
+    )
+
+    for expected_time, expected_side in [
+        (1, OrderSide.BID),
+        (2, OrderSide.ASK),
+        (4, OrderSide.BID),
+        (4, OrderSide.ASK),
+    ]:
+        delta = queue.get()
+        assert delta is not None
+        assert delta.timestamp == expected_time
+        assert delta.side == expected_side
+
+    queue.put([UpdateDelta(OrderSide.ASK, 5, 5, 5)], EventType.EXECUTION, 0)
+    queue.mark_done(EventType.EXECUTION, 0)
+
+    delta = queue.get()
+    assert delta is not None
+    assert delta.timestamp == 5
+
+    delta = queue.get()
+    assert delta is not None
+    assert delta.timestamp == 6
+
+    queue.mark_done(EventType.ORDER, 0)
+    queue.mark_done(EventType.ORDER, 1)
+    queue.put([UpdateDelta(OrderSide.ASK, 7, 7, 7)], EventType.EXECUTION, 1)
+    queue.mark_done(EventType.EXECUTION, 1)
+
+    assert not queue.empty()
+
+    delta = queue.get()
+    assert delta is not None
+    assert delta.timestamp == 7
+
+    assert queue.empty()
+    assert queue.get() is None
+
+
 @pytest.fixture
 def client() -> HistoricalUpdatesDataClient:
     return HistoricalUpdatesDataClient(resource_path)
@@ -269,6 +419,8 @@ def test_get_order_events(
 
     res = client._get_order_events("")
     assert res.continuation_token == "c3RyaW5n"
+    assert client.metrics.events == 3
+    assert res.num_events == 3
     assert len(res.deltas) == 3
 
     assert res.deltas[0].side == OrderSide.ASK
@@ -328,7 +480,9 @@ def test_queue_events_for_day(
     )
 
     assert client._queue._statuses[EventType.ORDER][0]
-    assert len(client._queue._chunks[0]) == 3
+    assert len(client._queue._chunks[0][EventType.ORDER]) == 3
+    assert client._chunk_page_counts[EventType.ORDER][0] == 1
+    assert client._chunk_event_counts[EventType.ORDER][0] == 3
     client._queue._cond_var.notify.assert_called()
 
     client._queue._cond_var = MagicMock()
@@ -341,12 +495,23 @@ def test_queue_events_for_day(
         EventType.EXECUTION,
     )
     assert client._queue._statuses[EventType.EXECUTION][0]
-    assert len(client._queue._chunks[0]) == 5
+    assert len(client._queue._chunks[0][EventType.EXECUTION]) == 2
     client._queue._cond_var.notify.assert_called()
 
-    client._queue.peek()
-    assert len(client._queue._queue) == 5
+    delta = client._queue.peek()
+    assert delta is not None
+    assert delta.timestamp == 1
     assert not (client._queue.empty() or client._queue.failed())
+    assert client._queue._cur_chunk == 0
+
+    timestamps = []
+    for _ in range(5):
+        delta = client._queue.get()
+        assert delta is not None
+        timestamps.append(delta.timestamp)
+
+    assert timestamps == [1, 2, 2, 2, 10]
+    assert not client._queue.empty()
     assert client._queue._cur_chunk == 1
 
 
@@ -355,7 +520,7 @@ def test_compute_next_snapshot(client: HistoricalUpdatesDataClient) -> None:
         feedcode="PF_XBTUSD", market=Market.KRAKEN_USD_FUTURE
     )
     client._queue = ChunkedEventQueue(num_chunks=1)
-    client._cur_sec = 1
+    client._cur_time = 1
 
     for e in ORDER_EVENTS["elements"]:
         delta = client._delta_from_order_event(e)
@@ -376,7 +541,7 @@ def test_compute_next_snapshot(client: HistoricalUpdatesDataClient) -> None:
     assert len(snapshot.bids) == 0
     assert len(snapshot.asks) == 1
     assert (1, 2) in snapshot.asks
-    assert client._cur_sec == 2
+    assert client._cur_time == 2
 
     snapshot = client._compute_next_snapshot()
     assert snapshot
@@ -390,7 +555,7 @@ def test_compute_next_snapshot(client: HistoricalUpdatesDataClient) -> None:
     assert (3, 4) in snapshot.bids
     assert (5, -6) in snapshot.bids
     assert (68717.5, -3000) in snapshot.bids
-    assert client._cur_sec == 10
+    assert client._cur_time == 10
 
     snapshot = client._compute_next_snapshot()
     assert snapshot
@@ -406,21 +571,156 @@ def test_compute_next_snapshot(client: HistoricalUpdatesDataClient) -> None:
     assert (68717.5, -3000) in snapshot.bids
     assert (7, -8) in snapshot.bids
 
-    assert len(client._queue._queue) == 0
+    assert client._queue.empty()
 
     snapshot = client._compute_next_snapshot()
     assert snapshot is None
 
 
+def test_compute_next_snapshot_sub_second() -> None:
+    client = HistoricalUpdatesDataClient(resource_path, snapshot_interval_ms=500)
+
+    assert client._to_snapshot_time(1999) == 1500
+    assert client._to_snapshot_time(2000) == 2000
+
+    client._cur_mbp_book = MBPBook(
+        feedcode="PF_XBTUSD", market=Market.KRAKEN_USD_FUTURE
+    )
+    client._queue = ChunkedEventQueue(num_chunks=1)
+    client._cur_time = 1000
+
+    order_events = copy.deepcopy(ORDER_EVENTS["elements"])
+    order_events[1]["timestamp"] = 1700
+
+    for e in order_events:
+        delta = client._delta_from_order_event(e)
+        assert delta is not None
+        client._queue.put([delta], EventType.ORDER, 0)
+
+    client._queue.mark_done(EventType.ORDER, 0)
+    client._queue.mark_done(EventType.EXECUTION, 0)
+
+    snapshot = client._compute_next_snapshot()
+    assert snapshot
+    assert snapshot.time == 1000
+    assert snapshot.asks == [(1, 2)]
+    assert snapshot.bids == []
+
+    snapshot = client._compute_next_snapshot()
+    assert snapshot
+    assert snapshot.time == 1500
+    assert snapshot.bids == [(5, -6), (3, 4)]
+
+    snapshot = client._compute_next_snapshot()
+    assert snapshot
+    assert snapshot.time == 10000
+    assert snapshot.bids == [(7, -8), (5, -6), (3, 4)]
+
+    assert client._compute_next_snapshot() is None
+
+    with pytest.raises(ValueError):
+        HistoricalUpdatesDataClient(resource_path, snapshot_interval_ms=0)
+
+
+@patch.object(HistoricalUpdatesDataClient, "_request")
+def test_millisecond_snapshots_directory(mock_make_request: MagicMock) -> None:
+    mock_make_request.side_effect = lambda route, _: {
+        "elements": copy.deepcopy(ORDER_EVENTS["elements"])
+        if route.endswith("/orders")
+        else [],
+        "continuationToken": None,
+    }
+
+    client = HistoricalUpdatesDataClient(resource_path, snapshot_interval_ms=1)
+    client._chunk_offsets = [timedelta(0), timedelta(days=1)]
+    client._queue = ChunkedEventQueue(num_chunks=1)
+    client._cur_mbp_book = MBPBook(
+        feedcode="PF_XBTUSD", market=Market.KRAKEN_USD_FUTURE
+    )
+    client._cur_time = 1000
+
+    # millisecond snapshots never land next to the per-second ones
+    file_path = client._compute_updates_for_day(
+        "PF_XBTUSD", datetime(year=2024, month=11, day=6)
+    )
+    assert file_path.parent.parent.name == "snapshots_ms"
+    assert not (file_path.parent.parent.parent / "snapshots" / "PF_XBTUSD").exists()
+
+    snapshots = RawSnapshotsDataLoader(
+        file_path.parent.parent.parent,
+        Asset.BTC,
+        Market.KRAKEN_USD_FUTURE,
+        date(2024, 11, 6),
+        date(2024, 11, 7),
+        TimeUnit.MILLISECONDS,
+    ).get_data(date(2024, 11, 6), date(2024, 11, 7))
+    assert [snapshot.time for snapshot in snapshots] == [1000, 2000, 10000]
+
+    shutil.rmtree(file_path.parent.parent)
+
+
+def test_rebalance_chunk_offsets(client: HistoricalUpdatesDataClient) -> None:
+    assert len(client._chunk_offsets) == client._NUM_CHUNKS + 1
+    assert client._chunk_offsets[1] == timedelta(minutes=30)
+
+    # a quiet day collapses into fewer, evenly sized chunks
+    offsets = client._rebalance_chunk_offsets()
+    assert offsets == [timedelta(hours=3 * i) for i in range(9)]
+
+    # one busy half hour gets split finely while quiet hours are merged
+    client._chunk_page_counts[EventType.ORDER] = [1] * client._NUM_CHUNKS
+    client._chunk_page_counts[EventType.ORDER][10] = 30
+    client._chunk_event_counts[EventType.ORDER] = [100] * client._NUM_CHUNKS
+    client._chunk_event_counts[EventType.ORDER][10] = 30_000
+    offsets = client._rebalance_chunk_offsets()
+
+    assert offsets[0] == timedelta(0)
+    assert offsets[-1] == timedelta(days=1)
+    assert all(a < b for a, b in zip(offsets, offsets[1:]))
+    assert client._MIN_CHUNKS <= len(offsets) - 1 < client._NUM_CHUNKS
+
+    busy_start, busy_end = timedelta(hours=5), timedelta(hours=5, minutes=30)
+    assert len([o for o in offsets if busy_start < o < busy_end]) >= 8
+
+    # once the spike is gone, evenly spread events pull the layout back to
+    # uniform chunks instead of keeping the fine split
+    client._chunk_offsets = offsets
+    num_chunks = len(offsets) - 1
+    for event_type in EventType:
+        client._chunk_page_counts[event_type] = [0] * num_chunks
+        client._chunk_event_counts[event_type] = [0] * num_chunks
+    client._chunk_page_counts[EventType.ORDER][0] = 48
+    client._chunk_event_counts[EventType.ORDER] = [
+        round((end - start).total_seconds()) for start, end in zip(offsets, offsets[1:])
+    ]
+    offsets = client._rebalance_chunk_offsets()
+    assert len(offsets) - 1 == 12
+    for offset, expected in zip(offsets, [timedelta(hours=2 * i) for i in range(13)]):
+        assert abs(offset - expected) <= timedelta(seconds=1)
+
+    client._chunk_offsets = [
+        timedelta(days=1) * i / client._NUM_CHUNKS
+        for i in range(client._NUM_CHUNKS + 1)
+    ]
+    client._chunk_page_counts = client._new_chunk_counts()
+    client._chunk_page_counts[EventType.ORDER][10] = 10_000
+    offsets = client._rebalance_chunk_offsets()
+    assert len(offsets) - 1 <= client._MAX_CHUNKS
+
+
 @patch.object(HistoricalUpdatesDataClient, "_request")
 def test_fail_download_updates(
     mock_make_request: MagicMock, client: HistoricalUpdatesDataClient
 ) -> None:
     mock_make_request.side_effect = ValueError()
 
+    report_path = os.path.join(os.path.dirname(resource_path), "report.json")
+
     with pytest.raises(RuntimeError) as e_info:
         client.download_updates(
-            asset=Asset.BTC, since=datetime(year=2024, month=11, day=5)
+            asset=Asset.BTC,
+            since=datetime(year=2024, month=11, day=5),
+            report_path=report_path,
         )
 
     assert (
@@ -428,4 +728,13 @@ def test_fail_download_updates(
         == "Failed to download updates for 'PF_XBTUSD' for date '11_05_2024'"
     )
 
+    with open(report_path) as f:
+        report = json.load(f)
+
+    assert "11_05_2024" in report["day_wall_times"]
+    assert "download_updates" in report["phase_wall_times"]
+    assert report["pages"] == 0
+
+    os.remove(report_path)
+
     shutil.rmtree(resource_path)
@@ -2,6 +2,7 @@ import pytest
 
 from pysrc.adapters.kraken.asset_mappings import (
     asset_to_kraken,
+    asset_to_tick_size,
     kraken_to_asset,
     kraken_to_market,
 )
@@ -29,3 +30,13 @@ def test_asset_conversion() -> None:
 
     with pytest.raises(Exception):
         kraken_to_market("BONKUSD")
+
+
+def test_asset_to_tick_size() -> None:
+    for asset in Asset:
+        assert asset_to_tick_size(asset, Market.KRAKEN_USD_FUTURE) > 0
+
+    assert asset_to_tick_size(Asset.BTC, Market.KRAKEN_USD_FUTURE) == 0.5
+
+    with pytest.raises(ValueError):
+        asset_to_tick_size(Asset.BTC, Market.KRAKEN_SPOT)
@@ -0,0 +1,74 @@
+import os
+import shutil
+
+from pysrc.adapters.messages import SnapshotMessage
+from pysrc.data_handlers.kraken.historical.snapshot_stream_writer import (
+    SnapshotStreamWriter,
+)
+from pysrc.data_handlers.kraken.historical.snapshots_data_handler import (
+    SnapshotsDataHandler,
+)
+from pysrc.test.helpers import get_resources_path
+from pysrc.util.types import Market
+
+resource_path = get_resources_path(__file__)
+
+
+def test_stream_write() -> None:
+    writer = SnapshotStreamWriter()
+
+    snapshots = [
+        SnapshotMessage(
+            time=i,
+            feedcode="XADAZUSD",
+            market=Market.KRAKEN_USD_FUTURE,
+            bids=[[1.0 - 0.01 * j, float(i + j)] for j in range(i + 1)],
+            asks=[[1.0 + 0.01 * j, float(i + j)] for j in range(i + 1)],
+        )
+        for i in range(10)
+    ]
+
+    test_file_path = resource_path / "snapshots" / "XADAZUSD" / "stream_write.bin"
+    writer.open(test_file_path)
+    for snapshot in snapshots:
+        writer.write(snapshot)
+    writer.flush()
+
+    restored_snapshots = SnapshotsDataHandler().read(test_file_path)
+
+    assert len(restored_snapshots) == len(snapshots)
+    for snapshot, restored_snapshot in zip(snapshots, restored_snapshots):
+        assert restored_snapshot.time == snapshot.time
+        assert restored_snapshot.feedcode == snapshot.feedcode
+        assert restored_snapshot.bids == snapshot.bids
+        assert restored_snapshot.asks == snapshot.asks
+
+    os.remove(test_file_path)
+
+
+def test_stream_write_skip_unchanged() -> None:
+    writer = SnapshotStreamWriter(skip_unchanged=True)
+
+    def snapshot(time: int, bid_qty: float) -> SnapshotMessage:
+        return SnapshotMessage(
+            time=time,
+            feedcode="XADAZUSD",
+            market=Market.KRAKEN_USD_FUTURE,
+            bids=[[0.99, bid_qty]],
+            asks=[[1.01, 1.0]],
+        )
+
+    test_file_path = resource_path / "snapshots_ms" / "XADAZUSD" / "skip_unchanged.bin"
+    test_file_path.parent.mkdir(parents=True, exist_ok=True)
+    writer.open(test_file_path)
+    for time, bid_qty in ((1000, 1.0), (1100, 1.0), (1200, 2.0), (1300, 2.0)):
+        writer.write(snapshot(time, bid_qty))
+    writer.flush()
+
+    # only the snapshots that changed the levels are written
+    restored_snapshots = SnapshotsDataHandler().read(test_file_path)
+    assert [s.time for s in restored_snapshots] == [1000, 1200]
+    assert [s.bids for s in restored_snapshots] == [[(0.99, 1.0)], [(0.99, 2.0)]]
+    assert (writer.written, writer.skipped) == (2, 2)
+
+    shutil.rmtree(test_file_path.parent.parent)
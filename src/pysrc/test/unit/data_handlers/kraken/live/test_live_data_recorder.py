@@ -0,0 +1,143 @@
+import shutil
+from datetime import date
+from typing import Any
+
+import pytest
+
+from pysrc.adapters.kraken.future.kraken_future_websocket_client import (
+    KrakenFutureWebsocketClient,
+)
+from pysrc.data_handlers.kraken.live.live_data_recorder import (
+    MS_PER_DAY,
+    LiveDataRecorder,
+)
+from pysrc.data_loaders.raw_snapshots_data_loader import RawSnapshotsDataLoader
+from pysrc.data_loaders.raw_trades_data_loader import RawTradesDataLoader
+from pysrc.test.helpers import get_resources_path
+from pysrc.util.types import Asset, Market, OrderSide, TimeUnit
+
+resource_path = get_resources_path(__file__)
+
+
+def _trade(product_id: str, trade_time: int, price: float) -> dict[str, Any]:
+    return {
+        "feed": "trade",
+        "product_id": product_id,
+        "time": trade_time,
+        "side": "buy",
+        "price": price,
+        "qty": 0.5,
+    }
+
+
+@pytest.mark.asyncio
+async def test_record_and_load() -> None:
+    client = KrakenFutureWebsocketClient(subscribed_assets=[Asset.BTC, Asset.ETH])
+    await client.on_message({"event": "subscribed", "feed": "trade"})
+    await client.on_message({"event": "subscribed", "feed": "book"})
+
+    # the first two trades land on the 1st of october, the last one on the 2nd
+    day_start = 1727740800000
+    trade_times = [day_start + 5, day_start + MS_PER_DAY - 1, day_start + MS_PER_DAY]
+
+    recorder = LiveDataRecorder(client, resource_path, snapshot_depth=2)
+    recorder.start()
+
+    await client.on_message(_trade("PF_XBTUSD", trade_times[0], 60000.5))
+    await client.on_message(
+        {
+            "feed": "book_snapshot",
+            "product_id": "PF_XBTUSD",
+            "timestamp": day_start + 60_000,
+            "bids": [{"price": 60000.0, "qty": 1.0}],
+            "asks": [{"price": 60001.0, "qty": 2.0}],
+        }
+    )
+    recorder.record()
+
+    # the strategy still sees every trade and its own snapshot depth
+    assert sum(len(arr) for arr in client.poll_trade_arrays()[Asset.BTC]) == 1
+    assert client.poll_snapshots(depth=0)[Asset.BTC].bids == []
+
+    # an unchanged book is not recorded again
+    await client.on_message(_trade("PF_XBTUSD", trade_times[1], 60002.0))
+    recorder.record()
+
+    await client.on_message(_trade("PF_XBTUSD", trade_times[2], 60003.0))
+    await client.on_message(
+        {
+            "feed": "book",
+            "product_id": "PF_XBTUSD",
+            "timestamp": day_start + MS_PER_DAY + 60_000,
+            "side": "buy",
+            "price": 60000.5,
+            "qty": 3.0,
+        }
+    )
+    recorder.close()
+
+    assert recorder.stats()["recorded_trades"] == 3
+    assert recorder.stats()["recorded_snapshots"] == 2
+    assert len(client.poll_trades()) == 2
+
+    trades = RawTradesDataLoader(
+        resource_path,
+        Asset.BTC,
+        Market.KRAKEN_USD_FUTURE,
+        date(2024, 10, 1),
+        date(2024, 10, 3),
+        TimeUnit.MILLISECONDS,
+    ).get_data(date(2024, 10, 1), date(2024, 10, 3))
+    assert [trade.time for trade in trades] == trade_times
+    assert [trade.price for trade in trades] == [60000.5, 60002.0, 60003.0]
+    assert all(trade.side == OrderSide.BID for trade in trades)
+    assert not (resource_path / "trades_ms" / "PF_ETHUSD").exists()
+    assert not (resource_path / "trades").exists()
+
+    snapshots = RawSnapshotsDataLoader(
+        resource_path,
+        Asset.BTC,
+        Market.KRAKEN_USD_FUTURE,
+        date(2024, 10, 1),
+        date(2024, 10, 3),
+        TimeUnit.MILLISECONDS,
+    ).get_data(date(2024, 10, 1), date(2024, 10, 3))
+    assert [snapshot.time for snapshot in snapshots] == [
+        day_start + 60_000,
+        day_start + MS_PER_DAY + 60_000,
+    ]
+    assert [[list(level) for level in s.bids] for s in snapshots] == [
+        [[60000.0, 1.0]],
+        [[60000.5, 3.0], [60000.0, 1.0]],
+    ]
+    assert [list(level) for level in snapshots[0].asks] == [[60001.0, 2.0]]
+
+    shutil.rmtree(resource_path)
+
+
+@pytest.mark.asyncio
+async def test_restart_appends() -> None:
+    client = KrakenFutureWebsocketClient(subscribed_assets=[Asset.BTC])
+    await client.on_message({"event": "subscribed", "feed": "trade"})
+
+    day_start = 1727740800000
+    for i in range(2):
+        recorder = LiveDataRecorder(client, resource_path)
+        recorder.start()
+        await client.on_message(_trade("PF_XBTUSD", day_start + i, 60000.0 + i))
+        recorder.close()
+
+    trades = RawTradesDataLoader(
+        resource_path,
+        Asset.BTC,
+        Market.KRAKEN_USD_FUTURE,
+        date(2024, 10, 1),
+        date(2024, 10, 2),
+        TimeUnit.MILLISECONDS,
+    ).get_data(date(2024, 10, 1), date(2024, 10, 2))
+    assert [trade.price for trade in trades] == [60000.0, 60001.0]
+
+    with pytest.raises(ValueError):
+        LiveDataRecorder(client, resource_path, poll_interval_seconds=0)
+
+    shutil.rmtree(resource_path)
@@ -17,3 +17,19 @@ def test_prod_assert_fail() -> None:
     with pytest.raises(AssertionError) as excinfo:
         prod_assert(False, "test_error_msg")
     assert str(excinfo.value) == "test_error_msg"
+
+
+def test_prod_assert_lazy_message() -> None:
+    built = []
+
+    def build_message() -> str:
+        built.append(True)
+        return "lazy_error_msg"
+
+    prod_assert(True, build_message)
+    assert built == []
+
+    with pytest.raises(AssertionError) as excinfo:
+        prod_assert(False, build_message)
+    assert str(excinfo.value) == "lazy_error_msg"
+    assert built == [True]
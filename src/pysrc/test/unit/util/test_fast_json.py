@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from pysrc.util.fast_json import available_json_backends, get_json_loads
+
+
+def test_get_json_loads() -> None:
+    assert get_json_loads("json") is json.loads
+    assert "json" in available_json_backends()
+
+    frame = b'{"feed":"book","product_id":"PF_XBTUSD","price":34892.5,"qty":6385}'
+    for backend in available_json_backends():
+        assert get_json_loads(backend)(frame) == json.loads(frame)
+    assert get_json_loads()(frame) == json.loads(frame)
+
+    with pytest.raises(ValueError):
+        get_json_loads()(b"{not json")
+
+    with pytest.raises(ValueError):
+        get_json_loads("yaml")
+
+    if "orjson" not in available_json_backends():
+        with pytest.raises(ValueError):
+            get_json_loads("orjson")
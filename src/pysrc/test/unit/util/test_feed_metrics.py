@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from pysrc.util.feed_metrics import FeedMetrics, RateCounter
+
+
+def test_rate_counter() -> None:
+    counter = RateCounter(window_seconds=3)
+    for now in (10.1, 10.5, 10.9, 11.2, 14.0):
+        counter.record(now)
+
+    # seconds 10, 11 and the idle 12 and 13, the window keeps the last three
+    assert counter.to_dict() == {
+        "total": 5,
+        "last_second": 0,
+        "mean_per_second": pytest.approx(1 / 3),
+        "max_per_second": 1,
+    }
+
+    with pytest.raises(ValueError):
+        RateCounter(window_seconds=0)
+
+
+def test_feed_metrics() -> None:
+    metrics = FeedMetrics()
+    metrics.record("book", "PF_XBTUSD", 5.0, 100.02, 5.001, exchange_time=100.0)
+    metrics.record("book", "PF_XBTUSD", 5.5, 100.53, 5.5005, exchange_time=100.5)
+    metrics.record("trade_snapshot", "PF_XBTUSD", 6.0, 101.0, 6.002)
+
+    snapshot = metrics.snapshot()
+    book = snapshot["feeds"]["book"]
+    assert book["rate"]["total"] == 2
+
+    exchange_latency = book["products"]["PF_XBTUSD"]["exchange_to_receive"]
+    assert exchange_latency["count"] == 2
+    assert exchange_latency["max_seconds"] == pytest.approx(0.03)
+    assert exchange_latency["histogram"] == {
+        "underflow": 0,
+        "buckets": [0, 0, 0, 2, 0],
+        "overflow": 0,
+    }
+
+    handler_latency = book["products"]["PF_XBTUSD"]["receive_to_handler"]
+    assert handler_latency["mean_seconds"] == pytest.approx(0.00075)
+
+    trade_snapshot = snapshot["feeds"]["trade_snapshot"]["products"]["PF_XBTUSD"]
+    assert "exchange_to_receive" not in trade_snapshot
+
+    # exchange clocks ahead of ours give negative latencies, which stay finite
+    metrics.record("book", "PF_XBTUSD", 7.0, 100.0, 7.001, exchange_time=100.5)
+    snapshot = metrics.snapshot()
+    exchange_latency = snapshot["feeds"]["book"]["products"]["PF_XBTUSD"][
+        "exchange_to_receive"
+    ]
+    assert exchange_latency["histogram"]["underflow"] == 1
+    json.dumps(snapshot, allow_nan=False)
+
+    metrics.reset()
+    assert metrics.snapshot()["feeds"] == {}
@@ -2,7 +2,11 @@ from pathlib import Path
 
 import pytest
 
-from pysrc.util.historical_data_utils import check_historical_data_filepath
+from pysrc.util.historical_data_utils import (
+    check_historical_data_filepath,
+    historical_data_dir,
+)
+from pysrc.util.types import TimeUnit
 
 
 def test_valid_historical_data_filepath() -> None:
@@ -45,3 +49,13 @@ def test_invalid_historical_data_filepath() -> None:
 
     invalid_path_not_trade = resource_path / "snapshots" / "XXBTZUSD" / "data.bin"
     assert not check_historical_data_filepath(invalid_path_not_trade, True)
+
+
+def test_millisecond_historical_data_filepath() -> None:
+    assert historical_data_dir(True, TimeUnit.MILLISECONDS) == "trades_ms"
+    assert historical_data_dir(False, TimeUnit.SECONDS) == "snapshots"
+
+    resource_path = Path(__file__).parent
+    snapshots_ms_path = resource_path / "snapshots_ms" / "PF_XBTUSD" / "data.bin"
+    assert check_historical_data_filepath(snapshots_ms_path, False)
+    assert not check_historical_data_filepath(snapshots_ms_path, True)
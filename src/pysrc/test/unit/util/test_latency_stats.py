@@ -0,0 +1,47 @@
+import pytest
+
+from pysrc.util.latency_stats import LatencyStats
+
+
+def test_latency_stats() -> None:
+    stats = LatencyStats(window=3)
+    assert stats.to_dict() == {
+        "count": 0,
+        "mean_seconds": 0.0,
+        "p50_seconds": 0.0,
+        "p99_seconds": 0.0,
+        "max_seconds": 0.0,
+    }
+
+    for seconds in (0.5, 0.1, 0.2, 0.3):
+        stats.record(seconds)
+
+    assert stats.count == 4
+    assert stats.mean() == pytest.approx(0.275)
+    assert stats.max_seconds == 0.5
+    # percentiles only cover the most recent window
+    assert stats.percentile(50) == pytest.approx(0.2)
+    assert stats.percentile(100) == pytest.approx(0.3)
+
+    assert stats.histogram([0.0, 0.25, 1.0]) == {
+        "underflow": 0,
+        "buckets": [2, 1],
+        "overflow": 0,
+    }
+    stats.record(-0.1)
+    stats.record(1.0)
+    assert stats.histogram([0.0, 0.25, 1.0]) == {
+        "underflow": 1,
+        "buckets": [0, 1],
+        "overflow": 1,
+    }
+
+    with pytest.raises(ValueError):
+        stats.histogram([1.0, 0.0])
+
+    stats.reset()
+    assert stats.count == 0
+    assert stats.percentile(50) == 0.0
+
+    with pytest.raises(ValueError):
+        LatencyStats(window=0)
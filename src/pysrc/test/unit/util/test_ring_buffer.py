@@ -0,0 +1,80 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from pysrc.util.ring_buffer import OverflowPolicy, RingBuffer
+
+_DTYPE = np.dtype([("time", "u8"), ("price", "f8")])
+
+
+def _times(views: list[np.ndarray]) -> list[int]:
+    return [int(t) for view in views for t in view["time"]]
+
+
+def test_ring_buffer_drop_oldest() -> None:
+    buffer = RingBuffer(_DTYPE, 4)
+    for i in range(3):
+        assert buffer.push((i, i * 0.5))
+
+    assert _times(buffer.poll(max_items=2)) == [0, 1]
+    assert len(buffer) == 1
+
+    for i in range(3, 7):
+        assert buffer.push((i, i * 0.5))
+
+    assert buffer.full()
+    assert buffer.dropped == 1
+    assert buffer.overflowed
+    assert buffer.high_water_mark == 4
+
+    # the readable region wraps around, so it comes back as two views
+    views = buffer.poll()
+    assert len(views) == 2
+    assert all(view.base is not None for view in views)
+    assert _times(views) == [3, 4, 5, 6]
+    assert buffer.poll() == []
+
+    buffer.clear_overflow()
+    assert buffer.stats() == {
+        "size": 0,
+        "capacity": 4,
+        "dropped": 1,
+        "high_water_mark": 4,
+        "overflowed": False,
+    }
+
+    with pytest.raises(ValueError):
+        RingBuffer(_DTYPE, 0)
+
+
+def test_ring_buffer_flag_and_block() -> None:
+    buffer = RingBuffer(_DTYPE, 2, OverflowPolicy.FLAG)
+    assert buffer.push((0, 0.0)) and buffer.push((1, 0.0))
+    assert not buffer.push((2, 0.0))
+    assert buffer.dropped == 1 and buffer.overflowed
+    assert _times(buffer.poll()) == [0, 1]
+
+    buffer = RingBuffer(_DTYPE, 2, OverflowPolicy.BLOCK)
+    assert buffer.push((0, 0.0)) and buffer.push((1, 0.0))
+    assert not buffer.push((2, 0.0))
+    assert buffer.dropped == 0 and buffer.overflowed
+    assert _times(buffer.poll()) == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_ring_buffer_wait_for_space() -> None:
+    buffer = RingBuffer(_DTYPE, 2, OverflowPolicy.BLOCK)
+    buffer.push((0, 0.0))
+    buffer.push((1, 0.0))
+
+    waiter = asyncio.create_task(buffer.wait_for_space(2))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    buffer.poll(max_items=1)
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    buffer.poll()
+    await asyncio.wait_for(waiter, timeout=1)
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from pysrc.util.subscriptions import SubscriptionRegistry
+
+
+def test_publish_to_callbacks() -> None:
+    registry = SubscriptionRegistry()
+    received: list[tuple[Any, ...]] = []
+
+    def handler(*args: Any) -> None:
+        received.append(args)
+
+    subscription = registry.subscribe(
+        ["a", "b"], handler, predicate=lambda key, value: value > 0
+    )
+    registry.publish("a", "a", 1)
+    registry.publish("b", "b", -1)
+    registry.publish("c", "c", 1)
+
+    assert received == [("a", 1)]
+    assert subscription.delivered == 1
+    assert subscription.filtered == 1
+    assert registry.has_subscribers("a")
+    assert not registry.has_subscribers("c")
+
+    registry.unsubscribe(subscription)
+    registry.publish("a", "a", 2)
+    assert received == [("a", 1)]
+    assert not registry.has_subscribers("a")
+
+
+def test_failing_and_self_removing_handlers() -> None:
+    registry = SubscriptionRegistry()
+    received: list[int] = []
+
+    def failing(value: int) -> None:
+        raise RuntimeError("handler failed")
+
+    def once(value: int) -> None:
+        received.append(value)
+        registry.unsubscribe(subscription)
+
+    registry.subscribe(["a"], failing)
+    subscription = registry.subscribe(["a"], once)
+
+    registry.publish("a", 1)
+    registry.publish("a", 2)
+    assert received == [1]
+
+
+@pytest.mark.asyncio
+async def test_publish_to_queue() -> None:
+    registry = SubscriptionRegistry()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+    subscription = registry.subscribe(["a"], queue)
+
+    registry.publish("a", "a", 1)
+    registry.publish("a", "a", 2)
+
+    assert queue.get_nowait() == ("a", 1)
+    assert subscription.delivered == 1
+    assert subscription.dropped == 1
@@ -1,5 +1,5 @@
 import logging
-from typing import NoReturn
+from typing import Callable, NoReturn
 
 LOGGER = logging.getLogger(__name__)
 
@@ -9,6 +9,6 @@ def DIE(error_msg: str) -> NoReturn:
     raise AssertionError(error_msg)
 
 
-def prod_assert(condition: bool, error_msg: str) -> None:
+def prod_assert(condition: bool, error_msg: str | Callable[[], str]) -> None:
     if not condition:
-        DIE(error_msg)
+        DIE(error_msg() if callable(error_msg) else error_msg)
@@ -0,0 +1,29 @@
+import json
+from typing import Any, Callable, Optional
+
+JsonLoads = Callable[[str | bytes], Any]
+
+try:
+    import orjson
+
+    _ORJSON_LOADS: Optional[JsonLoads] = orjson.loads
+except ImportError:
+    _ORJSON_LOADS = None
+
+
+def available_json_backends() -> list[str]:
+    return ["json"] + (["orjson"] if _ORJSON_LOADS is not None else [])
+
+
+def get_json_loads(backend: Optional[str] = None) -> JsonLoads:
+    match backend:
+        case None:
+            return _ORJSON_LOADS if _ORJSON_LOADS is not None else json.loads
+        case "json":
+            return json.loads
+        case "orjson":
+            if _ORJSON_LOADS is None:
+                raise ValueError("JSON backend 'orjson' is not installed")
+            return _ORJSON_LOADS
+        case _:
+            raise ValueError(f"Unknown JSON backend (got '{backend}')")
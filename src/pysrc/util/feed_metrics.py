@@ -0,0 +1,104 @@
+from collections import deque
+from typing import Any, Optional
+
+from pysrc.util.latency_stats import LatencyStats
+
+# finite so snapshots stay valid json, latencies below the first edge (clock
+# skew) and from the last edge on are reported as underflow and overflow
+LATENCY_BUCKET_EDGES_SECONDS = [0.0, 1e-4, 1e-3, 1e-2, 1e-1, 1.0]
+
+
+class RateCounter:
+    def __init__(self, window_seconds: int = 60):
+        if window_seconds <= 0:
+            raise ValueError(f"Window must be positive (got '{window_seconds}')")
+
+        # message counts of the last completed seconds, oldest first
+        self._counts: deque[int] = deque(maxlen=window_seconds)
+        self._second: Optional[int] = None
+        self._count = 0
+        self.total = 0
+
+    def record(self, now: float, count: int = 1) -> None:
+        second = int(now)
+        if second != self._second:
+            if self._second is not None:
+                self._counts.append(self._count)
+                # seconds without any messages are counted as zero
+                idle_seconds = min(second - self._second - 1, self._counts.maxlen or 0)
+                self._counts.extend([0] * max(idle_seconds, 0))
+            self._second = second
+            self._count = 0
+
+        self._count += count
+        self.total += count
+
+    def to_dict(self) -> dict[str, Any]:
+        counts = self._counts
+        return {
+            "total": self.total,
+            "last_second": counts[-1] if counts else 0,
+            "mean_per_second": sum(counts) / len(counts) if counts else 0.0,
+            "max_per_second": max(counts, default=0),
+        }
+
+
+class FeedMetrics:
+    def __init__(self, window: int = 10_000, rate_window_seconds: int = 60):
+        self._window = window
+        self._rate_window_seconds = rate_window_seconds
+
+        self._rates: dict[str, RateCounter] = {}
+        self._exchange_to_receive: dict[tuple[str, str], LatencyStats] = {}
+        self._receive_to_handler: dict[tuple[str, str], LatencyStats] = {}
+
+    def record(
+        self,
+        feed: str,
+        product_id: str,
+        receive_time: float,
+        receive_wall_time: float,
+        handled_time: float,
+        exchange_time: Optional[float] = None,
+    ) -> None:
+        rate = self._rates.get(feed)
+        if rate is None:
+            rate = self._rates[feed] = RateCounter(self._rate_window_seconds)
+        rate.record(receive_time)
+
+        key = (feed, product_id)
+        if exchange_time is not None:
+            self._stats(self._exchange_to_receive, key).record(
+                receive_wall_time - exchange_time
+            )
+        self._stats(self._receive_to_handler, key).record(handled_time - receive_time)
+
+    def _stats(
+        self, stats: dict[tuple[str, str], LatencyStats], key: tuple[str, str]
+    ) -> LatencyStats:
+        latency_stats = stats.get(key)
+        if latency_stats is None:
+            latency_stats = stats[key] = LatencyStats(self._window)
+        return latency_stats
+
+    def snapshot(self) -> dict[str, Any]:
+        feeds: dict[str, Any] = {
+            feed: {"rate": rate.to_dict(), "products": {}}
+            for feed, rate in self._rates.items()
+        }
+        for name, stats in (
+            ("exchange_to_receive", self._exchange_to_receive),
+            ("receive_to_handler", self._receive_to_handler),
+        ):
+            for (feed, product_id), latency_stats in stats.items():
+                feeds[feed]["products"].setdefault(product_id, {})[name] = {
+                    **latency_stats.to_dict(),
+                    "histogram": latency_stats.histogram(LATENCY_BUCKET_EDGES_SECONDS),
+                }
+
+        return {"bucket_edges_seconds": LATENCY_BUCKET_EDGES_SECONDS, "feeds": feeds}
+
+    def reset(self) -> None:
+        self._rates.clear()
+        self._exchange_to_receive.clear()
+        self._receive_to_handler.clear()
@@ -1,6 +1,20 @@
 from pathlib import Path
 
 from pysrc.adapters.kraken.asset_mappings import kraken_to_market
+from pysrc.util.types import TimeUnit
+
+
+def historical_data_dir(is_trade_data: bool, time_unit: TimeUnit) -> str:
+    # millisecond archives sit next to the second ones instead of sharing a
+    # directory, so nothing stepping through seconds ever reads them
+    kind = "trades" if is_trade_data else "snapshots"
+    match time_unit:
+        case TimeUnit.SECONDS:
+            return kind
+        case TimeUnit.MILLISECONDS:
+            return f"{kind}_ms"
+        case _:
+            raise ValueError(f"Unknown time unit (got '{time_unit}')")
 
 
 def check_historical_data_filepath(file_path: Path, is_trade_data: bool) -> bool:
@@ -12,10 +26,6 @@ def check_historical_data_filepath(file_path: Path, is_trade_data: bool) -> bool
     except Exception as _:
         return False
 
-    if is_trade_data:
-        if file_path.parent.parent.name != "trades":
-            return False
-    else:
-        if file_path.parent.parent.name != "snapshots":
-            return False
-    return True
+    return file_path.parent.parent.name in (
+        historical_data_dir(is_trade_data, time_unit) for time_unit in TimeUnit
+    )
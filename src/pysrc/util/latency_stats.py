@@ -0,0 +1,60 @@
+from collections import deque
+from typing import Any
+
+import numpy as np
+
+
+class LatencyStats:
+    def __init__(self, window: int = 10_000):
+        if window <= 0:
+            raise ValueError(f"Window must be positive (got '{window}')")
+
+        self._window: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        self._window.append(seconds)
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def mean(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self._window:
+            return 0.0
+
+        return float(np.percentile(self._window, q))
+
+    def histogram(self, edges: list[float]) -> dict[str, Any]:
+        # counts of the windowed samples per [edges[i], edges[i + 1]) bucket, with
+        # samples below the first and from the last edge on counted separately
+        if len(edges) < 2 or any(a >= b for a, b in zip(edges, edges[1:])):
+            raise ValueError(f"Edges must be increasing (got '{edges}')")
+
+        samples = np.fromiter(self._window, dtype=float)
+        bucket_indices = np.searchsorted(edges, samples, side="right")
+        counts = np.bincount(bucket_indices, minlength=len(edges) + 1)
+        return {
+            "underflow": int(counts[0]),
+            "buckets": [int(count) for count in counts[1:-1]],
+            "overflow": int(counts[-1]),
+        }
+
+    def reset(self) -> None:
+        self._window.clear()
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_seconds": self.mean(),
+            "p50_seconds": self.percentile(50),
+            "p99_seconds": self.percentile(99),
+            "max_seconds": self.max_seconds,
+        }
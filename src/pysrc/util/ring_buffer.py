@@ -0,0 +1,103 @@
+import asyncio
+from enum import Enum
+from typing import Any, Optional
+
+import numpy as np
+
+
+class OverflowPolicy(Enum):
+    DROP_OLDEST = 1
+    BLOCK = 2
+    FLAG = 3
+
+
+class RingBuffer:
+    def __init__(
+        self,
+        dtype: np.dtype,
+        capacity: int,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ):
+        if capacity <= 0:
+            raise ValueError(f"Capacity must be positive (got '{capacity}')")
+
+        self._buffer = np.zeros(capacity, dtype=dtype)
+        self._capacity = capacity
+        self._overflow_policy = overflow_policy
+
+        # monotonic cursors, the slot of a cursor is cursor % capacity
+        self._read_cursor = 0
+        self._write_cursor = 0
+        self._space_available: Optional[asyncio.Event] = None
+
+        self.dropped = 0
+        self.high_water_mark = 0
+        self.overflowed = False
+
+    def __len__(self) -> int:
+        return self._write_cursor - self._read_cursor
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def full(self) -> bool:
+        return len(self) == self._capacity
+
+    def push(self, row: tuple[Any, ...]) -> bool:
+        if self.full():
+            self.overflowed = True
+            match self._overflow_policy:
+                case OverflowPolicy.DROP_OLDEST:
+                    self._read_cursor += 1
+                    self.dropped += 1
+                case OverflowPolicy.BLOCK:
+                    return False
+                case OverflowPolicy.FLAG:
+                    self.dropped += 1
+                    return False
+
+        self._buffer[self._write_cursor % self._capacity] = row
+        self._write_cursor += 1
+        self.high_water_mark = max(self.high_water_mark, len(self))
+        return True
+
+    def poll(self, max_items: Optional[int] = None) -> list[np.ndarray]:
+        num_items = len(self) if max_items is None else min(max_items, len(self))
+        if not num_items:
+            return []
+
+        # views into the buffer rather than copies, they are only valid until
+        # the slots are written again
+        start = self._read_cursor % self._capacity
+        end = start + num_items
+        if end <= self._capacity:
+            views = [self._buffer[start:end]]
+        else:
+            views = [self._buffer[start:], self._buffer[: end - self._capacity]]
+
+        self._read_cursor += num_items
+        if self._space_available is not None:
+            self._space_available.set()
+
+        return views
+
+    def clear_overflow(self) -> None:
+        self.overflowed = False
+
+    async def wait_for_space(self, num_items: int = 1) -> None:
+        num_items = min(num_items, self._capacity)
+        while self._capacity - len(self) < num_items:
+            if self._space_available is None:
+                self._space_available = asyncio.Event()
+            self._space_available.clear()
+            await self._space_available.wait()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self),
+            "capacity": self._capacity,
+            "dropped": self.dropped,
+            "high_water_mark": self.high_water_mark,
+            "overflowed": self.overflowed,
+        }
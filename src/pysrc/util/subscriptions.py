@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+_logger = logging.getLogger(__name__)
+
+SubscriptionHandler = Callable[..., None] | asyncio.Queue
+
+
+class Subscription:
+    def __init__(
+        self,
+        keys: frozenset[Hashable],
+        handler: SubscriptionHandler,
+        predicate: Optional[Callable[..., bool]] = None,
+    ) -> None:
+        self.keys = keys
+        self.handler = handler
+        self.predicate = predicate
+
+        self.delivered = 0
+        self.filtered = 0
+        self.dropped = 0
+
+    def deliver(self, *args: Any) -> None:
+        if self.predicate is not None and not self.predicate(*args):
+            self.filtered += 1
+            return
+
+        if isinstance(self.handler, asyncio.Queue):
+            try:
+                self.handler.put_nowait(args)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return
+        else:
+            self.handler(*args)
+
+        self.delivered += 1
+
+
+class SubscriptionRegistry:
+    def __init__(self) -> None:
+        # tuples are rebuilt on (un)subscribe so publishing never copies and a
+        # handler may unsubscribe itself while being called
+        self._subscriptions: dict[Hashable, tuple[Subscription, ...]] = {}
+
+    def subscribe(
+        self,
+        keys: Iterable[Hashable],
+        handler: SubscriptionHandler,
+        predicate: Optional[Callable[..., bool]] = None,
+    ) -> Subscription:
+        subscription = Subscription(frozenset(keys), handler, predicate)
+        for key in subscription.keys:
+            self._subscriptions[key] = self._subscriptions.get(key, ()) + (
+                subscription,
+            )
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for key in subscription.keys:
+            remaining = tuple(
+                s for s in self._subscriptions.get(key, ()) if s is not subscription
+            )
+            if remaining:
+                self._subscriptions[key] = remaining
+            else:
+                self._subscriptions.pop(key, None)
+
+    def has_subscribers(self, key: Hashable) -> bool:
+        return key in self._subscriptions
+
+    def publish(self, key: Hashable, *args: Any) -> None:
+        for subscription in self._subscriptions.get(key, ()):
+            try:
+                subscription.deliver(*args)
+            except Exception:
+                _logger.exception(f"Subscription handler failed for {key}")
@@ -16,6 +16,11 @@ class PositionSide(Enum):
     SHORT = 1
 
 
+class TimeUnit(Enum):
+    SECONDS = 1
+    MILLISECONDS = 2
+
+
 class Market(Enum):
     KRAKEN_SPOT = 1
     KRAKEN_USD_FUTURE = 2
@@ -1,22 +1,39 @@
 import asyncio
-import json
 import logging
+import time
 from abc import ABC, abstractmethod
 from typing import Optional
 
 import websockets
 from websockets.asyncio.client import ClientConnection
 
+from pysrc.util.fast_json import get_json_loads
+from pysrc.util.latency_stats import LatencyStats
+
 _logger = logging.getLogger(__name__)
 
 
 class WebSocketClient(ABC):
     def __init__(
-        self, base_url: str, retry_delay: int = 5, max_retries: Optional[int] = None
+        self,
+        base_url: str,
+        retry_delay: int = 5,
+        max_retries: Optional[int] = None,
+        max_batch_size: int = 1024,
+        json_backend: Optional[str] = None,
+        max_pending_messages: int = 1 << 16,
     ) -> None:
         self.base_url = base_url
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.max_batch_size = max_batch_size
+        self.max_pending_messages = max_pending_messages
+        self.latency_stats = LatencyStats()
+        # receive times of the message being handled, monotonic and wall clock
+        self.receive_time: Optional[float] = None
+        self.receive_wall_time: Optional[float] = None
+        self.batch_receive_times: list[tuple[float, float]] = []
+        self._json_loads = get_json_loads(json_backend)
         self.ws: Optional[ClientConnection] = None
         self._listener_task: Optional[asyncio.Task] = None
 
@@ -24,6 +41,14 @@ class WebSocketClient(ABC):
         loop = asyncio.get_event_loop()
         self._listener_task = loop.create_task(self._connect_and_listen())
 
+    async def stop(self) -> None:
+        task, self._listener_task = self._listener_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self.ws is not None:
+            await self.ws.close()
+
     async def _connect_and_listen(self) -> None:
         retries = 0
         while self.max_retries is None or retries < self.max_retries:
@@ -60,19 +85,82 @@ class WebSocketClient(ABC):
             _logger.debug(f"Retrying in {self.retry_delay} seconds...")
             await asyncio.sleep(self.retry_delay)
 
+    async def _read_messages(
+        self,
+        pending: list[tuple[float, float, str | bytes]],
+        ready: asyncio.Event,
+        drained: asyncio.Event,
+    ) -> None:
+        if self.ws is None:
+            raise RuntimeError("WebSocket connection is not established.")
+
+        # buffered frames are appended without yielding, so everything that
+        # arrived while the last batch was being handled forms the next batch
+        try:
+            while True:
+                # a consumer that falls behind stops the reads, which pushes
+                # back on the server through the socket's flow control
+                if len(pending) >= self.max_pending_messages:
+                    drained.clear()
+                    await drained.wait()
+
+                message = await self.ws.recv()
+                pending.append((time.perf_counter(), time.time(), message))
+                ready.set()
+        finally:
+            ready.set()
+
+    async def _handle_batch(
+        self, batch: list[tuple[float, float, str | bytes]]
+    ) -> None:
+        json_loads = self._json_loads
+        messages = []
+        receive_times = []
+        for received_time, received_wall_time, message in batch:
+            try:
+                messages.append(json_loads(message))
+            except ValueError:
+                _logger.warning("Failed to parse message")
+                continue
+            receive_times.append((received_time, received_wall_time))
+
+        if messages:
+            self.batch_receive_times = receive_times
+            try:
+                await self.on_messages(messages)
+            finally:
+                self.batch_receive_times = []
+                self.receive_time = None
+                self.receive_wall_time = None
+
+        handled_time = time.perf_counter()
+        for received_time, _, _ in batch:
+            self.latency_stats.record(handled_time - received_time)
+
     async def _listen_for_messages(self) -> None:
+        _logger.info("Listening for messages from WebSocket...")
+
+        pending: list[tuple[float, float, str | bytes]] = []
+        ready = asyncio.Event()
+        drained = asyncio.Event()
+        reader_task = asyncio.create_task(self._read_messages(pending, ready, drained))
+
         try:
             while True:
-                _logger.info("Listening for messages from WebSocket...")
-                if self.ws is None:
-                    raise RuntimeError("WebSocket connection is not established.")
-                async for message in self.ws:
-                    try:
-                        data = json.loads(message)
-                        await self.on_message(data)
-                    except json.JSONDecodeError:
-                        _logger.warning("Failed to parse message")
-                    await asyncio.sleep(0.1)
+                await ready.wait()
+                ready.clear()
+
+                batch = pending[:]
+                pending.clear()
+                drained.set()
+
+                for i in range(0, len(batch), self.max_batch_size):
+                    await self._handle_batch(batch[i : i + self.max_batch_size])
+                    await asyncio.sleep(0)
+
+                # the reader only stops by raising, e.g. once the connection closes
+                if reader_task.done() and not pending:
+                    reader_task.result()
         except websockets.ConnectionClosed as e:
             _logger.warning(f"WebSocket connection closed during listening: {e}")
             raise RuntimeError("WebSocket connection was unexpectedly closed.") from e
@@ -81,6 +169,8 @@ class WebSocketClient(ABC):
             raise RuntimeError(
                 "An unexpected error occurred while handling the WebSocket."
             ) from e
+        finally:
+            reader_task.cancel()
 
     @abstractmethod
     async def on_connect(self) -> None:
@@ -93,3 +183,15 @@ class WebSocketClient(ABC):
     @abstractmethod
     async def on_message(self, message: dict) -> None:
         pass
+
+    async def on_messages(self, messages: list[dict]) -> None:
+        receive_times = self.batch_receive_times
+        if len(receive_times) != len(messages):
+            for message in messages:
+                await self.on_message(message)
+            return
+
+        for message, (receive_time, receive_wall_time) in zip(messages, receive_times):
+            self.receive_time = receive_time
+            self.receive_wall_time = receive_wall_time
+            await self.on_message(message)